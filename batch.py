@@ -0,0 +1,150 @@
+import asyncio
+import io
+import json
+import zipfile
+from collections.abc import AsyncIterator, Awaitable, Callable
+
+from starlette.concurrency import run_in_threadpool
+
+from ics import generate_ics_file
+from parser import parse_class_schedule
+
+# Records processed at once by a single batch request
+DEFAULT_CONCURRENCY = 4
+MAX_CONCURRENCY = 16
+
+
+def read_records(body: bytes) -> list[dict]:
+    """
+    Decode a batch request body, either a JSON array of records or JSONL with
+    one record per line.
+
+    Raises:
+        ValueError: If the body isn't valid JSON or a record isn't an object
+    """
+    text = body.decode("utf-8").strip()
+
+    if text.startswith("["):
+        records = json.loads(text)
+    else:
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            raise ValueError(f"Record at index {i} must be an object")
+
+    return records
+
+
+def process_record(record: dict) -> dict:
+    """
+    Parse one {schedule_text, semester_start, semester_end} record and export
+    it, the same way /parse-text-schedule and /generate-ics would.
+    """
+    try:
+        schedule_text = record.get("schedule_text", "")
+        if not schedule_text.strip():
+            return {"error": "No schedule text provided"}
+
+        courses = parse_class_schedule(schedule_text)
+        if not courses:
+            return {"error": "No classes to export"}
+
+        ics_content = generate_ics_file(
+            courses,
+            record.get("semester_start", ""),
+            record.get("semester_end", ""),
+            record.get("recurrence", "expanded"),
+            record.get("exclude_dates", []),
+        )
+
+        return {
+            "success": True,
+            "classes": [course.serialize() for course in courses],
+            "ics": ics_content,
+        }
+
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def parse_record(record: dict) -> dict:
+    """
+    Only parse one record, for callers that want its courses and not a
+    calendar. The result has the Course objects under "courses", or an
+    "error".
+    """
+    try:
+        schedule_text = record.get("schedule_text", "")
+        if not schedule_text.strip():
+            return {"error": "No schedule text provided"}
+        return {"courses": parse_class_schedule(schedule_text)}
+
+    except Exception as e:
+        return {"error": str(e)}
+
+
+# Runs a blocking function off the event loop, like WorkerPool.run
+Runner = Callable[..., Awaitable]
+
+
+async def iter_batch(
+    records: list[dict],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    run_job: Runner = run_in_threadpool,
+    process: Callable[[dict], dict] = process_record,
+) -> AsyncIterator[tuple[int, dict]]:
+    """
+    Process records with at most `concurrency` running at once, yielding
+    (index, result) pairs in the order they finish.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(index: int, record: dict) -> tuple[int, dict]:
+        async with semaphore:
+            return index, await run_job(process, record)
+
+    tasks = [asyncio.create_task(run(i, record)) for i, record in enumerate(records)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # the client went away before everything finished
+        for task in tasks:
+            task.cancel()
+
+
+async def iter_batch_jsonl(
+    records: list[dict],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    run_job: Runner = run_in_threadpool,
+) -> AsyncIterator[str]:
+    """Per-record results as JSON lines, each tagged with its record index"""
+    async for index, result in iter_batch(records, concurrency, run_job):
+        yield json.dumps({"index": index, **result}) + "\n"
+
+
+async def build_batch_zip(
+    records: list[dict],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    run_job: Runner = run_in_threadpool,
+) -> bytes:
+    """
+    A zip with schedule_<index>.ics for every record that exported, plus
+    errors.json listing the ones that didn't.
+    """
+    buffer = io.BytesIO()
+    errors = []
+
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        async for index, result in iter_batch(records, concurrency, run_job):
+            if "error" in result:
+                errors.append({"index": index, "error": result["error"]})
+                continue
+            archive.writestr(f"schedule_{index}.ics", result["ics"])
+
+        if errors:
+            errors.sort(key=lambda error: error["index"])
+            archive.writestr("errors.json", json.dumps(errors, indent=2))
+
+    return buffer.getvalue()
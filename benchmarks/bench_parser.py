@@ -0,0 +1,113 @@
+"""
+Compare parse_class_schedule against the original per-chunk implementation.
+
+Run from the repository root:
+
+    python benchmarks/bench_parser.py
+"""
+
+import re
+import sys
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from parser import parse_class_schedule  # noqa: E402
+from structs import Course  # noqa: E402
+
+
+def legacy_parse_class_schedule(text_blob: str) -> list[Course]:
+    """parse_class_schedule as it was before the single-pass engine"""
+    class_chunks = text_blob.split("Enrolled")[1:]
+
+    extracted_classes = []
+
+    for chunk in class_chunks:
+        class_info_pattern = re.compile(r"^\s*(\d+)\s+([A-Za-z\s&]+?)\t+([\w\d]+)")
+        schedule_pattern = re.compile(
+            r"([MWFThTu]+)\s+([\d:]+[ap]m\s+-\s+[\d:]+[ap]m)\s+-\s+(.+)"
+        )
+        schedule_no_loc_pattern = re.compile(
+            r"([MWFThTu]+)\s+([\d:]+[ap]m\s+-\s+[\d:]+[ap]m)"
+        )
+        instructor_pattern = re.compile(r"^[A-Z][a-z]+\s[A-Z][a-z]+$")
+
+        course: Course = Course()
+        lines = chunk.strip().split("\n")
+
+        if lines:
+            class_info_match = class_info_pattern.match(lines[0])
+            if class_info_match:
+                id, subject, number = class_info_match.groups()
+                course.id = id
+                course.number = number.strip()
+                course.name = f"{subject.strip()}"
+
+        for line in lines:
+            line = line.strip()
+
+            schedule_match = schedule_pattern.search(line)
+            if schedule_match:
+                days, time, location = schedule_match.groups()
+                course.schedule.days = days
+                start_time, end_time = time.split(" - ")
+                course.schedule.start_time = start_time
+                course.schedule.end_time = end_time
+                course.location = location.strip()
+                continue
+
+            schedule_no_loc_match = schedule_no_loc_pattern.search(line)
+            if schedule_no_loc_match:
+                days, time = schedule_no_loc_match.groups()
+                course.schedule.days = days.strip()
+                start_time, end_time = time.split(" - ")
+                course.schedule.start_time = start_time
+                course.schedule.end_time = end_time
+                continue
+
+            instructor_match = instructor_pattern.match(line)
+            if instructor_match:
+                course.instructor.append(line)
+
+        extracted_classes.append(course)
+
+    return extracted_classes
+
+
+def synthetic_paste(example: str, copies: int) -> str:
+    """Repeat the enrolled classes of a real paste, renumbering each copy"""
+    header, _, body = example.partition("Enrolled")
+    body = "Enrolled" + body
+    return header + "".join(
+        re.sub(r"Enrolled\t(\d+)", rf"Enrolled\t\g<1>{i}", body) for i in range(copies)
+    )
+
+
+def main() -> None:
+    example = (ROOT / "class.example.txt").read_text()
+    inputs = {"class.example.txt": example}
+    for copies in (10, 100, 1000):
+        inputs[f"synthetic x{copies}"] = synthetic_paste(example, copies)
+
+    print(f"{'input':<20}{'courses':>8}{'legacy ms':>12}{'current ms':>12}{'speedup':>9}")
+    for name, text in inputs.items():
+        expected = legacy_parse_class_schedule(text)
+        assert parse_class_schedule(text) == expected, f"output differs on {name}"
+
+        number = max(1, 2000 // len(expected))
+        legacy = min(
+            timeit.repeat(lambda: legacy_parse_class_schedule(text), number=number, repeat=5)
+        )
+        current = min(
+            timeit.repeat(lambda: parse_class_schedule(text), number=number, repeat=5)
+        )
+        print(
+            f"{name:<20}{len(expected):>8}{legacy / number * 1e3:>12.3f}"
+            f"{current / number * 1e3:>12.3f}{legacy / current:>8.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
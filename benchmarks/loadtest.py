@@ -0,0 +1,291 @@
+"""
+Replay captured requests against the app and report latency per route.
+
+Run from the repository root:
+
+    python benchmarks/loadtest.py corpus.jsonl --concurrency 8 --duration 30
+    python benchmarks/loadtest.py corpus.jsonl --rate 50 --ramp-up 10
+    python benchmarks/loadtest.py corpus.jsonl --url http://127.0.0.1:8000
+    python benchmarks/loadtest.py corpus.jsonl --save run.json --compare old.json
+    python benchmarks/loadtest.py corpus.jsonl --synthesize 50
+
+The corpus is JSONL in the shape capture.py writes (start a server with
+CAPTURE_PATH set to collect one), and --synthesize writes a starter corpus of
+synthetic pastes and exports. Requests go to main.app in-process through the
+ASGI interface, or with --url to a running server.
+
+By default, --concurrency clients each send a request as soon as their last
+one finished, starting one by one over --ramp-up seconds. With --rate,
+requests instead arrive at that many per second whatever the server is
+doing, ramping up to it over --ramp-up seconds, with at most --concurrency
+in flight; latency counts from when a request was due, so time spent
+waiting for a slot behind slow responses isn't hidden.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from datetime import date, timedelta
+from pathlib import Path
+from urllib.parse import urlsplit
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from asgi import asgi_request  # noqa: E402
+from capture import capture_record, record_body  # noqa: E402
+
+# (method, path, headers, body) -> status
+Send = Callable[[str, str, dict[str, str], bytes], Awaitable[int]]
+
+
+def read_corpus(path: Path) -> list[tuple[str, str, dict[str, str], bytes]]:
+    requests = []
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                requests.append((
+                    record.get("method", "GET"),
+                    record["path"],
+                    record.get("headers", {}),
+                    record_body(record),
+                ))
+    return requests
+
+
+def synthesize_corpus(path: Path, count: int) -> None:
+    """Parse and export requests for synthetic schedules of varied sizes"""
+    from parser import parse_class_schedule
+    from synthetic import synthetic_schedule
+
+    start = date(2025, 8, 27)
+    end = (start + timedelta(weeks=16)).isoformat()
+    json_headers = {"content-type": "application/json"}
+    rng = random.Random(0)
+
+    with path.open("w", encoding="utf-8") as f:
+        for i in range(count):
+            text = synthetic_schedule(rng.choice((4, 6, 8, 12, 30)), seed=i,
+                                      instructors_per_course=rng.choice((1, 1, 2)))
+            dates = {"semester_start": start.isoformat(), "semester_end": end}
+            parse = {"schedule_text": text, **dates}
+            export = {
+                "classes": [course.serialize() for course in parse_class_schedule(text)],
+                **dates,
+            }
+            for route, payload in (("/parse-text-schedule", parse), ("/generate-ics", export)):
+                record = capture_record("POST", route, json_headers, json.dumps(payload).encode())
+                f.write(json.dumps(record) + "\n")
+
+
+def in_process_sender() -> Send:
+    import main
+
+    async def send(method, path, headers, body):
+        status, _, _ = await asgi_request(main.app, method, path, body, headers)
+        return status
+
+    return send
+
+
+def http_sender(url: str) -> Send:
+    """
+    A minimal HTTP/1.1 client, one connection per request, reading the
+    response to the end without decoding it.
+    """
+    parts = urlsplit(url)
+    host = parts.hostname or "127.0.0.1"
+    port = parts.port or 80
+
+    async def send(method, path, headers, body):
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            head = [f"{method} {path} HTTP/1.1", f"Host: {parts.netloc}",
+                    f"Content-Length: {len(body)}", "Connection: close"]
+            head += [f"{name}: {value}" for name, value in headers.items()]
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+            await writer.drain()
+            status_line = await reader.readline()
+            while await reader.read(65536):
+                pass
+            return int(status_line.split()[1])
+        finally:
+            writer.close()
+
+    return send
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    """The nearest-rank q-th percentile of sorted values"""
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+class Results:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+
+    def record(self, path: str, seconds: float, ok: bool) -> None:
+        route = path.partition("?")[0]
+        self.latencies.setdefault(route, []).append(seconds)
+        self.errors[route] = self.errors.get(route, 0) + (not ok)
+
+    def summary(self, elapsed: float) -> dict:
+        summary = {}
+        for route, latencies in sorted(self.latencies.items()):
+            latencies = sorted(latencies)
+            summary[route] = {
+                "requests": len(latencies),
+                "throughput_rps": round(len(latencies) / elapsed, 2),
+                "error_rate": round(self.errors[route] / len(latencies), 4),
+                **{
+                    f"p{q}_ms": round(percentile(latencies, q) * 1e3, 3)
+                    for q in (50, 95, 99)
+                },
+            }
+        return summary
+
+
+async def timed(send: Send, request, results: Results, due: float) -> None:
+    method, path, headers, body = request
+    try:
+        ok = await send(method, path, headers, body) < 400
+    except Exception:
+        ok = False
+    results.record(path, time.perf_counter() - due, ok)
+
+
+async def closed_loop(send: Send, corpus, results: Results, concurrency: int,
+                      ramp_up: float, stop: Callable[[int], bool]) -> None:
+    sent = 0
+
+    async def client(index: int) -> None:
+        nonlocal sent
+        await asyncio.sleep(ramp_up * index / concurrency)
+        while not stop(sent):
+            request = corpus[sent % len(corpus)]
+            sent += 1
+            await timed(send, request, results, time.perf_counter())
+
+    await asyncio.gather(*(client(i) for i in range(concurrency)))
+
+
+async def open_loop(send: Send, corpus, results: Results, rate: float,
+                    concurrency: int, ramp_up: float, stop: Callable[[int], bool]) -> None:
+    slots = asyncio.Semaphore(concurrency)
+    rng = random.Random(0)
+    tasks = set()
+    start = time.perf_counter()
+    due = start
+    sent = 0
+
+    async def run(request, due):
+        async with slots:
+            await timed(send, request, results, due)
+
+    while not stop(sent):
+        # Poisson arrivals at the full rate, each kept with the probability
+        # of how far along the ramp it falls, to thin them to the ramp's rate
+        due += rng.expovariate(rate)
+        if ramp_up > 0 and rng.random() > (due - start) / ramp_up:
+            continue
+
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        task = asyncio.create_task(run(corpus[sent % len(corpus)], due))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        sent += 1
+
+    await asyncio.gather(*tasks)
+
+
+def print_summary(summary: dict, previous: dict | None) -> None:
+    columns = ("requests", "throughput_rps", "error_rate", "p50_ms", "p95_ms", "p99_ms")
+    print(f"{'route':<28}" + "".join(f"{name:>16}" for name in columns))
+    for route, row in summary.items():
+        print(f"{route:<28}" + "".join(f"{row[name]:>16}" for name in columns))
+        if previous and route in previous:
+            changes = []
+            for name in columns[1:]:
+                before, after = previous[route][name], row[name]
+                changes.append(f"{after / before - 1:+.0%}" if before else "-")
+            print(f"{'  vs previous':<28}{'':>16}" + "".join(f"{c:>16}" for c in changes))
+
+
+def main_cli() -> int:
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument("corpus", type=Path, help="JSONL of captured requests")
+    arg_parser.add_argument("--synthesize", type=int, nargs="?", const=50, metavar="N",
+                            help="write N synthetic schedules' requests to corpus and exit")
+    arg_parser.add_argument("--url", help="server to send to, instead of in-process")
+    arg_parser.add_argument("--concurrency", type=int, default=8,
+                            help="clients, or with --rate the most requests in flight")
+    arg_parser.add_argument("--rate", type=float, help="open-loop arrivals per second")
+    arg_parser.add_argument("--ramp-up", type=float, default=0.0,
+                            help="seconds to reach full concurrency or rate")
+    arg_parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    arg_parser.add_argument("--requests", type=int, help="stop after this many instead")
+    arg_parser.add_argument("--save", type=Path, help="write the results as JSON")
+    arg_parser.add_argument("--compare", type=Path, help="results saved by an earlier run")
+    args = arg_parser.parse_args()
+
+    if args.synthesize is not None:
+        synthesize_corpus(args.corpus, args.synthesize)
+        print(f"Wrote {args.corpus}")
+        return 0
+
+    corpus = read_corpus(args.corpus)
+    if not corpus:
+        print(f"No requests in {args.corpus}", file=sys.stderr)
+        return 1
+    send = http_sender(args.url) if args.url else in_process_sender()
+
+    results = Results()
+    start = time.perf_counter()
+
+    def stop(sent: int) -> bool:
+        if args.requests is not None:
+            return sent >= args.requests
+        return time.perf_counter() - start >= args.duration
+
+    if args.rate:
+        load = open_loop(send, corpus, results, args.rate, args.concurrency,
+                         args.ramp_up, stop)
+    else:
+        load = closed_loop(send, corpus, results, args.concurrency, args.ramp_up, stop)
+    asyncio.run(load)
+    elapsed = time.perf_counter() - start
+
+    if not args.url:
+        import main
+        main.worker_pool.shutdown()
+
+    summary = results.summary(elapsed)
+    previous = json.loads(args.compare.read_text())["routes"] if args.compare else None
+    print_summary(summary, previous)
+
+    if args.save:
+        args.save.write_text(json.dumps({
+            "meta": {
+                "target": args.url or "in-process",
+                "concurrency": args.concurrency,
+                "rate": args.rate,
+                "ramp_up": args.ramp_up,
+                "elapsed": round(elapsed, 3),
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            },
+            "routes": summary,
+        }, indent=2) + "\n")
+        print(f"\nSaved {args.save}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
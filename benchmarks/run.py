@@ -0,0 +1,214 @@
+"""
+Benchmark the parser, the ICS generator and both HTTP endpoints.
+
+Run from the repository root:
+
+    python benchmarks/run.py              # print timings
+    python benchmarks/run.py --save       # also write benchmarks/baseline.json
+    python benchmarks/run.py --compare    # exit 1 if slower than the baseline
+
+Timings are per call, the minimum and median of several repeats. Endpoints
+are called in-process through the ASGI interface, once with the parse and
+ICS caches cleared before every call ("cold") and once with them warm.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import time
+import timeit
+from datetime import date, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import main  # noqa: E402
+from asgi import asgi_request  # noqa: E402
+from ics import generate_ics_bytes, generate_ics_file  # noqa: E402
+from parser import deserialize_courses, parse_class_schedule  # noqa: E402
+from schema import GenerateRequest, decode_request  # noqa: E402
+from synthetic import synthetic_schedule  # noqa: E402
+
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+SEMESTER_START = date(2025, 8, 27)
+COURSE_COUNTS = (10, 100, 1000)
+INSTRUCTOR_COUNTS = (1, 3)
+SEMESTER_WEEKS = (4, 16, 52)
+
+
+def measure(fn, min_time: float = 0.2, repeat: int = 5) -> dict:
+    """Per-call timings of fn, calling it enough times to run min_time"""
+    calls = 1
+    while True:
+        elapsed = timeit.timeit(fn, number=calls)
+        if elapsed >= min_time / repeat or calls >= 10_000:
+            break
+        calls *= 2
+
+    runs = [t / calls * 1e3 for t in timeit.repeat(fn, number=calls, repeat=repeat)]
+    return {
+        "min_ms": round(min(runs), 4),
+        "median_ms": round(statistics.median(runs), 4),
+        "calls": calls,
+    }
+
+
+def bench_library(results: dict, min_time: float) -> None:
+    for courses in COURSE_COUNTS:
+        for instructors in INSTRUCTOR_COUNTS:
+            text = synthetic_schedule(courses, instructors_per_course=instructors)
+            results[f"parse_class_schedule/{courses}c-{instructors}i"] = measure(
+                lambda: parse_class_schedule(text), min_time
+            )
+
+        parsed = parse_class_schedule(synthetic_schedule(courses))
+        serialized = [course.serialize() for course in parsed]
+        results[f"deserialize_courses/{courses}c"] = measure(
+            lambda: deserialize_courses(serialized), min_time
+        )
+        body = json.dumps({"classes": serialized}).encode()
+        results[f"decode_generate_request/{courses}c"] = measure(
+            lambda: decode_request(body, GenerateRequest), min_time
+        )
+        results[f"json_deserialize_courses/{courses}c"] = measure(
+            lambda: deserialize_courses(json.loads(body)["classes"]), min_time
+        )
+
+        for weeks in SEMESTER_WEEKS:
+            start = SEMESTER_START.isoformat()
+            end = (SEMESTER_START + timedelta(weeks=weeks)).isoformat()
+            for mode in ("expanded", "rrule"):
+                results[f"generate_ics_file/{courses}c-{weeks}w-{mode}"] = measure(
+                    lambda: generate_ics_file(parsed, start, end, mode), min_time
+                )
+                results[f"generate_ics_bytes/{courses}c-{weeks}w-{mode}"] = measure(
+                    lambda: generate_ics_bytes(parsed, start, end, mode), min_time
+                )
+
+
+def bench_endpoints(results: dict, min_time: float) -> None:
+    loop = asyncio.new_event_loop()
+
+    def post(path: str, payload: dict, cold: bool):
+        body = json.dumps(payload).encode()
+
+        def call():
+            if cold:
+                main.parse_cache.clear()
+                main.ics_cache.clear()
+            status, _, _ = loop.run_until_complete(
+                asgi_request(
+                    main.app, "POST", path, body, {"content-type": "application/json"}
+                )
+            )
+            assert status == 200, f"{path} returned {status}"
+
+        return call
+
+    end = (SEMESTER_START + timedelta(weeks=16)).isoformat()
+    for courses in COURSE_COUNTS:
+        text = synthetic_schedule(courses)
+        parse_payload = {
+            "schedule_text": text,
+            "semester_start": SEMESTER_START.isoformat(),
+            "semester_end": end,
+        }
+        generate_payload = {
+            "classes": [course.serialize() for course in parse_class_schedule(text)],
+            "semester_start": SEMESTER_START.isoformat(),
+            "semester_end": end,
+        }
+
+        for cold in (True, False):
+            state = "cold" if cold else "warm"
+            results[f"POST /parse-text-schedule/{courses}c-{state}"] = measure(
+                post("/parse-text-schedule", parse_payload, cold), min_time
+            )
+            results[f"POST /generate-ics/{courses}c-16w-{state}"] = measure(
+                post("/generate-ics", generate_payload, cold), min_time
+            )
+
+    main.worker_pool.shutdown()
+    loop.close()
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Names of benchmarks whose median got slower by more than tolerance"""
+    regressions = []
+    print(f"\n{'benchmark':<52}{'baseline':>11}{'current':>11}{'change':>9}")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        change = current["median_ms"] / previous["median_ms"] - 1
+        flag = ""
+        if change > tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(
+            f"{name:<52}{previous['median_ms']:>11.3f}{current['median_ms']:>11.3f}"
+            f"{change:>+9.0%}{flag}"
+        )
+    return regressions
+
+
+def main_cli() -> int:
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument("--save", action="store_true", help="write the baseline")
+    arg_parser.add_argument(
+        "--compare", action="store_true", help="compare against the baseline"
+    )
+    arg_parser.add_argument("--baseline", type=Path, default=BASELINE)
+    arg_parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="allowed slowdown before --compare fails (default 0.25)",
+    )
+    arg_parser.add_argument(
+        "--min-time", type=float, default=0.2, help="seconds to spend per benchmark"
+    )
+    args = arg_parser.parse_args()
+
+    results: dict = {}
+    bench_library(results, args.min_time)
+    bench_endpoints(results, args.min_time)
+
+    print(f"{'benchmark':<52}{'min ms':>11}{'median ms':>11}")
+    for name, timing in results.items():
+        print(f"{name:<52}{timing['min_ms']:>11.3f}{timing['median_ms']:>11.3f}")
+
+    if args.save:
+        args.baseline.write_text(
+            json.dumps(
+                {
+                    "meta": {
+                        "python": platform.python_version(),
+                        "machine": platform.machine(),
+                        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                    },
+                    "results": results,
+                },
+                indent=2,
+            )
+            + "\n"
+        )
+        print(f"\nSaved {args.baseline}")
+
+    if args.compare:
+        baseline = json.loads(args.baseline.read_text())["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed past {args.tolerance:.0%}")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,75 @@
+"""Synthetic Schedule Planner pastes for benchmarks."""
+
+import random
+
+HEADER = """Skip to Main Content
+Schedule Planner
+Help Help
+Potential Schedule for 2025 Fall
+Status\tClass #\tSubject\tCourse\tSection\tSeats Open\tInstruction Mode\tInstructor\tDay(s) & Location(s)\tUnits
+"""
+
+SUBJECTS = [
+    "Industrial Eng & Ops Rsch",
+    "Computer Science",
+    "Mathematics",
+    "Electrical Eng & Comp Sci",
+    "Statistics",
+    "Economics",
+]
+BUILDINGS = ["Latimer", "Barker", "Lewis", "Stanley", "Haas Faculty Wing", "Tan", "GSPP"]
+FIRST_NAMES = ["Phillip", "Lizeng", "Thibaut", "Ying", "Diana", "Alper", "Maria", "Kenji"]
+LAST_NAMES = ["Kerger", "Zhang", "Mastrolia", "Cui", "Chavez", "Atamturk", "Lopez", "Sato"]
+DAYS = ["MW", "MWF", "TTh", "F", "W", "M"]
+RESERVED = (
+    "{taken} of {total} At least some seats in this class are reserved for students "
+    "who meet specific criteria. See the Berkeley Academic Guide Class Schedule for "
+    "details."
+)
+
+
+def _clock(minute: int) -> str:
+    hour, minute = divmod(minute, 60)
+    return f"{(hour - 1) % 12 + 1}:{minute:02d}{'am' if hour < 12 else 'pm'}"
+
+
+def synthetic_schedule(
+    courses: int = 10,
+    instructors_per_course: int = 1,
+    reserved_seat_lines: int = 2,
+    seed: int = 0,
+) -> str:
+    """
+    A paste shaped like the Schedule Planner page, with `courses` enrolled
+    classes. Each class has the given number of instructors and a "Reserved
+    Seats" block of `reserved_seat_lines` lines, the noise the parser has to
+    skip over. Every fifth class has no location.
+    """
+    rng = random.Random(seed)
+    blocks = [HEADER]
+
+    for i in range(courses):
+        start = rng.randrange(8 * 60, 18 * 60, 30)
+        meeting = f"{rng.choice(DAYS)} {_clock(start)} - {_clock(start + 59)}"
+        if i % 5:
+            meeting += f" - {rng.choice(BUILDINGS)} {rng.randrange(1, 400)}"
+
+        lines = [
+            f"Enrolled\t{10000 + i}\t{rng.choice(SUBJECTS)}\t{rng.randrange(1, 300)}"
+            f"\t{i % 3 + 1:03d}\t{rng.randrange(40)}\tIn-Person Instruction\t",
+            *(
+                f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+                for _ in range(instructors_per_course)
+            ),
+            meeting,
+            str(rng.randrange(1, 5)),
+        ]
+        if reserved_seat_lines:
+            lines += ["Has Reserved SeatsHas Reserved Seats", "Reserved Seats:"]
+            for _ in range(reserved_seat_lines):
+                total = rng.randrange(10, 200)
+                lines.append(RESERVED.format(taken=rng.randrange(total), total=total))
+
+        blocks.append("\n".join(lines) + "\n")
+
+    return "".join(blocks)
@@ -0,0 +1,390 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterable, AsyncIterator, Callable
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_schedule_text(text: str) -> str:
+    """
+    Normalize pasted schedule text so the same schedule copied from different
+    browsers or pages hashes the same: CRLF line endings become LF, and
+    whitespace around each line and the whole paste is dropped. The parser
+    strips lines itself, so this never changes what gets parsed.
+    """
+    lines = text.replace("\r\n", "\n").split("\n")
+    return "\n".join(line.strip() for line in lines).strip()
+
+
+def content_key(text: str) -> str:
+    return bytes_key(text.encode("utf-8"))
+
+
+def bytes_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def canonical_key(data: Any) -> str:
+    """Hash of a JSON-compatible value that doesn't depend on key order"""
+    encoded = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return content_key(encoded)
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Whether an If-None-Match header value matches etag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag.removeprefix("W/") in candidates
+
+
+class RecordedStream:
+    """
+    Passes a streamed body through, keeping a copy of it to cache once the
+    response has been sent, so caching can't hold up or break the stream.
+    """
+
+    def __init__(self, chunks: AsyncIterable[bytes], max_bytes: int):
+        self.chunks = chunks
+        self.max_bytes = max_bytes
+        self._body: bytearray | None = bytearray()
+        self._complete = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self.chunks:
+            if self._body is not None:
+                self._body += chunk
+                if len(self._body) > self.max_bytes:
+                    self._body = None
+            yield chunk
+        self._complete = True
+
+    @property
+    def body(self) -> bytes | None:
+        """The whole body, or None if it stopped early or grew past max_bytes"""
+        if not self._complete or self._body is None:
+            return None
+        return bytes(self._body)
+
+
+class LRUCache:
+    """
+    A thread-safe least-recently-used cache with a time-to-live on entries.
+
+    Args:
+        max_size: Entries kept before the least recently used is evicted.
+        ttl: Seconds an entry stays valid after it is set.
+        clock: Monotonic time source, replaceable in tests.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: float = 3600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def close(self) -> None:
+        """Nothing to release; SQLiteCache has a connection to close"""
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+        }
+
+
+SQLITE_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    is_json INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_entries_by_access
+    ON cache_entries (namespace, accessed_at);
+"""
+
+
+class SQLiteCache:
+    """
+    A cache shared by every server process on a host, in one SQLite file in
+    WAL mode, with the same interface as LRUCache. Bytes are stored as they
+    are and anything else as JSON, so values come back as JSON types.
+
+    Past max_size entries or max_bytes of values, the least recently used
+    entries of the namespace are evicted. Reads only record an access when
+    the last one is more than touch_interval seconds old, so hits don't each
+    take the write lock.
+
+    Calls can wait on another process's write, so run them off the event
+    loop. A read or write SQLite fails, say on a locked or full database, is
+    logged and counted in errors, and behaves like a miss or a skipped write.
+
+    Args:
+        path: SQLite database file, shared by the processes.
+        namespace: Name that keeps this cache's keys apart from other caches
+            in the same file.
+        max_size: Entries kept before the least recently used are evicted.
+        max_bytes: Total size of values kept before the same happens.
+        ttl: Seconds an entry stays valid after it is set.
+        clock: Wall-clock time source, shared across processes unlike
+            time.monotonic, replaceable in tests.
+        touch_interval: Seconds between access time updates for an entry.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        namespace: str,
+        max_size: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: float = 3600.0,
+        clock: Callable[[], float] = time.time,
+        touch_interval: float = 60.0,
+    ):
+        self.path = path
+        self.namespace = namespace
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.touch_interval = touch_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+        self._connection: sqlite3.Connection | None = None
+        self._pid = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # a connection can't be carried over into a forked worker
+        if self._connection is None or self._pid != os.getpid():
+            # waiting out another writer for long is worse than skipping
+            # a cache write
+            connection = sqlite3.connect(
+                self.path, timeout=1.0, isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            # WAL stays consistent without syncing every commit, and a cache
+            # losing its last writes in a power cut is harmless
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SQLITE_CACHE_SCHEMA)
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            try:
+                row = self._read(key)
+            except sqlite3.Error as e:
+                self.errors += 1
+                logger.warning("Reading %s cache entry failed: %s", self.namespace, e)
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        value, is_json = row
+        return json.loads(value) if is_json else value
+
+    def _read(self, key: str) -> tuple[bytes, bool] | None:
+        connection = self._connect()
+        row = connection.execute(
+            "SELECT value, is_json, expires_at, accessed_at FROM cache_entries"
+            " WHERE namespace = ? AND key = ?",
+            (self.namespace, key),
+        ).fetchone()
+
+        now = self.clock()
+        if row is None or row[2] <= now:
+            return None
+
+        value, is_json, _, accessed_at = row
+        if now - accessed_at >= self.touch_interval:
+            connection.execute(
+                "UPDATE cache_entries SET accessed_at = ?"
+                " WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key),
+            )
+        return value, is_json
+
+    def set(self, key: str, value: Any) -> None:
+        if self.max_size <= 0:
+            return
+
+        if isinstance(value, bytes):
+            stored, is_json = value, False
+        else:
+            stored, is_json = json.dumps(value, separators=(",", ":")).encode(), True
+        if len(stored) > self.max_bytes:
+            return
+
+        with self._lock:
+            try:
+                self._write(key, stored, is_json)
+            except sqlite3.Error as e:
+                self.errors += 1
+                logger.warning("Writing %s cache entry failed: %s", self.namespace, e)
+
+    def _write(self, key: str, stored: bytes, is_json: bool) -> None:
+        connection = self._connect()
+        now = self.clock()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.namespace, key, stored, is_json, len(stored),
+                 now + self.ttl, now),
+            )
+            self._evict(connection, now)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _evict(self, connection: sqlite3.Connection, now: float) -> None:
+        """Drop expired entries, then least recently used ones, while over"""
+        count, total = connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries"
+            " WHERE namespace = ?",
+            (self.namespace,),
+        ).fetchone()
+        if count <= self.max_size and total <= self.max_bytes:
+            return
+
+        expired = connection.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?"
+            " RETURNING size",
+            (self.namespace, now),
+        ).fetchall()
+        self.evictions += len(expired)
+        count -= len(expired)
+        total -= sum(size for size, in expired)
+
+        evicted = []
+        rows = connection.execute(
+            "SELECT key, size FROM cache_entries WHERE namespace = ?"
+            " ORDER BY accessed_at",
+            (self.namespace,),
+        )
+        for key, size in rows:
+            if count <= self.max_size and total <= self.max_bytes:
+                break
+            evicted.append((self.namespace, key))
+            count -= 1
+            total -= size
+        rows.close()
+
+        connection.executemany(
+            "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", evicted
+        )
+        self.evictions += len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connect().execute(
+                "DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,)
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+    def _size(self) -> tuple[int, int]:
+        with self._lock:
+            try:
+                return self._connect().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries"
+                    " WHERE namespace = ?",
+                    (self.namespace,),
+                ).fetchone()
+            except sqlite3.Error as e:
+                # reported as empty, so the stats and metrics still load
+                logger.warning("Sizing %s cache failed: %s", self.namespace, e)
+                return 0, 0
+
+    def __len__(self) -> int:
+        return self._size()[0]
+
+    def stats(self) -> dict:
+        """Hits, misses and evictions are this process's; sizes are shared"""
+        size, total_bytes = self._size()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": size,
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "bytes": total_bytes,
+            "max_bytes": self.max_bytes,
+            "errors": self.errors,
+        }
@@ -0,0 +1,140 @@
+"""
+Request capture for growing the load-test corpus. Requests are appended to a
+JSONL file, one object per line:
+
+    {"method": "POST", "path": "/generate-ics?x=1", "headers": {...},
+     "body": "...", "status": 200}
+
+The body is the request body as text, or "body_base64" instead when it isn't
+UTF-8, such as an uploaded screenshot. benchmarks/loadtest.py replays files
+of this shape.
+"""
+
+import base64
+import json
+import queue
+import random
+import threading
+from collections.abc import Callable
+
+# Headers that change how a request is handled; the rest aren't kept
+CAPTURED_HEADERS = (b"content-type", b"accept-encoding", b"if-none-match")
+
+
+def capture_record(method: str, path: str, headers: dict[str, str], body: bytes,
+                   status: int | None = None) -> dict:
+    record = {"method": method, "path": path, "headers": headers}
+    try:
+        record["body"] = body.decode("utf-8")
+    except UnicodeDecodeError:
+        record["body_base64"] = base64.b64encode(body).decode("ascii")
+    if status is not None:
+        record["status"] = status
+    return record
+
+
+def record_body(record: dict) -> bytes:
+    if "body_base64" in record:
+        return base64.b64decode(record["body_base64"])
+    return record.get("body", "").encode("utf-8")
+
+
+class CaptureWriter:
+    """
+    Appends lines to a JSONL file from a background thread, so requests only
+    pay for putting their line on a queue, never for the disk. The thread
+    starts with the first line and keeps the file open until close().
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lines: queue.SimpleQueue[str | None] = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def write(self, line: str) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._drain, name="capture-writer",
+                                                daemon=True)
+                self._thread.start()
+        self._lines.put(line)
+
+    def _drain(self) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            while (line := self._lines.get()) is not None:
+                f.write(line + "\n")
+                # flush once the queue is empty rather than per line
+                if self._lines.empty():
+                    f.flush()
+
+    def close(self) -> None:
+        """Write out the queued lines and stop the thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._lines.put(None)
+            thread.join()
+
+
+class CaptureMiddleware:
+    """
+    Captures a sample_rate fraction of requests to writer as they finish.
+    Meant for local runs and staging: the bodies are students' schedules.
+
+    Args:
+        writer: Where the JSONL lines go.
+        sample_rate: Fraction of requests captured.
+        exclude: Paths never captured, like the metrics and admin endpoints.
+    """
+
+    def __init__(
+        self,
+        app,
+        writer: CaptureWriter,
+        sample_rate: float = 1.0,
+        exclude: tuple[str, ...] = (),
+        rng: Callable[[], float] = random.random,
+    ):
+        self.app = app
+        self.writer = writer
+        self.sample_rate = sample_rate
+        self.exclude = exclude
+        self.rng = rng
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["path"] in self.exclude
+            or self.rng() >= self.sample_rate
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        body = bytearray()
+        status = None
+
+        async def receive_and_keep():
+            message = await receive()
+            if message["type"] == "http.request":
+                body.extend(message.get("body", b""))
+            return message
+
+        async def send_and_record(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        await self.app(scope, receive_and_keep, send_and_record)
+
+        path = scope["path"]
+        if scope.get("query_string"):
+            path += "?" + scope["query_string"].decode("latin-1")
+        headers = {
+            name.decode("latin-1"): value.decode("latin-1")
+            for name, value in scope["headers"]
+            if name in CAPTURED_HEADERS
+        }
+        record = capture_record(scope["method"], path, headers, bytes(body), status)
+        self.writer.write(json.dumps(record))
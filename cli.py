@@ -0,0 +1,182 @@
+"""
+Convert pasted schedules to ICS files in bulk, without the web server.
+
+    python cli.py schedules/ --out calendars/ --semester-start 2025-08-27 \
+        --semester-end 2025-12-12
+    python cli.py records.jsonl --out calendars/
+
+A directory input converts every *.txt file under it, using the semester
+dates given on the command line, and mirrors its subdirectories in --out. A
+JSONL input has one batch record per line, the same shape /batch takes:
+{"schedule_text", "semester_start", "semester_end", "recurrence",
+"exclude_dates"}, plus an optional "id" used as the file name, which must be
+unique. Dates missing from a record fall back to the command line.
+
+Records are spread over a process pool in chunks, each worker writes its own
+ICS file, and a throughput summary and the failures are printed at the end.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from pathlib import Path
+from typing import NamedTuple
+
+from ics import iter_ics_stream
+from parser import iter_courses
+
+
+class Job(NamedTuple):
+    """One schedule to convert: a text file, or a record from a JSONL file"""
+
+    name: str
+    path: str | None = None
+    record: dict | None = None
+
+
+class Result(NamedTuple):
+    name: str
+    courses: int = 0
+    events: int = 0
+    error: str | None = None
+
+
+def read_jobs(source: Path) -> list[Job]:
+    """
+    Raises:
+        ValueError: If a JSONL line isn't a JSON object, or two records
+            would write the same file
+    """
+    if source.is_dir():
+        return [
+            Job(path.relative_to(source).with_suffix("").as_posix(), path=str(path))
+            for path in sorted(source.rglob("*.txt"))
+        ]
+
+    jobs = []
+    names = set()
+    with source.open(encoding="utf-8") as f:
+        for index, line in enumerate(f):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError(f"Line {index + 1} must be a JSON object")
+            name = str(record.get("id", f"schedule_{len(jobs)}"))
+            name = re.sub(r"[^\w.-]+", "_", name)
+            if name in names:
+                raise ValueError(f"Line {index + 1} would overwrite {name}.ics")
+            names.add(name)
+            jobs.append(Job(name, record=record))
+    return jobs
+
+
+def convert(job: Job, out_dir: str, defaults: dict) -> Result:
+    """Parse one schedule and write its ICS file, streaming both ways"""
+    settings = {**defaults, **(job.record or {})}
+    target = os.path.join(out_dir, f"{job.name}.ics")
+    partial_target = f"{target}.partial"
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+
+    courses = 0
+
+    def counted(classes):
+        nonlocal courses
+        for course in classes:
+            courses += 1
+            yield course
+
+    try:
+        if job.path is not None:
+            source = open(job.path, encoding="utf-8", errors="replace")
+        else:
+            source = nullcontext(settings.get("schedule_text", "").splitlines(keepends=True))
+
+        with source as lines:
+            chunks = iter_ics_stream(
+                counted(iter_courses(lines)),
+                settings.get("semester_start", ""),
+                settings.get("semester_end", ""),
+                settings.get("recurrence", "expanded"),
+                settings.get("exclude_dates", []),
+            )
+            events = -2  # every chunk but the header and footer is an event
+            with open(partial_target, "w", encoding="utf-8", newline="") as out:
+                for chunk in chunks:
+                    out.write(chunk)
+                    events += 1
+
+        if not courses:
+            os.remove(partial_target)
+            return Result(job.name, error="No classes found")
+        os.replace(partial_target, target)
+        return Result(job.name, courses, events)
+
+    except Exception as e:
+        if os.path.exists(partial_target):
+            os.remove(partial_target)
+        return Result(job.name, error=str(e))
+
+
+def run(jobs: list[Job], out_dir: Path, defaults: dict, workers: int,
+        chunksize: int | None = None) -> list[Result]:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    if chunksize is None:
+        # a few chunks per worker balances uneven records without paying
+        # for a round trip per record
+        chunksize = max(1, len(jobs) // (workers * 4))
+
+    work = partial(convert, out_dir=str(out_dir), defaults=defaults)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(work, jobs, chunksize=chunksize))
+
+
+def main() -> int:
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument("source", type=Path, help="directory of .txt files or a JSONL file")
+    arg_parser.add_argument("--out", type=Path, default=Path("calendars"))
+    arg_parser.add_argument("--semester-start", default="")
+    arg_parser.add_argument("--semester-end", default="")
+    arg_parser.add_argument("--recurrence", default="expanded", choices=("expanded", "rrule"))
+    arg_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    arg_parser.add_argument("--chunksize", type=int, help="records sent to a worker at once")
+    args = arg_parser.parse_args()
+
+    try:
+        jobs = read_jobs(args.source)
+    except ValueError as e:
+        print(f"{args.source}: {e}", file=sys.stderr)
+        return 1
+    defaults = {
+        "semester_start": args.semester_start,
+        "semester_end": args.semester_end,
+        "recurrence": args.recurrence,
+    }
+
+    start = time.perf_counter()
+    results = run(jobs, args.out, defaults, args.workers, args.chunksize)
+    elapsed = time.perf_counter() - start
+
+    failures = [result for result in results if result.error is not None]
+    converted = len(results) - len(failures)
+    events = sum(result.events for result in results)
+    courses = sum(result.courses for result in results)
+    print(
+        f"{converted}/{len(results)} records, {courses} courses, {events} events "
+        f"in {elapsed:.2f}s with {args.workers} workers"
+    )
+    print(f"{len(results) / elapsed:.1f} records/s, {events / elapsed:.0f} events/s")
+
+    for failure in failures:
+        print(f"FAILED {failure.name}: {failure.error}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+"""
+Response compression negotiated from Accept-Encoding: brotli when the brotli
+package is installed, gzip otherwise.
+"""
+
+import hashlib
+import zlib
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Content types worth compressing. Everything else (zips, images) is either
+# compressed already or too small to matter.
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+)
+
+# Encodings we can produce, most preferred first
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# Levels for responses compressed per request, which trade some size for
+# speed, and for bodies compressed once up front, which don't have to
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+STATIC_GZIP_LEVEL = 9
+STATIC_BROTLI_QUALITY = 11
+
+
+def choose_encoding(accept_encoding: str | None) -> str | None:
+    """
+    The supported encoding the client accepts with the highest q-value,
+    preferring brotli on a tie, or None to send the body as is.
+    """
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[coding.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def is_compressible(content_type: str | None) -> bool:
+    return content_type is not None and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class Compressor:
+    """Compresses a body that arrives in chunks"""
+
+    def __init__(self, encoding: str, static: bool = False):
+        if encoding == "br":
+            quality = STATIC_BROTLI_QUALITY if static else BROTLI_QUALITY
+            compressor = brotli.Compressor(quality=quality)
+            self._compress, self._finish = compressor.process, compressor.finish
+            self._flush = compressor.flush
+        elif encoding == "gzip":
+            level = STATIC_GZIP_LEVEL if static else GZIP_LEVEL
+            # wbits 31 writes a gzip header and trailer rather than zlib's
+            compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+            self._compress, self._finish = compressor.compress, compressor.flush
+            self._flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+        else:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compress(chunk)
+
+    def flush(self) -> bytes:
+        """Everything compressed so far, so the client can decode it already"""
+        return self._flush()
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+def compress(body: bytes, encoding: str, static: bool = False) -> bytes:
+    compressor = Compressor(encoding, static)
+    return compressor.compress(body) + compressor.finish()
+
+
+class PrecompressedBody:
+    """
+    A fixed body compressed once in every supported encoding, with a strong
+    ETag for each: the hash of the body, plus the encoding.
+    """
+
+    def __init__(self, body: bytes):
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.variants = {None: (body, f'"{digest}"')}
+        for encoding in SUPPORTED_ENCODINGS:
+            self.variants[encoding] = (
+                compress(body, encoding, static=True),
+                f'"{digest}-{encoding}"',
+            )
+
+    def select(self, accept_encoding: str | None) -> tuple[bytes, str, str | None]:
+        """The body, ETag and Content-Encoding to send for Accept-Encoding"""
+        encoding = choose_encoding(accept_encoding)
+        body, etag = self.variants[encoding]
+        return body, etag, encoding
+
+
+class CompressionMiddleware:
+    """
+    Compresses text responses for clients that accept it, streamed ones
+    included, chunk by chunk. Responses that already set Content-Encoding, like the
+    precompressed /app page, are passed through untouched.
+
+    A compressed response is a different representation of the resource, so
+    its strong ETag is sent as a weak one. If-None-Match compares weakly, so
+    conditional requests still match.
+    """
+
+    def __init__(self, app, minimum_size: int = 500):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        encoding = choose_encoding(
+            headers.get(b"accept-encoding", b"").decode("latin-1")
+        )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor
+
+            if message["type"] == "http.response.start":
+                # Hold on to the headers until the first body chunk shows
+                # whether the response is worth compressing
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                if start_message["status"] == 304:
+                    start_message["headers"] = _not_modified_headers(
+                        start_message.get("headers", []),
+                        headers.get(b"if-none-match", b""),
+                    )
+                response_headers = dict(start_message.get("headers", []))
+                if (
+                    b"content-encoding" in response_headers
+                    or not is_compressible(
+                        response_headers.get(b"content-type", b"").decode("latin-1")
+                    )
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    await send(start_message)
+                    start_message = None
+                    await send(message)
+                    return
+
+                compressor = Compressor(encoding)
+                start_message["headers"] = _compressed_headers(
+                    start_message.get("headers", []), encoding
+                )
+                if not more_body:
+                    # the whole body is here, so its length is known
+                    body = compressor.compress(body) + compressor.finish()
+                    start_message["headers"].append(
+                        (b"content-length", str(len(body)).encode("latin-1"))
+                    )
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(start_message)
+
+            # Flush every chunk of a streamed response, or the compressor
+            # would hold on to the events already written until it has a
+            # block's worth
+            chunk = compressor.compress(body)
+            chunk += compressor.flush() if more_body else compressor.finish()
+            await send({
+                "type": "http.response.body",
+                "body": chunk,
+                "more_body": more_body,
+            })
+
+        await self.app(scope, receive, send_compressed)
+
+
+def _compressed_headers(
+    headers: list[tuple[bytes, bytes]], encoding: str
+) -> list[tuple[bytes, bytes]]:
+    """Response headers with Content-Encoding set, for an unknown length"""
+    compressed = []
+    for name, value in headers:
+        lowered = name.lower()
+        if lowered == b"content-length":
+            continue
+        if lowered == b"etag" and not value.startswith(b"W/"):
+            value = b"W/" + value
+        if lowered == b"vary":
+            continue
+        compressed.append((name, value))
+
+    vary = [value for name, value in headers if name.lower() == b"vary"]
+    vary.append(b"Accept-Encoding")
+    compressed.append((b"vary", b", ".join(vary)))
+    compressed.append((b"content-encoding", encoding.encode("latin-1")))
+    return compressed
+
+
+def _not_modified_headers(
+    headers: list[tuple[bytes, bytes]], if_none_match: bytes
+) -> list[tuple[bytes, bytes]]:
+    """
+    A 304's headers, with its ETag made weak if that's how the client got it,
+    because the full response was compressed
+    """
+    return [
+        (name, b"W/" + value)
+        if name.lower() == b"etag" and b"W/" + value in if_none_match
+        else (name, value)
+        for name, value in headers
+    ]
@@ -0,0 +1,86 @@
+"""Runtime settings, read from the environment once at startup."""
+
+import os
+
+
+def _int(name: str, default: int) -> int:
+    return int(os.environ.get(name, default))
+
+
+def _float(name: str, default: float) -> float:
+    return float(os.environ.get(name, default))
+
+
+def _bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() not in ("", "0", "false", "no", "off")
+
+
+# Where the caches below live: "memory" for each process's own, or "sqlite"
+# for one SQLite file at SHARED_CACHE_PATH that every worker process on the
+# host reads and writes, so a schedule parsed by one worker is a hit for all.
+# Each shared cache also keeps at most SHARED_CACHE_MAX_BYTES of values.
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")
+SHARED_CACHE_PATH = os.environ.get("SHARED_CACHE_PATH", "cache.db")
+SHARED_CACHE_MAX_BYTES = _int("SHARED_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+
+# Parsed schedules kept in the cache, keyed by a hash of the pasted text
+PARSE_CACHE_SIZE = _int("PARSE_CACHE_SIZE", 1024)
+PARSE_CACHE_TTL = _float("PARSE_CACHE_TTL", 3600)
+
+# Rendered calendars kept in the cache, keyed by a hash of the courses and dates.
+# Calendars larger than ICS_CACHE_MAX_BYTES are streamed but not kept.
+ICS_CACHE_SIZE = _int("ICS_CACHE_SIZE", 256)
+ICS_CACHE_TTL = _float("ICS_CACHE_TTL", 3600)
+ICS_CACHE_MAX_BYTES = _int("ICS_CACHE_MAX_BYTES", 1024 * 1024)
+
+# Where parsing and ICS generation run: "thread" or "process" workers. Past
+# WORKER_POOL_QUEUE waiting jobs, requests get a 503 with Retry-After.
+WORKER_POOL_KIND = os.environ.get("WORKER_POOL_KIND", "thread")
+WORKER_POOL_SIZE = _int("WORKER_POOL_SIZE", os.cpu_count() or 4)
+WORKER_POOL_QUEUE = _int("WORKER_POOL_QUEUE", 64)
+RETRY_AFTER = _int("RETRY_AFTER", 1)
+
+# Request bodies over MAX_BODY_BYTES are refused with a 413, except for
+# /batch, which allows BATCH_MAX_BYTES, and image uploads (see OCR_MAX_BYTES)
+MAX_BODY_BYTES = _int("MAX_BODY_BYTES", 1024 * 1024)
+BATCH_MAX_BYTES = _int("BATCH_MAX_BYTES", 16 * 1024 * 1024)
+
+# Responses smaller than this many bytes are sent uncompressed. The /app page
+# may be cached by browsers for APP_CACHE_MAX_AGE seconds.
+COMPRESSION_MIN_SIZE = _int("COMPRESSION_MIN_SIZE", 500)
+APP_CACHE_MAX_AGE = _int("APP_CACHE_MAX_AGE", 3600)
+
+# Screenshot OCR runs in its own pool of worker processes, since one image
+# takes seconds rather than milliseconds. Uploads over OCR_MAX_BYTES are
+# refused, and tesseract is stopped after OCR_TIMEOUT seconds.
+OCR_POOL_KIND = os.environ.get("OCR_POOL_KIND", "process")
+OCR_POOL_SIZE = _int("OCR_POOL_SIZE", 2)
+OCR_POOL_QUEUE = _int("OCR_POOL_QUEUE", 8)
+OCR_TIMEOUT = _float("OCR_TIMEOUT", 30)
+OCR_MAX_BYTES = _int("OCR_MAX_BYTES", 10 * 1024 * 1024)
+OCR_MAX_WIDTH = _int("OCR_MAX_WIDTH", 2000)
+OCR_CACHE_SIZE = _int("OCR_CACHE_SIZE", 256)
+OCR_CACHE_TTL = _float("OCR_CACHE_TTL", 3600)
+
+# SQLite database holding saved calendars for webcal subscriptions
+CALENDAR_DB_PATH = os.environ.get("CALENDAR_DB_PATH", "calendars.db")
+
+# Request profiling, off by default. With PROFILE_ALLOW_HEADER on, requests
+# sent with an X-Profile header are profiled; PROFILE_SAMPLE_RATE profiles
+# that fraction of all requests. The PROFILE_KEEP slowest profiles are kept
+# in PROFILE_DIR and listed at /profiles, which needs PROFILE_TOKEN sent as
+# "Authorization: Bearer <token>" and is a 404 while profiling is off or no
+# token is set.
+PROFILE_ALLOW_HEADER = _bool("PROFILE_ALLOW_HEADER", False)
+PROFILE_SAMPLE_RATE = _float("PROFILE_SAMPLE_RATE", 0.0)
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_KEEP = _int("PROFILE_KEEP", 20)
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+
+# With CAPTURE_PATH set, a CAPTURE_SAMPLE_RATE fraction of requests is
+# appended to that JSONL file, for replaying with benchmarks/loadtest.py
+CAPTURE_PATH = os.environ.get("CAPTURE_PATH", "")
+CAPTURE_SAMPLE_RATE = _float("CAPTURE_SAMPLE_RATE", 1.0)
@@ -0,0 +1,142 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any
+
+from profiling import add_worker_stats, profiled_call, profiling_active
+
+POOL_KINDS = ("thread", "process")
+
+
+class PoolSaturated(Exception):
+    """Raised when the pool already has as much work as it will queue"""
+
+
+def _warm_worker() -> None:
+    # Import the parsing and ICS code before the first job needs it
+    import ics  # noqa: F401
+    import jobs  # noqa: F401
+    import parser  # noqa: F401
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _timed_call(fn: Callable[..., Any], *args: Any) -> tuple[Any, float]:
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+class WorkerPool:
+    """
+    Runs CPU-bound work off the event loop, in threads or in worker processes.
+
+    At most max_workers jobs run at once and at most max_queue more wait for a
+    worker. Past that, run() raises PoolSaturated straight away instead of
+    letting requests pile up behind each other.
+
+    Args:
+        kind: "thread" or "process".
+        max_workers: Jobs running at once.
+        max_queue: Jobs waiting for a worker before new ones are refused.
+    """
+
+    def __init__(self, kind: str = "thread", max_workers: int = 4, max_queue: int = 64):
+        if kind not in POOL_KINDS:
+            raise ValueError(f"Unknown worker pool kind: {kind}")
+
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.pending = 0
+        self.rejected = 0
+        self._executor: Executor | None = None
+
+    def start(self) -> None:
+        """Create the executor, spawning every worker process up front"""
+        if self._executor is not None:
+            return
+
+        if self.kind == "thread":
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="worker"
+            )
+            return
+
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_worker,
+        )
+        # Workers are spawned as jobs come in, so one job each starts them all
+        # now rather than on the first requests
+        pings = [self._executor.submit(_ping) for _ in range(self.max_workers)]
+        for ping in pings:
+            ping.result()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    @property
+    def saturated(self) -> bool:
+        return self.pending >= self.max_workers + self.max_queue
+
+    def check_capacity(self) -> None:
+        """
+        Raises:
+            PoolSaturated: If the queue is full
+        """
+        if self.saturated:
+            self.rejected += 1
+            raise PoolSaturated("Worker pool is saturated")
+
+    async def run(self, fn: Callable[..., Any], *args: Any, admit: bool = True) -> Any:
+        """
+        Run fn(*args) on a worker. Work that belongs to a request which was
+        already admitted (the rest of a streamed response, the records of a
+        batch) passes admit=False so it isn't refused halfway through.
+
+        Raises:
+            PoolSaturated: If admit is set and the queue is full
+        """
+        result, _ = await self.run_timed(fn, *args, admit=admit)
+        return result
+
+    async def run_timed(
+        self, fn: Callable[..., Any], *args: Any, admit: bool = True
+    ) -> tuple[Any, float]:
+        """Like run, but also returns the seconds fn took on the worker"""
+        if admit:
+            self.check_capacity()
+        self.start()
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            if not profiling_active():
+                return await loop.run_in_executor(self._executor, _timed_call, fn, *args)
+
+            # profile the job where it runs, since a worker process is out of
+            # reach of the request's profiler
+            (result, stats), elapsed = await loop.run_in_executor(
+                self._executor, _timed_call, profiled_call, fn, *args)
+            add_worker_stats(stats)
+            return result, elapsed
+        finally:
+            self.pending -= 1
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self.pending,
+            "rejected": self.rejected,
+        }
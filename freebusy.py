@@ -0,0 +1,161 @@
+"""
+Free/busy times and conflicts from 5-minute slot bitmaps.
+
+Each weekday of a schedule is a Python int with bit i set when slot i (minutes
+5i to 5i + 5) is taken, so combining schedules is an OR, finding overlaps is
+an AND and free time is the complement.
+"""
+
+from collections.abc import Iterable
+from typing import NamedTuple
+
+from structs import Course, mask_weekdays, parse_clock
+
+SLOT_MINUTES = 5
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+WEEKDAY_NAMES = [
+    "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday",
+]
+
+# Week as seven day bitmaps, Monday first
+Week = list[int]
+
+
+class Conflict(NamedTuple):
+    """Two courses that meet at the same time on a weekday"""
+
+    first: Course
+    second: Course
+    weekday: int
+    start_minute: int
+    end_minute: int
+
+
+def slot_bits(start_minute: int, end_minute: int) -> int:
+    """Bitmap of every slot that [start_minute, end_minute) touches"""
+    first = start_minute // SLOT_MINUTES
+    last = -(-end_minute // SLOT_MINUTES)  # round up
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def bit_runs(bits: int) -> list[tuple[int, int]]:
+    """The runs of set bits in bits, as [first, last + 1) slot ranges"""
+    runs = []
+    offset = 0
+    while bits:
+        # skip the clear bits, then count the set ones
+        skip = (bits & -bits).bit_length() - 1
+        bits >>= skip
+        offset += skip
+        length = (bits ^ (bits + 1)).bit_length() - 1
+        runs.append((offset, offset + length))
+        bits >>= length
+        offset += length
+    return runs
+
+
+def _meets(course: Course) -> bool:
+    schedule = course.schedule
+    return (
+        bool(schedule.weekday_mask)
+        and schedule.start_minute is not None
+        and schedule.end_minute is not None
+    )
+
+
+def busy_week(courses: Iterable[Course]) -> Week:
+    """When a schedule's courses meet, as one bitmap per weekday"""
+    week = [0] * 7
+    for course in courses:
+        if not _meets(course):
+            continue
+        schedule = course.schedule
+        bits = slot_bits(schedule.start_minute, schedule.end_minute)
+        for weekday in mask_weekdays(schedule.weekday_mask):
+            week[weekday] |= bits
+    return week
+
+
+def combined_busy_week(schedules: Iterable[Iterable[Course]]) -> Week:
+    """When anyone in a group is busy, for finding a time that suits all"""
+    week = [0] * 7
+    for schedule_week in map(busy_week, schedules):
+        week = [a | b for a, b in zip(week, schedule_week)]
+    return week
+
+
+def free_week(
+    busy: Week, day_start: int = 8 * 60, day_end: int = 22 * 60, min_minutes: int = 0
+) -> list[list[tuple[int, int]]]:
+    """
+    Free blocks per weekday between day_start and day_end, as (start, end)
+    minutes, leaving out blocks shorter than min_minutes.
+    """
+    window = slot_bits(day_start, day_end)
+    min_slots = -(-min_minutes // SLOT_MINUTES)
+    return [
+        [
+            (first * SLOT_MINUTES, last * SLOT_MINUTES)
+            for first, last in bit_runs(~day & window)
+            if last - first >= min_slots
+        ]
+        for day in busy
+    ]
+
+
+def busy_blocks(busy: Week) -> list[list[tuple[int, int]]]:
+    """Busy blocks per weekday as (start, end) minutes, rounded out to slots"""
+    return [
+        [(first * SLOT_MINUTES, last * SLOT_MINUTES) for first, last in bit_runs(day)]
+        for day in busy
+    ]
+
+
+def find_conflicts(courses: Iterable[Course]) -> list[Conflict]:
+    """
+    Pairs of courses in one schedule that overlap. Bitmaps rule out most
+    pairs with a single AND; pairs that share a slot are then checked to the
+    minute, since two classes can share a slot without overlapping.
+    """
+    meeting = [course for course in courses if _meets(course)]
+    bitmaps = [
+        slot_bits(course.schedule.start_minute, course.schedule.end_minute)
+        for course in meeting
+    ]
+
+    conflicts = []
+    for i, first in enumerate(meeting):
+        for j in range(i + 1, len(meeting)):
+            second = meeting[j]
+            shared_days = first.schedule.weekday_mask & second.schedule.weekday_mask
+            if not shared_days or not bitmaps[i] & bitmaps[j]:
+                continue
+
+            start = max(first.schedule.start_minute, second.schedule.start_minute)
+            end = min(first.schedule.end_minute, second.schedule.end_minute)
+            if start >= end:
+                continue
+            for weekday in mask_weekdays(shared_days):
+                conflicts.append(Conflict(first, second, weekday, start, end))
+    return conflicts
+
+
+def format_clock(minute: int) -> str:
+    """12:30pm for 750, the inverse of structs.parse_clock"""
+    hour, minute = divmod(minute % (24 * 60), 60)
+    meridiem = "am" if hour < 12 else "pm"
+    return f"{hour % 12 or 12}:{minute:02d}{meridiem}"
+
+
+def parse_time(time_str: str) -> int:
+    """
+    Raises:
+        ValueError: If the time doesn't parse
+    """
+    minute = parse_clock(time_str)
+    if minute is None:
+        raise ValueError(f"Invalid time: {time_str!r}")
+    return minute
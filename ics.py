@@ -1,24 +1,30 @@
-import uuid
-from datetime import datetime, timedelta
-
-from structs import Course
-
-# Day name to weekday number mapping
-DAY_TO_WEEKDAY = {
-    "Monday": 0,
-    "M": 0,
-    "Tuesday": 1,
-    "T": 1,
-    "Wednesday": 2,
-    "W": 2,
-    "Thursday": 3,
-    "Th": 3,
-    "Friday": 4,
-    "F": 4,
-    "Saturday": 5,
-    "Sa": 5,
-    "Sunday": 6,
-}
+import hashlib
+import io
+import re
+from collections.abc import Iterable, Iterator
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import NamedTuple
+
+from structs import DAY_TO_WEEKDAY, Course, mask_weekdays
+
+# Weekday number to RFC 5545 BYDAY code
+WEEKDAY_TO_BYDAY = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+
+# How weekly meetings are written out: one VEVENT per meeting, or one
+# VEVENT per course carrying an RRULE
+RECURRENCE_MODES = ("expanded", "rrule")
+
+# Content lines longer than this are folded onto continuation lines
+MAX_LINE_OCTETS = 75
+
+# Course keys are cut to this length, so that with the meeting's time and
+# days, a position and a date, a UID line never needs folding
+MAX_COURSE_KEY = 24
+
+_TEXT_ESCAPES = str.maketrans({
+    "\\": "\\\\", ";": "\\;", ",": "\\,", "\n": "\\n", "\r": None,
+})
 
 
 def handle_instructor(instructors: list[str]) -> str:
@@ -46,86 +52,536 @@ def parse_days(days_str: str) -> list[str]:
     return days
 
 
-def generate_ics_file(
-    classes: list[Course], semester_start_str: str, semester_end_str: str
-) -> str:
-    """Generate ICS file content from parsed classes"""
+def parse_date(date_str: str) -> date:
+    return datetime.strptime(date_str, "%Y-%m-%d").date()
+
+
+def first_weekday_on_or_after(start: date, weekday: int) -> date:
+    return start + timedelta(days=(weekday - start.weekday()) % 7)
+
+
+def event_uid(key: str, event_date: date | None = None) -> str:
+    """
+    A UID that stays the same every time the same meeting is exported: the
+    meeting's key, see meeting_key, plus the meeting date for a single
+    meeting.
+    """
+    if event_date is not None:
+        key = f"{key}-{_ics_date(event_date)}"
+    return f"{key}@calcentral-ics"
+
+
+def meeting_key(cls: Course, weekdays: list[int], start_minute: int) -> str:
+    """
+    The class number, or the subject and course number for classes without
+    one, plus when the meeting starts and its days, so a course's lecture and
+    section don't share UIDs.
+    """
+    days = "".join(WEEKDAY_TO_BYDAY[w] for w in weekdays)
+    return "%s-%02d%02d%s" % (_course_key(cls), *divmod(start_minute, 60), days)
+
+
+def _course_key(cls: Course) -> str:
+    if cls.id:
+        parts = [str(cls.id)]
+    elif cls.name:
+        parts = [cls.name, str(cls.number)]
+    else:
+        return "course"
+    # ASCII only, so the key's length in characters is its length in octets
+    keys = [re.sub(r"[^\w-]+", "", part, flags=re.ASCII).strip("-") for part in parts]
+    if not keys[0]:
+        # nothing of the name is ASCII, so a hash of it stands in
+        keys[0] = hashlib.sha256(parts[0].encode("utf-8")).hexdigest()[:8]
+    return "-".join(key for key in keys if key)[:MAX_COURSE_KEY].rstrip("-")
+
+
+def _ics_date(d: date) -> str:
+    return "%04d%02d%02d" % (d.year, d.month, d.day)
+
+
+def _ics_time(minute: int) -> str:
+    return "T%02d%02d00" % divmod(minute, 60)
+
+
+def _join_lines(lines: list[str]) -> str:
+    return "\r\n".join(lines) + "\r\n"
+
+
+def escape_text(value: str) -> str:
+    """
+    A TEXT property value with backslashes, semicolons, commas and newlines
+    escaped, as RFC 5545 requires
+    """
+    return value.translate(_TEXT_ESCAPES)
+
+
+def fold_line(line: str) -> bytes:
+    """
+    A content line encoded and ended with CRLF, folded so no physical line
+    is over 75 octets. Folds never split a UTF-8 character.
+    """
+    data = line.encode("utf-8")
+    if len(data) <= MAX_LINE_OCTETS:
+        return data + b"\r\n"
 
-    # Parse semester dates
-    semester_start = datetime.strptime(semester_start_str, "%Y-%m-%d").date()
-    semester_end = datetime.strptime(semester_end_str, "%Y-%m-%d").date()
+    pieces = []
+    start = 0
+    # continuation lines start with a space, which counts toward the limit
+    limit = MAX_LINE_OCTETS
+    while len(data) - start > limit:
+        end = start + limit
+        while data[end] & 0xC0 == 0x80:
+            end -= 1
+        pieces.append(data[start:end])
+        start = end
+        limit = MAX_LINE_OCTETS - 1
+    pieces.append(data[start:])
+    return b"\r\n ".join(pieces) + b"\r\n"
 
-    # ICS header
-    ics_lines = [
+
+def _content_lines(lines: Iterable[str]) -> bytes:
+    return b"".join(map(fold_line, lines))
+
+
+ICS_HEADER = _join_lines(
+    [
         "BEGIN:VCALENDAR",
         "VERSION:2.0",
         "PRODID:-//UC Berkeley Schedule//Schedule Planner//EN",
         "CALSCALE:GREGORIAN",
         "METHOD:PUBLISH",
     ]
+)
+ICS_FOOTER = _join_lines(["END:VCALENDAR"])
+ICS_HEADER_BYTES = ICS_HEADER.encode("ascii")
+ICS_FOOTER_BYTES = ICS_FOOTER.encode("ascii")
+
+# Header for the second calendar object in a delta export, which retracts
+# events that were removed since the previous export
+ICS_CANCEL_HEADER = ICS_HEADER.replace("METHOD:PUBLISH", "METHOD:CANCEL")
+
+
+def _course_properties(cls: Course) -> bytes:
+    """
+    The event properties shared by every meeting of a course, escaped,
+    folded and encoded once per course rather than once per event
+    """
+    description = f"Instructor: {handle_instructor(cls.instructor)}\nCourse: {cls.number}"
+    return _content_lines([
+        f"SUMMARY:{escape_text(f'{cls.name} - {cls.number}')}",
+        f"LOCATION:{escape_text(cls.location)}",
+        f"DESCRIPTION:{escape_text(description)}",
+    ])
+
+
+class ExportOptions(NamedTuple):
+    """Validated settings shared by every course in one calendar"""
+
+    semester_start: date
+    semester_end: date
+    recurrence: str
+    excluded: frozenset[date]
+
+
+class Meeting(NamedTuple):
+    """A course with its meeting weekdays, and start and end as minutes"""
+
+    course: Course
+    weekdays: list[int]
+    start_minute: int
+    end_minute: int
+    # Unique within the calendar, see prepare_meetings
+    key: str
+
 
+def parse_export_options(
+    semester_start_str: str,
+    semester_end_str: str,
+    recurrence: str = "expanded",
+    exclude_dates: list[str] | None = None,
+) -> ExportOptions:
+    if recurrence not in RECURRENCE_MODES:
+        raise ValueError(f"Unknown recurrence mode: {recurrence}")
+
+    return ExportOptions(
+        semester_start=parse_date(semester_start_str),
+        semester_end=parse_date(semester_end_str),
+        recurrence=recurrence,
+        excluded=frozenset(parse_date(d) for d in exclude_dates or []),
+    )
+
+
+def prepare_meetings(
+    classes: Iterable[Course], keys: dict[str, int] | None = None
+) -> list[Meeting]:
+    """
+    Check every course's meeting times, skipping courses that never meet.
+
+    Meetings whose key (see meeting_key) is already taken, like id-less
+    courses from a screenshot or a course listed twice, are numbered by
+    position: the second gets "-2", the third "-3". Pass the same keys dict
+    to calls for courses of one calendar to number across all of them.
+
+    Raises:
+        ValueError: If a course that meets has a start or end time that
+            doesn't parse
+    """
+    if keys is None:
+        keys = {}
+    meetings = []
     for cls in classes:
-        instructor = handle_instructor(cls.instructor)
-        parsed_days = parse_days(cls.schedule.days)
-        
-        for day in parsed_days:
-            if day not in DAY_TO_WEEKDAY:
+        schedule = cls.schedule
+        if not schedule.weekday_mask:
+            continue
+        if schedule.start_minute is None or schedule.end_minute is None:
+            raise ValueError(
+                f"Invalid meeting time for {cls.name} {cls.number}: "
+                f"{schedule.start_time!r} - {schedule.end_time!r}"
+            )
+        weekdays = mask_weekdays(schedule.weekday_mask)
+        key = meeting_key(cls, weekdays, schedule.start_minute)
+        keys[key] = position = keys.get(key, 0) + 1
+        if position > 1:
+            key = f"{key}-{position}"
+        meetings.append(
+            Meeting(cls, weekdays, schedule.start_minute, schedule.end_minute, key)
+        )
+    return meetings
+
+
+def iter_ics_file(
+    classes: list[Course],
+    semester_start_str: str,
+    semester_end_str: str,
+    recurrence: str = "expanded",
+    exclude_dates: list[str] | None = None,
+) -> Iterator[str]:
+    """
+    Generate ICS file content from parsed classes, one chunk per event.
+
+    Dates, times and the recurrence mode are all validated before the first
+    chunk is produced, so a caller that has started streaming the result
+    won't hit a parsing error halfway through. Every chunk ends in CRLF.
+
+    Args:
+        classes: Courses to export.
+        semester_start_str: First day of the semester, as YYYY-MM-DD.
+        semester_end_str: Last day of the semester, as YYYY-MM-DD.
+        recurrence: "expanded" writes one VEVENT per weekly meeting, "rrule"
+            writes one VEVENT per course with a weekly RRULE.
+        exclude_dates: YYYY-MM-DD dates with no class (holidays, breaks).
+            Meetings on these dates are skipped, or listed as EXDATEs in
+            "rrule" mode.
+
+    Raises:
+        ValueError: If a date, time or recurrence mode is invalid
+    """
+    options = parse_export_options(
+        semester_start_str, semester_end_str, recurrence, exclude_dates
+    )
+    meetings = prepare_meetings(classes)
+
+    return _iter_ics(meetings, options)
+
+
+def _iter_ics(meetings: list[Meeting], options: ExportOptions) -> Iterator[str]:
+    yield ICS_HEADER
+    for meeting in meetings:
+        yield from iter_meeting_events(meeting, options)
+    yield ICS_FOOTER
+
+
+def iter_ics_stream(
+    classes: Iterable[Course],
+    semester_start_str: str,
+    semester_end_str: str,
+    recurrence: str = "expanded",
+    exclude_dates: list[str] | None = None,
+) -> Iterator[str]:
+    """
+    Like iter_ics_file, but for courses that arrive one at a time, e.g. from
+    parser.iter_courses over a large export. Each course is checked and
+    written as it's read, so none are held in memory; a course with an
+    invalid time raises ValueError partway through the output instead of
+    before it. The dates and recurrence mode are still checked up front.
+
+    Raises:
+        ValueError: If a date or the recurrence mode is invalid
+    """
+    options = parse_export_options(
+        semester_start_str, semester_end_str, recurrence, exclude_dates
+    )
+    return _iter_ics_stream(classes, options)
+
+
+def _iter_ics_stream(classes: Iterable[Course], options: ExportOptions) -> Iterator[str]:
+    yield ICS_HEADER
+    keys: dict[str, int] = {}
+    for cls in classes:
+        for meeting in prepare_meetings([cls], keys):
+            yield from iter_meeting_events(meeting, options)
+    yield ICS_FOOTER
+
+
+def count_events(meetings: list[Meeting], options: ExportOptions) -> int:
+    """How many VEVENTs the calendar for these meetings will have"""
+    semester_start, semester_end, recurrence, excluded = options
+    total = 0
+    for meeting in meetings:
+        first_dates = [
+            first_weekday_on_or_after(semester_start, weekday)
+            for weekday in meeting.weekdays
+        ]
+        if recurrence == "rrule":
+            total += min(first_dates) <= semester_end
+            continue
+
+        for first_date, weekday in zip(first_dates, meeting.weekdays):
+            if first_date > semester_end:
                 continue
+            total += (semester_end - first_date).days // 7 + 1
+            total -= sum(
+                1
+                for d in excluded
+                if first_date <= d <= semester_end and d.weekday() == weekday
+            )
+    return total
+
+
+def render_meeting(meeting: Meeting, options: ExportOptions) -> bytes:
+    """All of one course's events, encoded and ready to send"""
+    return b"".join(_iter_event_bytes(meeting, options))
+
+
+def iter_meeting_events(meeting: Meeting, options: ExportOptions) -> Iterator[str]:
+    """One chunk per VEVENT for a single course"""
+    for event in _iter_event_bytes(meeting, options):
+        yield event.decode("utf-8")
+
+
+@lru_cache(maxsize=64)
+def _meeting_days(
+    semester_start: date, semester_end: date, excluded: frozenset[date], weekday: int
+) -> tuple[bytes, ...]:
+    """
+    Every date a weekday's meetings fall on, as YYYYMMDD. The same for every
+    course meeting on that weekday, so it's worked out once per calendar.
+    """
+    days = []
+    event_date = first_weekday_on_or_after(semester_start, weekday)
+    week = timedelta(days=7)
+    while event_date <= semester_end:
+        if event_date not in excluded:
+            days.append(_ics_date(event_date).encode("ascii"))
+        event_date += week
+    return tuple(days)
+
+
+def _iter_event_bytes(meeting: Meeting, options: ExportOptions) -> Iterator[bytes]:
+    """One encoded VEVENT at a time for a single course"""
+    cls, weekdays, start_minute, end_minute, key = meeting
+    semester_start, semester_end, recurrence, excluded = options
+    start_time, end_time = _ics_time(start_minute), _ics_time(end_minute)
+    properties = _course_properties(cls)
+
+    if recurrence == "rrule":
+        # The series starts on the first meeting day of the semester
+        first_date = min(
+            first_weekday_on_or_after(semester_start, weekday) for weekday in weekdays
+        )
+        if first_date > semester_end:
+            return
+
+        first_day = _ics_date(first_date)
+        byday = ",".join(WEEKDAY_TO_BYDAY[w] for w in weekdays)
+        event_lines = [
+            "BEGIN:VEVENT",
+            f"UID:{event_uid(key)}",
+            f"DTSTART:{first_day}{start_time}",
+            f"DTEND:{first_day}{end_time}",
+        ]
+        rule_lines = [
+            f"RRULE:FREQ=WEEKLY;BYDAY={byday};UNTIL={_ics_date(semester_end)}T235959",
+        ]
+
+        skipped = sorted(
+            d
+            for d in excluded
+            if first_date <= d <= semester_end and d.weekday() in weekdays
+        )
+        if skipped:
+            exdates = ",".join(f"{_ics_date(d)}{start_time}" for d in skipped)
+            rule_lines.append(f"EXDATE:{exdates}")
+
+        rule_lines.append("END:VEVENT")
+        yield _content_lines(event_lines) + properties + _content_lines(rule_lines)
+        return
+
+    # Only the date changes from one meeting of the course to the next, so
+    # each event is the date spliced between these
+    uid_start = f"BEGIN:VEVENT\r\nUID:{key}-".encode("utf-8")
+    dtstart = b"@calcentral-ics\r\nDTSTART:"
+    dtend = f"{start_time}\r\nDTEND:".encode("ascii")
+    event_end = f"{end_time}\r\n".encode("ascii") + properties + b"END:VEVENT\r\n"
+
+    for weekday in weekdays:
+        for day in _meeting_days(semester_start, semester_end, excluded, weekday):
+            yield b"".join((uid_start, day, dtstart, day, dtend, day, event_end))
+
+
+def write_ics(
+    out: io.BufferedIOBase, meetings: Iterable[Meeting], options: ExportOptions
+) -> int:
+    """Write a whole calendar to a binary file, returning how many events"""
+    events = 0
+    out.write(ICS_HEADER_BYTES)
+    for meeting in meetings:
+        for event in _iter_event_bytes(meeting, options):
+            out.write(event)
+            events += 1
+    out.write(ICS_FOOTER_BYTES)
+    return events
+
+
+def generate_ics_bytes(
+    classes: list[Course],
+    semester_start_str: str,
+    semester_end_str: str,
+    recurrence: str = "expanded",
+    exclude_dates: list[str] | None = None,
+) -> bytes:
+    """
+    Like generate_ics_file, but the encoded calendar, written straight to
+    bytes rather than built as a string and encoded afterwards
+
+    Raises:
+        ValueError: If a date, time or recurrence mode is invalid
+    """
+    options = parse_export_options(
+        semester_start_str, semester_end_str, recurrence, exclude_dates
+    )
+    meetings = prepare_meetings(classes)
+    out = io.BytesIO()
+    write_ics(out, meetings, options)
+    return out.getvalue()
+
+
+def generate_ics_file(
+    classes: list[Course],
+    semester_start_str: str,
+    semester_end_str: str,
+    recurrence: str = "expanded",
+    exclude_dates: list[str] | None = None,
+) -> str:
+    """Generate ICS file content from parsed classes, see iter_ics_file"""
+    return "".join(
+        iter_ics_file(
+            classes, semester_start_str, semester_end_str, recurrence, exclude_dates
+        )
+    )
+
+
+class EventDelta(NamedTuple):
+    """VEVENT chunks keyed by UID, sorted into what a re-export changes"""
+
+    added: dict[str, str]
+    changed: dict[str, str]
+    removed: dict[str, str]
+
+
+def _events_by_uid(meetings: list[Meeting], options: ExportOptions) -> dict[str, str]:
+    events = {}
+    for meeting in meetings:
+        for event in iter_meeting_events(meeting, options):
+            # every chunk starts with BEGIN:VEVENT then the UID line
+            uid = event.split("\r\n", 2)[1].removeprefix("UID:")
+            if uid in events:
+                raise ValueError(f"Duplicate event UID: {uid}")
+            events[uid] = event
+    return events
+
+
+def diff_events(
+    previous_meetings: list[Meeting], meetings: list[Meeting], options: ExportOptions
+) -> EventDelta:
+    """
+    Compare two exports event by event. UIDs are stable, so an event with the
+    same UID in both is the same meeting, and it changed if any of its
+    properties did.
+
+    Raises:
+        ValueError: If two events of one export share a UID, as meetings
+            not numbered by one prepare_meetings call can
+    """
+    previous = _events_by_uid(previous_meetings, options)
+    current = _events_by_uid(meetings, options)
+    return EventDelta(
+        added={uid: event for uid, event in current.items() if uid not in previous},
+        changed={
+            uid: event
+            for uid, event in current.items()
+            if uid in previous and previous[uid] != event
+        },
+        removed={uid: event for uid, event in previous.items() if uid not in current},
+    )
+
+
+def iter_delta_ics(delta: EventDelta, sequence: int = 1) -> Iterator[str]:
+    """
+    A delta export: one calendar with the added and changed events, the
+    changed ones carrying SEQUENCE so clients replace their copy, then, if
+    anything was removed, a METHOD:CANCEL calendar that cancels those UIDs.
+    """
+    yield ICS_HEADER
+    yield from delta.added.values()
+    for event in delta.changed.values():
+        yield _with_sequence(event, sequence)
+    yield ICS_FOOTER
+
+    if not delta.removed:
+        return
+
+    yield ICS_CANCEL_HEADER
+    for uid, event in delta.removed.items():
+        # DTSTART is the third line of every event
+        dtstart = event.split("\r\n", 3)[2]
+        yield _join_lines([
+            "BEGIN:VEVENT",
+            f"UID:{uid}",
+            dtstart,
+            f"SEQUENCE:{sequence}",
+            "STATUS:CANCELLED",
+            "END:VEVENT",
+        ])
+    yield ICS_FOOTER
+
+
+def _with_sequence(event: str, sequence: int) -> str:
+    begin, uid_line, rest = event.split("\r\n", 2)
+    return f"{begin}\r\n{uid_line}\r\nSEQUENCE:{sequence}\r\n{rest}"
+
+
+def generate_delta_ics_file(
+    previous_classes: list[Course],
+    classes: list[Course],
+    semester_start_str: str,
+    semester_end_str: str,
+    recurrence: str = "expanded",
+    exclude_dates: list[str] | None = None,
+    sequence: int = 1,
+) -> str:
+    """
+    Only what changed between an earlier export of previous_classes and an
+    export of classes with the same dates and options, see iter_delta_ics.
 
-            weekday = DAY_TO_WEEKDAY[day]
-
-            # Find the first occurrence of this weekday in the semester
-            current_date = semester_start
-            while current_date.weekday() != weekday:
-                current_date += timedelta(days=1)
-
-            # Parse start and end times
-            start_time_str = cls.schedule.start_time.replace(" ", "")
-            end_time_str = cls.schedule.end_time.replace(" ", "")
-
-            try:
-                start_time = datetime.strptime(start_time_str, "%I:%M%p").time()
-                end_time = datetime.strptime(end_time_str, "%I:%M%p").time()
-            except Exception as e:
-                # Try without minutes if parsing fails
-                print(f"Error parsing time: {e}")
-                try:
-                    start_time = datetime.strptime(start_time_str, "%I%p").time()
-                    end_time = datetime.strptime(end_time_str, "%I%p").time()
-                except Exception as e:
-                    raise e
-
-            # Generate recurring events for each week of the semester
-            event_date = current_date
-            while event_date <= semester_end:
-                start_datetime = datetime.combine(event_date, start_time)
-                end_datetime = datetime.combine(event_date, end_time)
-
-                # Format for ICS (UTC format)
-                start_utc = start_datetime.strftime("%Y%m%dT%H%M%S")
-                end_utc = end_datetime.strftime("%Y%m%dT%H%M%S")
-
-                # Generate unique ID
-                event_id = str(uuid.uuid4())
-
-                # Create event
-                ics_lines.extend(
-                    [
-                        "BEGIN:VEVENT",
-                        f"UID:{event_id}",
-                        f"DTSTART:{start_utc}",
-                        f"DTEND:{end_utc}",
-                        f"SUMMARY:{cls.name} - {cls.number}",
-                        f"LOCATION:{cls.location}",
-                        f"DESCRIPTION:Instructor: {instructor}\\nCourse: {cls.number}",
-                        "END:VEVENT",
-                    ]
-                )
-
-                # Move to next week
-                event_date += timedelta(days=7)
-
-    # ICS footer
-    ics_lines.append("END:VCALENDAR")
-
-    return "\r\n".join(ics_lines)
+    Raises:
+        ValueError: If a date, time or recurrence mode is invalid
+    """
+    options = parse_export_options(
+        semester_start_str, semester_end_str, recurrence, exclude_dates
+    )
+    delta = diff_events(
+        prepare_meetings(previous_classes), prepare_meetings(classes), options
+    )
+    return "".join(iter_delta_ics(delta, sequence))
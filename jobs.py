@@ -0,0 +1,189 @@
+"""
+CPU-bound steps the request handlers hand to the worker pool. These are
+module-level functions on plain data so a process pool can pickle them.
+"""
+
+from freebusy import (
+    WEEKDAY_NAMES,
+    busy_blocks,
+    combined_busy_week,
+    find_conflicts,
+    format_clock,
+    free_week,
+    parse_time,
+)
+from ics import (
+    ExportOptions,
+    Meeting,
+    count_events,
+    diff_events,
+    generate_ics_bytes,
+    iter_delta_ics,
+    parse_export_options,
+    prepare_meetings,
+)
+from ocr import recognize_text
+from parser import parse_class_chunk, parse_class_schedule
+from structs import Course
+
+
+def parse_schedule_text(schedule_text: str) -> list[dict]:
+    """Parse a pasted schedule into the serialized courses sent to the page"""
+    return [course.serialize() for course in parse_class_schedule(schedule_text)]
+
+
+def parse_schedule_chunks(chunks: list[str]) -> list[dict]:
+    """Parse "Enrolled" chunks of a paste that arrives in pieces"""
+    return [parse_class_chunk(chunk).serialize() for chunk in chunks]
+
+
+def prepare_export(
+    classes: list[Course],
+    semester_start: str,
+    semester_end: str,
+    recurrence: str = "expanded",
+    exclude_dates: list[str] | None = None,
+) -> tuple[list[Meeting], ExportOptions]:
+    """
+    Validate an export request: check the courses' meeting times along with
+    the semester dates.
+
+    Raises:
+        ValueError: If a date or time is invalid
+    """
+    options = parse_export_options(
+        semester_start, semester_end, recurrence, exclude_dates
+    )
+    meetings = prepare_meetings(classes)
+    return meetings, options
+
+
+def render_calendar(
+    classes: list[Course],
+    semester_start: str,
+    semester_end: str,
+    recurrence: str = "expanded",
+    exclude_dates: list[str] | None = None,
+) -> bytes:
+    """
+    The whole calendar as bytes, for saving rather than streaming.
+
+    Raises:
+        ValueError: If a date or time is invalid
+    """
+    return generate_ics_bytes(
+        classes, semester_start, semester_end, recurrence, exclude_dates
+    )
+
+
+def render_delta(
+    previous_classes: list[Course],
+    classes: list[Course],
+    semester_start: str,
+    semester_end: str,
+    recurrence: str = "expanded",
+    exclude_dates: list[str] | None = None,
+    sequence: int = 1,
+) -> tuple[bytes, tuple[int, int, int]]:
+    """
+    The delta calendar between two course lists, with the number of events
+    added, changed and removed.
+
+    Raises:
+        ValueError: If a date or time is invalid
+    """
+    options = parse_export_options(
+        semester_start, semester_end, recurrence, exclude_dates
+    )
+    delta = diff_events(
+        prepare_meetings(previous_classes), prepare_meetings(classes), options
+    )
+    body = "".join(iter_delta_ics(delta, sequence)).encode("utf-8")
+    return body, (len(delta.added), len(delta.changed), len(delta.removed))
+
+
+def prepare_text_export(
+    schedule_text: str,
+    semester_start: str,
+    semester_end: str,
+    recurrence: str = "expanded",
+    exclude_dates: list[str] | None = None,
+) -> tuple[list[dict], list[Meeting], ExportOptions, int]:
+    """
+    Parse a pasted schedule straight into an export, without the serialize
+    and deserialize round trip through the page. Returns the serialized
+    courses, their meetings, the export options and the number of events.
+
+    Raises:
+        ValueError: If a date or time is invalid
+    """
+    options = parse_export_options(
+        semester_start, semester_end, recurrence, exclude_dates
+    )
+    courses = parse_class_schedule(schedule_text)
+    meetings = prepare_meetings(courses)
+    return (
+        [course.serialize() for course in courses],
+        meetings,
+        options,
+        count_events(meetings, options),
+    )
+
+
+def parse_schedule_image(
+    image_bytes: bytes, timeout: float, max_width: int
+) -> tuple[str, list[dict]]:
+    """
+    OCR a schedule screenshot and parse the text. Returns the recognized text
+    and the serialized courses.
+
+    Raises:
+        ValueError: If the upload isn't a readable image
+        OCRTimeout: If tesseract runs longer than timeout seconds
+    """
+    text = recognize_text(image_bytes, timeout, max_width)
+    return text, parse_schedule_text(text)
+
+
+def free_busy(
+    schedules: list[list[Course]],
+    day_start: str = "8:00am",
+    day_end: str = "10:00pm",
+    min_minutes: int = 30,
+) -> dict:
+    """
+    Busy and free blocks per weekday across all the schedules, plus the
+    conflicts within each one, ready to send as JSON.
+
+    Raises:
+        ValueError: If day_start or day_end isn't a valid time
+    """
+    busy = combined_busy_week(schedules)
+    free = free_week(busy, parse_time(day_start), parse_time(day_end), min_minutes)
+
+    def blocks(week: list[list[tuple[int, int]]]) -> dict:
+        return {
+            WEEKDAY_NAMES[weekday]: [
+                {"start": format_clock(start), "end": format_clock(end)}
+                for start, end in day
+            ]
+            for weekday, day in enumerate(week)
+            if day
+        }
+
+    def describe(course: Course) -> dict:
+        return {"id": course.id, "name": course.name, "number": course.number}
+
+    conflicts = [
+        {
+            "schedule": index,
+            "first": describe(conflict.first),
+            "second": describe(conflict.second),
+            "day": WEEKDAY_NAMES[conflict.weekday],
+            "start": format_clock(conflict.start_minute),
+            "end": format_clock(conflict.end_minute),
+        }
+        for index, courses in enumerate(schedules)
+        for conflict in find_conflicts(courses)
+    ]
+    return {"busy": blocks(busy_blocks(busy)), "free": blocks(free), "conflicts": conflicts}
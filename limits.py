@@ -0,0 +1,86 @@
+"""Request body size limits, enforced before handlers read the body."""
+
+import json
+
+
+class BodySizeLimitMiddleware:
+    """
+    Answers 413 to requests with a body larger than max_bytes, or the limit
+    in overrides for the request's path.
+
+    A Content-Length over the limit is refused before anything is read. A
+    body without one (chunked uploads) is counted as the handler reads it;
+    once it goes over, the handler sees the client disconnect and whatever it
+    would have answered is replaced with the 413.
+    """
+
+    def __init__(self, app, max_bytes: int, overrides: dict[str, int] | None = None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.overrides = overrides or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.overrides.get(scope["path"], self.max_bytes)
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit():
+            if int(content_length) > limit:
+                await _send_too_large(send, limit)
+                return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def receive_limited():
+            nonlocal received, exceeded
+            if exceeded:
+                return {"type": "http.disconnect"}
+
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def send_unless_exceeded(message):
+            nonlocal response_started
+            if exceeded:
+                # the handler's answer to the cut-off body is dropped
+                if message["type"] == "http.response.start" and not response_started:
+                    response_started = True
+                    await _send_too_large(send, limit)
+                return
+
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive_limited, send_unless_exceeded)
+        except Exception:
+            # most likely the handler giving up on the disconnect
+            if not exceeded:
+                raise
+
+        if exceeded and not response_started:
+            await _send_too_large(send, limit)
+
+
+async def _send_too_large(send, limit: int) -> None:
+    body = json.dumps({"error": f"Request body is larger than {limit} bytes"}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 413,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            (b"connection", b"close"),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -1,13 +1,255 @@
+import codecs
+import json
+import logging
+import secrets
+from contextlib import asynccontextmanager
+from email.utils import formatdate, parsedate_to_datetime
+from functools import partial
+
 import uvicorn
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, Response
+from fastapi import FastAPI, File, Form, Request, UploadFile
+from fastapi.responses import (
+    HTMLResponse, JSONResponse, Response, StreamingResponse,
+)
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 
-from ics import generate_ics_file
-from parser import (  # Import deserialize_courses
-    deserialize_courses, parse_class_schedule,
+from batch import (
+    DEFAULT_CONCURRENCY, MAX_CONCURRENCY, build_batch_zip, iter_batch_jsonl,
+    read_records,
+)
+from cache import (
+    LRUCache, SQLiteCache, bytes_key, canonical_key, content_key,
+    RecordedStream, etag_matches, normalize_schedule_text,
+)
+from capture import CaptureMiddleware, CaptureWriter
+from compression import CompressionMiddleware, PrecompressedBody
+from config import (
+    APP_CACHE_MAX_AGE, BATCH_MAX_BYTES, CACHE_BACKEND, CALENDAR_DB_PATH,
+    CAPTURE_PATH, CAPTURE_SAMPLE_RATE, COMPRESSION_MIN_SIZE,
+    ICS_CACHE_MAX_BYTES, ICS_CACHE_SIZE, ICS_CACHE_TTL, MAX_BODY_BYTES,
+    OCR_CACHE_SIZE, OCR_CACHE_TTL, OCR_MAX_BYTES, OCR_MAX_WIDTH, OCR_POOL_KIND,
+    OCR_POOL_QUEUE, OCR_POOL_SIZE, OCR_TIMEOUT, PARSE_CACHE_SIZE,
+    PARSE_CACHE_TTL, PROFILE_ALLOW_HEADER, PROFILE_DIR, PROFILE_KEEP,
+    PROFILE_SAMPLE_RATE, PROFILE_TOKEN, RETRY_AFTER, SHARED_CACHE_MAX_BYTES,
+    SHARED_CACHE_PATH,
+    WORKER_POOL_KIND, WORKER_POOL_QUEUE, WORKER_POOL_SIZE,
+)
+from executor import PoolSaturated, WorkerPool
+from ics import ICS_FOOTER_BYTES, ICS_HEADER_BYTES, render_meeting
+from jobs import (
+    free_busy, parse_schedule_chunks, parse_schedule_image, parse_schedule_text,
+    prepare_export, prepare_text_export, render_calendar, render_delta,
 )
+from limits import BodySizeLimitMiddleware
+from metrics import (
+    CACHE_ENTRIES, CACHE_ERRORS, CACHE_HITS, CACHE_MISSES, COURSES_PARSED,
+    EVENTS_EMITTED, POOL_PENDING, POOL_REJECTED, REGISTRY, REQUEST_COURSES,
+    REQUEST_EVENTS, STAGE_LATENCY, MetricsMiddleware, mark_error,
+)
+from ocr import OCRTimeout
+from parser import EnrolledChunker
+from profiling import SORT_KEYS, ProfileStore, ProfilingMiddleware, tag_profile
+from schema import (
+    DeltaRequest, FreeBusyRequest, GenerateRequest, ParseRequest, RequestT,
+    SchemaError, TextExportRequest, decode_request,
+)
+from store import CalendarStore, StoredCalendar
+
+logger = logging.getLogger(__name__)
+
+# Parsing and ICS generation run here so they never block the event loop
+worker_pool = WorkerPool(kind=WORKER_POOL_KIND, max_workers=WORKER_POOL_SIZE,
+                         max_queue=WORKER_POOL_QUEUE)
+
+# Screenshot OCR gets its own, smaller pool, so a few slow images can't hold
+# up text parsing and calendar exports
+ocr_pool = WorkerPool(kind=OCR_POOL_KIND, max_workers=OCR_POOL_SIZE,
+                      max_queue=OCR_POOL_QUEUE)
+
+capture_writer = CaptureWriter(CAPTURE_PATH) if CAPTURE_PATH else None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    worker_pool.start()
+    # the OCR pool starts on the first upload, so servers that never see one
+    # don't keep idle OCR processes around
+    yield
+    worker_pool.shutdown()
+    ocr_pool.shutdown()
+    calendar_store.close()
+    for cache in (parse_cache, ocr_cache, ics_cache):
+        cache.close()
+    if capture_writer is not None:
+        capture_writer.close()
+
+
+app = FastAPI(title="UC Berkeley Schedule to Google Calendar",
+              lifespan=lifespan)
+if capture_writer is not None:
+    app.add_middleware(CaptureMiddleware, writer=capture_writer,
+                       sample_rate=CAPTURE_SAMPLE_RATE,
+                       exclude=("/metrics", "/cache-stats", "/pool-stats",
+                                "/profiles"))
+app.add_middleware(BodySizeLimitMiddleware, max_bytes=MAX_BODY_BYTES, overrides={
+    "/batch": BATCH_MAX_BYTES,
+    # room for the multipart framing and form fields around the image
+    "/parse-image-schedule": OCR_MAX_BYTES + 64 * 1024,
+})
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+
+# The slowest profiled requests, see /profiles
+profile_store = ProfileStore(PROFILE_DIR, keep=PROFILE_KEEP)
+app.add_middleware(ProfilingMiddleware, store=profile_store,
+                   sample_rate=PROFILE_SAMPLE_RATE,
+                   allow_header=PROFILE_ALLOW_HEADER)
+
+# added last so it's outermost, and its timings include compression
+app.add_middleware(MetricsMiddleware)
+
+
+def make_cache(name: str, max_size: int, ttl: float) -> LRUCache | SQLiteCache:
+    if CACHE_BACKEND == "sqlite":
+        return SQLiteCache(SHARED_CACHE_PATH, name, max_size=max_size,
+                           max_bytes=SHARED_CACHE_MAX_BYTES, ttl=ttl)
+    if CACHE_BACKEND != "memory":
+        raise ValueError(f"Unknown cache backend: {CACHE_BACKEND}")
+    return LRUCache(max_size=max_size, ttl=ttl)
+
+
+async def cache_get(cache: LRUCache | SQLiteCache, key: str):
+    # the shared cache can wait on another process's write to SQLite
+    if isinstance(cache, SQLiteCache):
+        return await run_in_threadpool(cache.get, key)
+    return cache.get(key)
+
+
+async def cache_set(cache: LRUCache | SQLiteCache, key: str, value) -> None:
+    if isinstance(cache, SQLiteCache):
+        await run_in_threadpool(cache.set, key, value)
+    else:
+        cache.set(key, value)
+
+
+def all_cache_stats() -> dict:
+    """Stats of every cache, which for the shared cache reads SQLite"""
+    return {
+        "parse": parse_cache.stats(),
+        "ocr": ocr_cache.stats(),
+        "ics": ics_cache.stats(),
+    }
+
+
+# Serialized courses by hash of the normalized schedule text
+parse_cache = make_cache("parse", PARSE_CACHE_SIZE, PARSE_CACHE_TTL)
+
+# OCR text and serialized courses by hash of the uploaded image
+ocr_cache = make_cache("ocr", OCR_CACHE_SIZE, OCR_CACHE_TTL)
+
+# Rendered ICS bytes by hash of the courses, dates and export options
+ics_cache = make_cache("ics", ICS_CACHE_SIZE, ICS_CACHE_TTL)
+
+# Saved calendars behind the webcal feeds
+calendar_store = CalendarStore(CALENDAR_DB_PATH)
+
+
+def busy_response() -> Response:
+    return Response(
+        content='{"error": "Server is busy, please try again shortly"}',
+        status_code=503,
+        media_type="application/json",
+        headers={"Retry-After": str(RETRY_AFTER)},
+    )
+
+
+async def render_ics(meetings, options, route: str):
+    """Stream a calendar, rendering one course at a time on the worker pool"""
+    generate_seconds = 0.0
+    events = 0
+
+    yield ICS_HEADER_BYTES
+    for meeting in meetings:
+        chunk, elapsed = await worker_pool.run_timed(
+            render_meeting, meeting, options, admit=False)
+        generate_seconds += elapsed
+        events += chunk.count(b"BEGIN:VEVENT")
+        yield chunk
+    yield ICS_FOOTER_BYTES
+
+    STAGE_LATENCY.observe(generate_seconds, stage="generate_ics_file")
+    EVENTS_EMITTED.inc(events)
+    REQUEST_EVENTS.set(events, route=route)
+    tag_profile(events=events)
+
+
+def ics_headers(cache_key: str) -> dict:
+    return {
+        "Content-Disposition":
+        "attachment; filename=uc_berkeley_schedule.ics",
+        "Content-Type": "text/calendar; charset=utf-8",
+        "ETag": f'"{cache_key}"',
+    }
 
-app = FastAPI(title="UC Berkeley Schedule to Google Calendar")
+
+async def cached_ics_response(request: Request, cache_key: str) -> Response | None:
+    """A 304 or the cached calendar for cache_key, if there is one"""
+    etag = f'"{cache_key}"'
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    ics_content = await cache_get(ics_cache, cache_key)
+    if ics_content is None:
+        return None
+    return Response(
+        content=ics_content,
+        media_type="text/calendar",
+        headers=ics_headers(cache_key),
+    )
+
+
+def ics_response(meetings, options, cache_key: str, route: str) -> Response:
+    """
+    Stream a calendar, and once it's sent keep a copy in the cache if it's
+    small enough
+    """
+    stream = RecordedStream(render_ics(meetings, options, route), ICS_CACHE_MAX_BYTES)
+
+    async def cache_body():
+        if stream.body is not None:
+            await cache_set(ics_cache, cache_key, stream.body)
+
+    return StreamingResponse(
+        content=stream,
+        media_type="text/calendar",
+        headers=ics_headers(cache_key),
+        background=BackgroundTask(cache_body),
+    )
+
+
+def generate_cache_key(data: GenerateRequest) -> str:
+    """Hash of everything that decides what a /generate-ics body renders"""
+    return canonical_key({
+        "classes": [course.serialize() for course in data.classes],
+        "semester_start": data.semester_start,
+        "semester_end": data.semester_end,
+        "recurrence": data.recurrence,
+        "exclude_dates": data.exclude_dates,
+    })
+
+
+async def decode_body(request: Request, request_type: type[RequestT]) -> RequestT:
+    body = await request.body()
+    with STAGE_LATENCY.time(stage="json_decode"):
+        return decode_request(body, request_type)
+
+
+def schema_error_response(error: SchemaError) -> Response:
+    return Response(
+        content=json.dumps({"error": f"Invalid request: {error}"}),
+        status_code=400,
+        media_type="application/json",
+    )
 
 
 @app.get("/")
@@ -15,9 +257,8 @@ async def health_check():
     return {"status": "healthy", "timestamp": "2025-08-28"}
 
 
-@app.get("/app", response_class=HTMLResponse, status_code=200)
-async def main_page():
-    return """<!DOCTYPE html>
+# The single-page frontend, compressed once at import rather than per request
+APP_PAGE = """<!DOCTYPE html>
 <html>
 <head>
     <title>UC Berkeley Schedule Parser</title>
@@ -214,80 +455,777 @@ async def main_page():
     </html>
     """
 
+app_page = PrecompressedBody(APP_PAGE.encode("utf-8"))
+
+
+@app.get("/app", response_class=HTMLResponse, status_code=200)
+async def main_page(request: Request):
+    body, etag, encoding = app_page.select(request.headers.get("accept-encoding"))
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={APP_CACHE_MAX_AGE}",
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return HTMLResponse(content=body, headers=headers)
+
+
+async def parse_streamed_text(request: Request) -> Response:
+    """
+    Parse a text/plain body as it arrives. The class entries each piece of
+    the body completes go to the worker pool together, so only the entry in
+    progress and one piece's worth of entries are held, never the whole
+    paste. The semester dates come from the query string.
+
+    The parse cache is keyed by the whole normalized paste, so it isn't
+    consulted here.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    chunker = EnrolledChunker()
+    courses_for_frontend = []
+    has_text = False
+    text_length = 0
+    parse_seconds = 0.0
+
+    async def parse(chunks: list[str]) -> None:
+        nonlocal parse_seconds
+        if chunks:
+            courses, elapsed = await worker_pool.run_timed(
+                parse_schedule_chunks, chunks)
+            courses_for_frontend.extend(courses)
+            parse_seconds += elapsed
+
+    async for piece in request.stream():
+        text = decoder.decode(piece)
+        text_length += len(text)
+        has_text = has_text or (bool(text) and not text.isspace())
+        await parse(chunker.feed(text))
+    await parse(chunker.feed(decoder.decode(b"", final=True)) + chunker.finish())
+
+    if not has_text:
+        return JSONResponse({"error": "No schedule text provided"})
+
+    STAGE_LATENCY.observe(parse_seconds, stage="parse_class_schedule")
+    COURSES_PARSED.inc(len(courses_for_frontend))
+    REQUEST_COURSES.set(len(courses_for_frontend), route="/parse-text-schedule")
+    tag_profile(text_length=text_length, courses=len(courses_for_frontend))
+
+    with STAGE_LATENCY.time(stage="response_encode"):
+        return JSONResponse({
+            "success": True,
+            "classes": courses_for_frontend,
+            "semester_start": request.query_params.get("semester_start", ""),
+            "semester_end": request.query_params.get("semester_end", ""),
+            "method": "text_parsing",
+        })
+
 
 @app.post("/parse-text-schedule")
 async def parse_text_schedule(request: Request):
+    """
+    Parse pasted schedule text sent as {"schedule_text": ...}, or streamed as
+    a text/plain body with the semester dates in the query string.
+    """
     try:
-        data = await request.json()
-        schedule_text = data.get("schedule_text", "")
-        semester_start = data.get("semester_start", "")
-        semester_end = data.get("semester_end", "")
+        if request.headers.get("content-type", "").startswith("text/plain"):
+            return await parse_streamed_text(request)
+
+        data = await decode_body(request, ParseRequest)
+        schedule_text = data.schedule_text
+        semester_start = data.semester_start
+        semester_end = data.semester_end
 
         if not schedule_text.strip():
             return {"error": "No schedule text provided"}
 
-        # Parse the text to extract classes
-        parsed_courses = parse_class_schedule(schedule_text)
+        # Students re-paste the same text, so look for it in the cache first
+        schedule_text = normalize_schedule_text(schedule_text)
+        cache_key = content_key(schedule_text)
+        courses_for_frontend = await cache_get(parse_cache, cache_key)
+
+        if courses_for_frontend is None:
+            # Parse the text to extract classes, in the format expected by
+            # the frontend
+            courses_for_frontend, elapsed = await worker_pool.run_timed(
+                parse_schedule_text, schedule_text)
+            STAGE_LATENCY.observe(elapsed, stage="parse_class_schedule")
+            COURSES_PARSED.inc(len(courses_for_frontend))
+            await cache_set(parse_cache, cache_key, courses_for_frontend)
+
+        REQUEST_COURSES.set(len(courses_for_frontend),
+                            route="/parse-text-schedule")
+        tag_profile(text_length=len(schedule_text),
+                    courses=len(courses_for_frontend))
 
-        # Convert to the format expected by the frontend using Course.serialize()
-        courses_for_frontend = []
-        for cls in parsed_courses:
-            courses_for_frontend.append(cls.serialize())
+        with STAGE_LATENCY.time(stage="response_encode"):
+            return JSONResponse({
+                "success": True,
+                "classes": courses_for_frontend,
+                "semester_start": semester_start,
+                "semester_end": semester_end,
+                "method": "text_parsing",
+            })
 
-        return {
+    except SchemaError as e:
+        return schema_error_response(e)
+
+    except PoolSaturated:
+        return busy_response()
+
+    except Exception as e:
+        mark_error(request.scope)
+        return {"error": str(e)}
+
+
+@app.post("/parse-image-schedule")
+async def parse_image_schedule(
+    request: Request,
+    image: UploadFile = File(...),
+    semester_start: str = Form(""),
+    semester_end: str = Form(""),
+):
+    """
+    Like /parse-text-schedule, but for a screenshot of the schedule. The
+    response also has the text OCR read from the image.
+    """
+    try:
+        image_bytes = await image.read(OCR_MAX_BYTES + 1)
+        if len(image_bytes) > OCR_MAX_BYTES:
+            return Response(
+                content=json.dumps({
+                    "error": f"Image is larger than {OCR_MAX_BYTES} bytes"
+                }),
+                status_code=413,
+                media_type="application/json",
+            )
+        if not image_bytes:
+            return Response(
+                content='{"error": "No image provided"}',
+                status_code=400,
+                media_type="application/json",
+            )
+
+        # The same screenshot gets uploaded again after a failed export
+        cache_key = bytes_key(image_bytes)
+        result = await cache_get(ocr_cache, cache_key)
+
+        if result is None:
+            result, elapsed = await ocr_pool.run_timed(
+                parse_schedule_image, image_bytes, OCR_TIMEOUT, OCR_MAX_WIDTH)
+            STAGE_LATENCY.observe(elapsed, stage="ocr")
+            COURSES_PARSED.inc(len(result[1]))
+            await cache_set(ocr_cache, cache_key, result)
+
+        text, courses_for_frontend = result
+        REQUEST_COURSES.set(len(courses_for_frontend),
+                            route="/parse-image-schedule")
+
+        return JSONResponse({
             "success": True,
             "classes": courses_for_frontend,
+            "text": text,
             "semester_start": semester_start,
             "semester_end": semester_end,
-            "method": "text_parsing",
-        }
+            "method": "ocr",
+        })
+
+    except PoolSaturated:
+        return busy_response()
+
+    except OCRTimeout as e:
+        return Response(
+            content=json.dumps({"error": str(e)}),
+            status_code=504,
+            media_type="application/json",
+        )
+
+    except ValueError as e:
+        return Response(
+            content=json.dumps({"error": str(e)}),
+            status_code=400,
+            media_type="application/json",
+        )
 
     except Exception as e:
+        mark_error(request.scope)
         return {"error": str(e)}
 
 
 @app.post("/generate-ics")
 async def generate_ics(request: Request):
     try:
-        data = await request.json()
-        classes_data = data.get("classes", [])
-        semester_start = data.get("semester_start", "")
-        semester_end = data.get("semester_end", "")
+        # Decoding builds the Course objects and checks every field's type
+        data = await decode_body(request, GenerateRequest)
+        classes = data.classes
+        semester_start = data.semester_start
+        semester_end = data.semester_end
+        recurrence = data.recurrence
+        exclude_dates = data.exclude_dates
 
-        if not classes_data:
+        if not classes:
             return Response(
                 content='{"error": "No classes to export"}',
                 status_code=400,
                 media_type="application/json",
             )
 
-        # Convert dictionary data back to Course objects using deserialize_courses
-        course_objects = deserialize_courses(classes_data)
+        # The same courses and dates always render the same calendar, so a
+        # hash of them identifies the body before it's generated
+        cache_key = generate_cache_key(data)
+        cached = await cached_ics_response(request, cache_key)
+        if cached is not None:
+            return cached
+
+        # Validate every date and time, then stream the calendar one course at
+        # a time
+        (meetings, options), elapsed = await worker_pool.run_timed(
+            prepare_export, classes, semester_start, semester_end,
+            recurrence, exclude_dates,
+        )
+        STAGE_LATENCY.observe(elapsed, stage="prepare_export")
+        REQUEST_COURSES.set(len(classes), route="/generate-ics")
+        tag_profile(courses=len(classes))
+
+        return ics_response(meetings, options, cache_key, "/generate-ics")
+
+    except SchemaError as e:
+        return schema_error_response(e)
+
+    except PoolSaturated:
+        return busy_response()
+
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    except Exception as e:
+        logger.exception("Error generating ICS")
+        mark_error(request.scope)
+        return JSONResponse({"error": str(e)}, status_code=500)
+
 
-        # Generate ICS content
-        ics_content = generate_ics_file(course_objects, semester_start,
-                                        semester_end)
+@app.post("/generate-ics-delta")
+async def generate_ics_delta(request: Request):
+    """
+    Re-export after a schedule change. Takes a /generate-ics body plus the
+    previously exported "previous_classes", and returns only the events that
+    were added or changed, then a METHOD:CANCEL calendar for the removed
+    ones. The counts are in the X-Events-Added, X-Events-Changed and
+    X-Events-Removed headers.
+    """
+    try:
+        data = await decode_body(request, DeltaRequest)
+        if not data.classes and not data.previous_classes:
+            return Response(
+                content='{"error": "No classes to export"}',
+                status_code=400,
+                media_type="application/json",
+            )
 
-        response = Response(
+        (ics_content, (added, changed, removed)), elapsed = (
+            await worker_pool.run_timed(
+                render_delta, data.previous_classes, data.classes,
+                data.semester_start, data.semester_end, data.recurrence,
+                data.exclude_dates, data.sequence,
+            )
+        )
+        STAGE_LATENCY.observe(elapsed, stage="generate_delta")
+        REQUEST_COURSES.set(len(data.classes), route="/generate-ics-delta")
+        REQUEST_EVENTS.set(added + changed + removed,
+                           route="/generate-ics-delta")
+        tag_profile(courses=len(data.classes),
+                    events=added + changed + removed)
+
+        return Response(
             content=ics_content,
             media_type="text/calendar",
             headers={
                 "Content-Disposition":
-                "attachment; filename=uc_berkeley_schedule.ics",
+                "attachment; filename=uc_berkeley_schedule_update.ics",
                 "Content-Type": "text/calendar; charset=utf-8",
+                "X-Events-Added": str(added),
+                "X-Events-Changed": str(changed),
+                "X-Events-Removed": str(removed),
             },
         )
 
-        return response
+    except SchemaError as e:
+        return schema_error_response(e)
+
+    except PoolSaturated:
+        return busy_response()
+
+    # bad dates or times, or classes whose events can't be told apart
+    except ValueError as e:
+        return Response(
+            content=json.dumps({"error": str(e)}),
+            status_code=400,
+            media_type="application/json",
+        )
+
+    except Exception as e:
+        logger.exception("Error generating ICS delta")
+        mark_error(request.scope)
+        return Response(
+            content=json.dumps({"error": str(e)}),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.post("/text-to-ics")
+async def text_to_ics(request: Request):
+    """
+    Parse pasted schedule text and return the calendar in one call, for
+    clients that don't need to review the parsed classes first. With
+    "preview": true, returns the parsed classes and the number of events the
+    calendar would have instead.
+    """
+    try:
+        data = await decode_body(request, TextExportRequest)
+        schedule_text = data.schedule_text
+        semester_start = data.semester_start
+        semester_end = data.semester_end
+        recurrence = data.recurrence
+        exclude_dates = data.exclude_dates
+        preview = data.preview
+
+        if not schedule_text.strip():
+            return Response(
+                content='{"error": "No schedule text provided"}',
+                status_code=400,
+                media_type="application/json",
+            )
+
+        schedule_text = normalize_schedule_text(schedule_text)
+        cache_key = canonical_key({
+            "schedule_text": schedule_text,
+            "semester_start": semester_start,
+            "semester_end": semester_end,
+            "recurrence": recurrence,
+            "exclude_dates": exclude_dates,
+        })
+        if not preview:
+            cached = await cached_ics_response(request, cache_key)
+            if cached is not None:
+                return cached
+
+        (classes, meetings, options, events), elapsed = (
+            await worker_pool.run_timed(
+                prepare_text_export, schedule_text, semester_start,
+                semester_end, recurrence, exclude_dates,
+            )
+        )
+        STAGE_LATENCY.observe(elapsed, stage="parse_class_schedule")
+        COURSES_PARSED.inc(len(classes))
+        REQUEST_COURSES.set(len(classes), route="/text-to-ics")
+        tag_profile(text_length=len(schedule_text), courses=len(classes),
+                    events=events)
+        # /parse-text-schedule can reuse the parse
+        await cache_set(parse_cache, content_key(schedule_text), classes)
+
+        if not classes:
+            return Response(
+                content='{"error": "No classes to export"}',
+                status_code=400,
+                media_type="application/json",
+            )
+
+        if preview:
+            with STAGE_LATENCY.time(stage="response_encode"):
+                return JSONResponse({
+                    "success": True,
+                    "classes": classes,
+                    "events": events,
+                    "semester_start": semester_start,
+                    "semester_end": semester_end,
+                })
+
+        return ics_response(meetings, options, cache_key, "/text-to-ics")
+
+    except SchemaError as e:
+        return schema_error_response(e)
+
+    except PoolSaturated:
+        return busy_response()
+
+    except ValueError as e:
+        return Response(
+            content=json.dumps({"error": str(e)}),
+            status_code=400,
+            media_type="application/json",
+        )
 
     except Exception as e:
-        print(f"Error generating ICS: {str(e)}")
+        logger.exception("Error generating ICS from text")
+        mark_error(request.scope)
         return Response(
-            content=f'{{"error": "{str(e)}"}}',
+            content=json.dumps({"error": str(e)}),
             status_code=500,
             media_type="application/json",
         )
 
 
+async def render_saved_calendar(data: GenerateRequest) -> bytes:
+    """The full calendar for a request, from the ICS cache if it's there"""
+    cache_key = generate_cache_key(data)
+    ics_content = await cache_get(ics_cache, cache_key)
+    if ics_content is None:
+        ics_content, elapsed = await worker_pool.run_timed(
+            render_calendar, data.classes, data.semester_start,
+            data.semester_end, data.recurrence, data.exclude_dates,
+        )
+        STAGE_LATENCY.observe(elapsed, stage="generate_ics_file")
+        if len(ics_content) <= ICS_CACHE_MAX_BYTES:
+            await cache_set(ics_cache, cache_key, ics_content)
+    return ics_content
+
+
+def saved_calendar_response(request: Request, calendar: StoredCalendar,
+                            status_code: int = 200) -> JSONResponse:
+    feed_path = f"/calendars/{calendar.token}.ics"
+    return JSONResponse(
+        {
+            "success": True,
+            "token": calendar.token,
+            "feed_url": f"webcal://{request.url.netloc}{feed_path}",
+            "url": str(request.url.replace(path=feed_path, query="")),
+        },
+        status_code=status_code,
+    )
+
+
+@app.post("/free-busy")
+async def free_busy_times(request: Request):
+    """
+    Busy and free blocks per weekday, and overlapping courses. Takes
+    "classes" for one schedule or "schedules" for a group, whose free blocks
+    are the times when everyone is free.
+    """
+    try:
+        data = await decode_body(request, FreeBusyRequest)
+        schedules = data.schedules + ([data.classes] if data.classes else [])
+        if not schedules:
+            return Response(
+                content='{"error": "No classes provided"}',
+                status_code=400,
+                media_type="application/json",
+            )
+
+        result, elapsed = await worker_pool.run_timed(
+            free_busy, schedules, data.day_start, data.day_end,
+            data.min_minutes,
+        )
+        STAGE_LATENCY.observe(elapsed, stage="free_busy")
+        return JSONResponse({"success": True, **result})
+
+    except SchemaError as e:
+        return schema_error_response(e)
+
+    except PoolSaturated:
+        return busy_response()
+
+    except ValueError as e:
+        return Response(
+            content=json.dumps({"error": str(e)}),
+            status_code=400,
+            media_type="application/json",
+        )
+
+
+@app.post("/calendars")
+async def save_calendar(request: Request):
+    """
+    Save a calendar for subscribing to. Takes the same body as
+    /generate-ics and returns a token and the webcal:// feed URL.
+    """
+    try:
+        data = await decode_body(request, GenerateRequest)
+        if not data.classes:
+            return Response(
+                content='{"error": "No classes to export"}',
+                status_code=400,
+                media_type="application/json",
+            )
+
+        ics_content = await render_saved_calendar(data)
+        calendar = await run_in_threadpool(calendar_store.create, ics_content)
+        return saved_calendar_response(request, calendar, status_code=201)
+
+    except SchemaError as e:
+        return schema_error_response(e)
+
+    except PoolSaturated:
+        return busy_response()
+
+    except ValueError as e:
+        return Response(
+            content=json.dumps({"error": str(e)}),
+            status_code=400,
+            media_type="application/json",
+        )
+
+
+@app.put("/calendars/{token}")
+async def update_calendar(request: Request, token: str):
+    """
+    Replace a saved calendar, e.g. after a schedule change. Subscribers pick
+    up the new version on their next poll.
+    """
+    try:
+        data = await decode_body(request, GenerateRequest)
+        if not data.classes:
+            return Response(
+                content='{"error": "No classes to export"}',
+                status_code=400,
+                media_type="application/json",
+            )
+
+        ics_content = await render_saved_calendar(data)
+        calendar = await run_in_threadpool(
+            calendar_store.update, token, ics_content)
+        if calendar is None:
+            return Response(
+                content='{"error": "No such calendar"}',
+                status_code=404,
+                media_type="application/json",
+            )
+        return saved_calendar_response(request, calendar)
+
+    except SchemaError as e:
+        return schema_error_response(e)
+
+    except PoolSaturated:
+        return busy_response()
+
+    except ValueError as e:
+        return Response(
+            content=json.dumps({"error": str(e)}),
+            status_code=400,
+            media_type="application/json",
+        )
+
+
+@app.delete("/calendars/{token}")
+async def delete_calendar(token: str):
+    if not await run_in_threadpool(calendar_store.delete, token):
+        return Response(
+            content='{"error": "No such calendar"}',
+            status_code=404,
+            media_type="application/json",
+        )
+    return Response(status_code=204)
+
+
+def not_modified_since(if_modified_since: str | None, updated_at: float) -> bool:
+    """Whether an If-Modified-Since header value is at or after updated_at"""
+    if not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    # HTTP dates only have whole seconds
+    return int(updated_at) <= since
+
+
+@app.api_route("/calendars/{token}.ics", methods=["GET", "HEAD"])
+async def calendar_feed(request: Request, token: str):
+    """
+    The webcal feed for a saved calendar. Calendar apps poll this, so it only
+    looks up the stored bytes and answers conditional requests with a 304.
+    """
+    calendar = await run_in_threadpool(calendar_store.get, token)
+    if calendar is None:
+        return Response(
+            content='{"error": "No such calendar"}',
+            status_code=404,
+            media_type="application/json",
+        )
+
+    headers = {
+        "ETag": calendar.etag,
+        "Last-Modified": formatdate(calendar.updated_at, usegmt=True),
+        # Clients may keep it but should check back with us before using it
+        "Cache-Control": "no-cache",
+    }
+    # If-None-Match wins over If-Modified-Since when both are sent
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        not_modified = etag_matches(if_none_match, calendar.etag)
+    else:
+        not_modified = not_modified_since(
+            request.headers.get("if-modified-since"), calendar.updated_at)
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+
+    return Response(
+        content=calendar.body,
+        media_type="text/calendar",
+        headers={
+            **headers,
+            "Content-Disposition": "inline; filename=uc_berkeley_schedule.ics",
+            "Content-Type": "text/calendar; charset=utf-8",
+        },
+    )
+
+
+@app.get("/cache-stats")
+async def cache_stats():
+    return await run_in_threadpool(all_cache_stats)
+
+
+@app.get("/pool-stats")
+async def pool_stats():
+    return {"worker": worker_pool.stats(), "ocr": ocr_pool.stats()}
+
+
+def profiles_forbidden(request: Request) -> Response | None:
+    """
+    A 404 while profiling is off or no admin token is set, or a 403 for a
+    request without the token, or None to let it read the profiles
+    """
+    if not PROFILE_TOKEN or not (PROFILE_ALLOW_HEADER or PROFILE_SAMPLE_RATE > 0):
+        return Response(
+            content='{"error": "Not Found"}',
+            status_code=404,
+            media_type="application/json",
+        )
+    authorization = request.headers.get("authorization", "")
+    if not secrets.compare_digest(authorization.encode(),
+                                  f"Bearer {PROFILE_TOKEN}".encode()):
+        return Response(
+            content='{"error": "Forbidden"}',
+            status_code=403,
+            media_type="application/json",
+        )
+    return None
+
+
+@app.get("/profiles")
+async def list_profiles(request: Request):
+    """The slowest profiled requests, with their route and input sizes"""
+    forbidden = profiles_forbidden(request)
+    if forbidden is not None:
+        return forbidden
+    return {"profiles": await run_in_threadpool(profile_store.list)}
+
+
+@app.get("/profiles/{profile_id}")
+async def profile_report(request: Request, profile_id: str,
+                         sort: str = "cumulative", limit: int = 40,
+                         format: str = "text"):
+    """
+    A profile as pstats' table of its top functions, or with format=pstats
+    the raw dump, for loading into pstats or snakeviz.
+    """
+    forbidden = profiles_forbidden(request)
+    if forbidden is not None:
+        return forbidden
+
+    if sort not in SORT_KEYS:
+        return Response(
+            content=json.dumps({"error": f"Unknown sort key: {sort}"}),
+            status_code=400,
+            media_type="application/json",
+        )
+
+    if format == "pstats":
+        path = await run_in_threadpool(profile_store.dump_path, profile_id)
+        content = await run_in_threadpool(path.read_bytes) if path else None
+        media_type = "application/octet-stream"
+    else:
+        content = await run_in_threadpool(
+            profile_store.report, profile_id, sort, limit)
+        media_type = "text/plain; charset=utf-8"
+
+    if content is None:
+        return Response(
+            content='{"error": "No such profile"}',
+            status_code=404,
+            media_type="application/json",
+        )
+    return Response(content=content, media_type=media_type)
+
+
+def collect_gauges() -> None:
+    for name, pool in (("worker", worker_pool), ("ocr", ocr_pool)):
+        stats = pool.stats()
+        POOL_PENDING.set(stats["pending"], pool=name)
+        POOL_REJECTED.set_total(stats["rejected"], pool=name)
+
+
+REGISTRY.collectors.append(collect_gauges)
+
+
+@app.get("/metrics")
+async def metrics():
+    # read off the event loop, since the shared cache counts its entries in
+    # SQLite, then set on it like every other metric
+    for name, stats in (await run_in_threadpool(all_cache_stats)).items():
+        CACHE_HITS.set_total(stats["hits"], cache=name)
+        CACHE_MISSES.set_total(stats["misses"], cache=name)
+        CACHE_ERRORS.set_total(stats.get("errors", 0), cache=name)
+        CACHE_ENTRIES.set(stats["size"], cache=name)
+
+    return Response(
+        content=REGISTRY.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@app.post("/batch")
+async def batch(request: Request, format: str = "jsonl",
+                concurrency: int = DEFAULT_CONCURRENCY):
+    """
+    Parse and export many schedules in one call. The body is a JSON array or
+    JSONL of {schedule_text, semester_start, semester_end} records. Results
+    stream back as JSON lines in completion order, or as a zip of ICS files
+    with format=zip.
+    """
+    try:
+        records = read_records(await request.body())
+    except ValueError as e:
+        return Response(
+            content=json.dumps({"error": f"Invalid batch body: {e}"}),
+            status_code=400,
+            media_type="application/json",
+        )
+
+    if format not in ("jsonl", "zip"):
+        return Response(
+            content=json.dumps({"error": f"Unknown batch format: {format}"}),
+            status_code=400,
+            media_type="application/json",
+        )
+
+    concurrency = max(1, min(concurrency, MAX_CONCURRENCY))
+
+    # Admit the batch as a whole, then let its records queue on the pool
+    try:
+        worker_pool.check_capacity()
+    except PoolSaturated:
+        return busy_response()
+    run_job = partial(worker_pool.run, admit=False)
+
+    if format == "zip":
+        return Response(
+            content=await build_batch_zip(records, concurrency, run_job),
+            media_type="application/zip",
+            headers={
+                "Content-Disposition":
+                "attachment; filename=uc_berkeley_schedules.zip",
+            },
+        )
+
+    return StreamingResponse(
+        content=iter_batch_jsonl(records, concurrency, run_job),
+        media_type="application/x-ndjson",
+    )
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8080)
@@ -0,0 +1,247 @@
+"""
+Request and pipeline metrics, served in the Prometheus text format.
+
+Metrics are only updated from the event loop, so they need no locking.
+"""
+
+import math
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+
+# Prometheus' default latency buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Finer buckets for individual pipeline stages
+STAGE_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def set_total(self, value: float, **labels: str) -> None:
+        """For a counter that mirrors a running total kept elsewhere"""
+        self.values[self._key(labels)] = value
+
+    def samples(self) -> Iterator[str]:
+        for key, value in sorted(self.values.items()):
+            yield f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        self.values[self._key(labels)] = value
+
+    def samples(self) -> Iterator[str]:
+        for key, value in sorted(self.values.items()):
+            yield f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: a count per bucket (the last one is +Inf), the sum
+        self.values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        if key not in self.values:
+            self.values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = self.values[key]
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> Iterator[str]:
+        bucket_labels = (*self.labels, "le")
+        for key, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                labels = _format_labels(bucket_labels, (*key, _format_value(bound)))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labels, key)
+            yield f"{self.name}_sum{labels} {_format_value(total[0])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[Metric] = []
+        self.collectors: list[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        # let gauges that mirror other state refresh themselves first
+        for collect in self.collectors:
+            collect()
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.register(
+    Counter("http_requests_total", "HTTP requests handled", ("method", "route", "status"))
+)
+REQUEST_ERRORS = REGISTRY.register(
+    Counter(
+        "http_request_errors_total",
+        "HTTP requests that failed, by status or by an error in the body",
+        ("method", "route"),
+    )
+)
+REQUEST_LATENCY = REGISTRY.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Time from receiving a request to sending the end of its response",
+        ("method", "route"),
+    )
+)
+STAGE_LATENCY = REGISTRY.register(
+    Histogram(
+        "pipeline_stage_duration_seconds",
+        "Time spent in each step of handling a request",
+        ("stage",),
+        STAGE_BUCKETS,
+    )
+)
+COURSES_PARSED = REGISTRY.register(
+    Counter("courses_parsed_total", "Courses parsed from pasted schedules")
+)
+EVENTS_EMITTED = REGISTRY.register(
+    Counter("ics_events_emitted_total", "VEVENTs written to exported calendars")
+)
+REQUEST_COURSES = REGISTRY.register(
+    Gauge("request_courses", "Courses in the most recent request", ("route",))
+)
+REQUEST_EVENTS = REGISTRY.register(
+    Gauge("request_events", "VEVENTs in the most recent calendar exported", ("route",))
+)
+
+POOL_PENDING = REGISTRY.register(
+    Gauge("worker_pool_pending", "Jobs running or queued on the worker pool", ("pool",))
+)
+POOL_REJECTED = REGISTRY.register(
+    Counter("worker_pool_rejected_total", "Requests refused because the pool was full",
+            ("pool",))
+)
+CACHE_HITS = REGISTRY.register(Counter("cache_hits_total", "Cache hits", ("cache",)))
+CACHE_MISSES = REGISTRY.register(Counter("cache_misses_total", "Cache misses", ("cache",)))
+CACHE_ERRORS = REGISTRY.register(
+    Counter("cache_errors_total", "Cache reads and writes that failed and were skipped",
+            ("cache",))
+)
+CACHE_ENTRIES = REGISTRY.register(Gauge("cache_entries", "Cache entries", ("cache",)))
+
+
+def mark_error(scope: dict) -> None:
+    """Count a request as failed even though it answers with a 2xx status"""
+    scope.setdefault("state", {})["metrics_error"] = True
+
+
+class MetricsMiddleware:
+    """Counts requests and errors and times them, per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_and_record(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record)
+        finally:
+            route = scope.get("route")
+            labels = {
+                "method": scope["method"],
+                "route": route.path if route is not None else "unmatched",
+            }
+            REQUEST_LATENCY.observe(time.perf_counter() - start, **labels)
+            REQUESTS.inc(status=str(status), **labels)
+            if status >= 400 or scope.get("state", {}).get("metrics_error"):
+                REQUEST_ERRORS.inc(**labels)
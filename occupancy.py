@@ -0,0 +1,208 @@
+"""
+Room and time occupancy across many students' parsed schedules.
+
+Every weekly meeting becomes one interval per weekday, and intervals are kept
+sorted by start time per (location, weekday) and per weekday, so "who is in
+Latimer 120 at 12:30 on Monday" is a binary search rather than a scan.
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from collections.abc import AsyncIterable, Iterable
+from typing import NamedTuple
+
+from structs import DAY_TO_WEEKDAY, Course, mask_weekdays, parse_clock
+
+# The room number at the end of a location: "120" in "Latimer 120", "F295"
+# in "Haas Faculty Wing F295"
+ROOM_PATTERN = re.compile(r"\s+\S*\d\S*$")
+
+
+class Occupant(NamedTuple):
+    student: str
+    course: Course
+
+
+class Peak(NamedTuple):
+    """Most people in one place at once, and when that first happens"""
+
+    count: int
+    weekday: int
+    minute: int
+
+
+def building_of(location: str) -> str:
+    """The building part of a location, "Latimer" for "Latimer 120" """
+    return ROOM_PATTERN.sub("", location.strip()) or location.strip()
+
+
+def _weekday(day: int | str) -> int:
+    if isinstance(day, int):
+        return day
+    return DAY_TO_WEEKDAY[day]
+
+
+def _minute(time: int | str) -> int:
+    if isinstance(time, int):
+        return time
+    minute = parse_clock(time)
+    if minute is None:
+        raise ValueError(f"Invalid time: {time!r}")
+    return minute
+
+
+def _location_key(location: str) -> str:
+    return location.strip().casefold()
+
+
+class _Intervals:
+    """Half-open [start, end) intervals sorted by start, for stabbing queries"""
+
+    __slots__ = ("starts", "ends", "ids", "max_length")
+
+    def __init__(self, intervals: list[tuple[int, int, int]]):
+        intervals.sort()
+        self.starts = [start for start, _, _ in intervals]
+        self.ends = [end for _, end, _ in intervals]
+        self.ids = [occupant_id for _, _, occupant_id in intervals]
+        self.max_length = max((end - start for start, end, _ in intervals), default=0)
+
+    def at(self, minute: int) -> list[int]:
+        # Only intervals starting within max_length before minute can still
+        # be running, so the search window stays small
+        lo = bisect_right(self.starts, minute - self.max_length)
+        hi = bisect_right(self.starts, minute)
+        ends, ids = self.ends, self.ids
+        return [ids[i] for i in range(lo, hi) if ends[i] > minute]
+
+    def overlapping(self, start: int, end: int) -> list[int]:
+        lo = bisect_right(self.starts, start - self.max_length)
+        hi = bisect_left(self.starts, end)
+        ends, ids = self.ends, self.ids
+        return [ids[i] for i in range(lo, hi) if ends[i] > start]
+
+
+class OccupancyIndex:
+    """
+    An interval index over many students' courses. Add schedules in bulk,
+    then query; the sorted arrays are rebuilt on the first query after an
+    add.
+    """
+
+    def __init__(self):
+        self.occupants: list[Occupant] = []
+        # (location key, weekday) and weekday to [start, end) intervals
+        self._by_location: dict[tuple[str, int], list[tuple[int, int, int]]] = (
+            defaultdict(list)
+        )
+        self._by_weekday: dict[int, list[tuple[int, int, int]]] = defaultdict(list)
+        self._locations: dict[str, str] = {}
+        self._built: tuple[dict, dict] | None = None
+
+    def add(self, student: str, courses: Iterable[Course]) -> None:
+        """Add one student's courses. Courses that never meet are skipped."""
+        for course in courses:
+            schedule = course.schedule
+            start, end = schedule.start_minute, schedule.end_minute
+            if not schedule.weekday_mask or start is None or end is None:
+                continue
+
+            occupant_id = len(self.occupants)
+            self.occupants.append(Occupant(student, course))
+            location = course.location.strip()
+            if location:
+                self._locations.setdefault(_location_key(location), location)
+            for weekday in mask_weekdays(schedule.weekday_mask):
+                interval = (start, end, occupant_id)
+                self._by_weekday[weekday].append(interval)
+                if location:
+                    self._by_location[_location_key(location), weekday].append(interval)
+        self._built = None
+
+    def add_many(self, schedules: Iterable[tuple[str, Iterable[Course]]]) -> None:
+        """Bulk ingest (student, courses) pairs"""
+        for student, courses in schedules:
+            self.add(student, courses)
+
+    async def add_batch_results(
+        self, results: AsyncIterable[tuple[int | str, dict]]
+    ) -> int:
+        """
+        Ingest (key, result) pairs as batch.iter_batch yields them with
+        process=batch.parse_record, taking each result's parsed courses.
+        Failed records are skipped. Returns the number of schedules added.
+        """
+        added = 0
+        async for key, result in results:
+            if "courses" not in result:
+                continue
+            self.add(str(key), result["courses"])
+            added += 1
+        return added
+
+    def _indexes(self) -> tuple[dict, dict]:
+        if self._built is None:
+            self._built = (
+                {key: _Intervals(list(v)) for key, v in self._by_location.items()},
+                {key: _Intervals(list(v)) for key, v in self._by_weekday.items()},
+            )
+        return self._built
+
+    def occupants_at(
+        self, location: str, day: int | str, time: int | str
+    ) -> list[Occupant]:
+        """Who is in location at a time, e.g. ("Latimer 120", "M", "12:30pm")"""
+        by_location, _ = self._indexes()
+        intervals = by_location.get((_location_key(location), _weekday(day)))
+        if intervals is None:
+            return []
+        return [self.occupants[i] for i in intervals.at(_minute(time))]
+
+    def occupants_during(
+        self, day: int | str, start: int | str, end: int | str
+    ) -> list[Occupant]:
+        """Everyone in class at some point between start and end on a day"""
+        _, by_weekday = self._indexes()
+        intervals = by_weekday.get(_weekday(day))
+        if intervals is None:
+            return []
+        ids = intervals.overlapping(_minute(start), _minute(end))
+        return [self.occupants[i] for i in ids]
+
+    def locations(self) -> list[str]:
+        return sorted(self._locations.values())
+
+    def peak_by_location(self) -> dict[str, Peak]:
+        """Most people in each room at once, over the whole week"""
+        return self._peaks(lambda key: self._locations[key])
+
+    def peak_by_building(self) -> dict[str, Peak]:
+        """Most people in each building at once, over the whole week"""
+        return self._peaks(lambda key: building_of(self._locations[key]))
+
+    def _peaks(self, group_of) -> dict[str, Peak]:
+        # Sweep line per (group, weekday): +1 at each start, -1 at each end,
+        # with ends first at equal times since intervals are half-open
+        events: dict[tuple[str, int], list[tuple[int, int]]] = defaultdict(list)
+        for (key, weekday), intervals in self._by_location.items():
+            group_events = events[group_of(key), weekday]
+            for start, end, _ in intervals:
+                group_events.append((start, 1))
+                group_events.append((end, -1))
+
+        peaks: dict[str, Peak] = {}
+        for (group, weekday), group_events in events.items():
+            group_events.sort()
+            count, best = 0, None
+            for minute, change in group_events:
+                count += change
+                if best is None or count > best.count:
+                    best = Peak(count, weekday, minute)
+
+            current = peaks.get(group)
+            if current is None or (best.count, -best.weekday) > (
+                current.count, -current.weekday
+            ):
+                peaks[group] = best
+        return peaks
@@ -0,0 +1,79 @@
+"""
+Text recognition for schedule screenshots. OpenCV and pytesseract are only
+imported inside the functions, so they're loaded by the worker processes that
+run OCR and not by the web server.
+"""
+
+import re
+
+# With preserve_interword_spaces, tesseract keeps the gap between two table
+# columns as a run of spaces, where a schedule pasted from the page has a tab
+COLUMN_GAP = re.compile(r" {2,}")
+
+
+class OCRTimeout(Exception):
+    """Raised when tesseract takes longer than the per-image timeout"""
+
+
+def preprocess_image(image_bytes: bytes, max_width: int = 2000):
+    """
+    Decode an uploaded image and prepare it for tesseract: grayscale,
+    downscaled to at most max_width pixels wide, then thresholded to black
+    text on white.
+
+    Raises:
+        ValueError: If the bytes aren't an image OpenCV can decode
+    """
+    import cv2
+    import numpy as np
+
+    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError("Upload is not a readable image")
+
+    height, width = image.shape
+    if width > max_width:
+        # Retina screenshots are twice the size tesseract needs, and OCR time
+        # grows with the pixel count
+        scale = max_width / width
+        image = cv2.resize(
+            image, (max_width, round(height * scale)), interpolation=cv2.INTER_AREA
+        )
+
+    # Otsu picks the threshold from the histogram, which copes with both light
+    # and dark mode screenshots once the dark ones are inverted
+    _, image = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if np.mean(image) < 128:
+        image = cv2.bitwise_not(image)
+    return image
+
+
+def columns_to_tabs(text: str) -> str:
+    """OCR text with its column gaps as tabs, the way parser.py reads them"""
+    return COLUMN_GAP.sub("\t", text)
+
+
+def recognize_text(image_bytes: bytes, timeout: float = 30, max_width: int = 2000) -> str:
+    """
+    OCR a schedule screenshot into text laid out like a pasted schedule,
+    columns separated by tabs.
+
+    Raises:
+        ValueError: If the bytes aren't a readable image
+        OCRTimeout: If tesseract runs longer than timeout seconds
+    """
+    import pytesseract
+
+    image = preprocess_image(image_bytes, max_width)
+    try:
+        # --psm 6 reads the page as one block of text, which keeps each
+        # table row on one line
+        text = pytesseract.image_to_string(
+            image, config="--psm 6 -c preserve_interword_spaces=1", timeout=timeout
+        )
+    except RuntimeError as e:
+        # pytesseract kills tesseract and raises a plain RuntimeError
+        if "timeout" in str(e).lower():
+            raise OCRTimeout(f"OCR took longer than {timeout:g}s") from None
+        raise
+    return columns_to_tabs(text)
@@ -1,4 +1,6 @@
+import mmap
 import re
+from collections.abc import Iterable, Iterator
 
 from structs import Course, Schedule
 
@@ -7,6 +9,21 @@ def split_time(time_str: str) -> tuple[str, str]:
     return time_str.split(" - ")
 
 
+# every class entry on the page starts with its enrollment status
+ENROLLED_MARKER = "Enrolled"
+
+# class number, subject, and course number, from the first line of a chunk
+CLASS_INFO_PATTERN = re.compile(r"^\s*(\d+)\s+([A-Za-z\s&]+?)\t+([\w\d]+)")
+
+# every other line is either a meeting (days, time and, if it's defined, the
+# location of the class) or an instructor name. Meetings always contain a dash
+# and names never do, so one membership test picks the pattern to run.
+MEETING_PATTERN = re.compile(
+    r"([MWFThTu]+)\s+([\d:]+[ap]m)\s+-\s+([\d:]+[ap]m)(?:\s+-\s+(.+))?"
+)
+INSTRUCTOR_PATTERN = re.compile(r"[A-Z][a-z]+\s[A-Z][a-z]+")
+
+
 def parse_class_schedule(text_blob: str) -> list[Course]:
     """
     Parses a raw text blob of a course schedule to extract structured information
@@ -20,83 +37,144 @@ def parse_class_schedule(text_blob: str) -> list[Course]:
               with its name, number, location, schedule, and instructors.
     """
     # split the text by "Enrolled" to isolate each class entry
-    class_chunks = text_blob.split("Enrolled")[1:]
-
-    extracted_classes = []
-
-    for chunk in class_chunks:
-        # define regex patterns to find the required information
-        # class number, subject, and course number
-        class_info_pattern = re.compile(r"^\s*(\d+)\s+([A-Za-z\s&]+?)\t+([\w\d]+)")
-
-        # days, time, and location of the class.
-        schedule_pattern = re.compile(
-            r"([MWFThTu]+)\s+([\d:]+[ap]m\s+-\s+[\d:]+[ap]m)\s+-\s+(.+)"
-        )
-
-        # schedule, but in case location isn't defined!
-        schedule_no_loc_pattern = re.compile(
-            r"([MWFThTu]+)\s+([\d:]+[ap]m\s+-\s+[\d:]+[ap]m)"
-        )
-
-        # instructor names
-        instructor_pattern = re.compile(r"^[A-Z][a-z]+\s[A-Z][a-z]+$")
-
-        # create the object representing our course
-        course: Course = Course()
-
-        # process each chunk line by line for clarity and simplicity.
-        lines = chunk.strip().split("\n")
-
-        # now, the first line contains our class info, so we'll check that before
-        # iterating
-        if lines:
-            class_info_match = class_info_pattern.match(lines[0])
-            if class_info_match:
-                id, subject, number = class_info_match.groups()
-                course.id = id
-                course.number = number.strip()
-                course.name = f"{subject.strip()}"
-
-        # now iterate through everything to populate location and instructors
-        for line in lines:
-            line = line.strip()
-
-            # Check for schedule with location
-            schedule_match = schedule_pattern.search(line)
-            if schedule_match:
-                days, time, location = schedule_match.groups()
-                course.schedule.days = days
-
-                # time
-                start_time, end_time = split_time(time)
-                course.schedule.start_time = start_time
-                course.schedule.end_time = end_time
-
-                # location
-                course.location = location.strip()
-                continue  # Move to the next line once schedule is found
-
-            # Check for schedule without location
-            schedule_no_loc_match = schedule_no_loc_pattern.search(line)
-            if schedule_no_loc_match:
-                days, time = schedule_no_loc_match.groups()
-                course.schedule.days = days.strip()
-
-                # Parse the time
-                start_time, end_time = split_time(time)
-                course.schedule.start_time = start_time
-                course.schedule.end_time = end_time
-                continue
+    class_chunks = text_blob.split(ENROLLED_MARKER)[1:]
+
+    return [parse_class_chunk(chunk) for chunk in class_chunks]
+
+
+class EnrolledChunker:
+    """
+    Splits text that arrives in pieces into the same chunks as
+    text.split("Enrolled")[1:], handing each one back as soon as the next
+    marker shows it's complete. Only the chunk in progress is kept, so memory
+    stays proportional to one class entry rather than the whole paste.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._started = False
+
+    def feed(self, text: str) -> list[str]:
+        """Add the next piece of text, returning any chunks it completed"""
+        parts = (self._buffer + text).split(ENROLLED_MARKER)
+        self._buffer = parts.pop()
+
+        if not self._started:
+            if not parts:
+                # Nothing to parse before the first marker, but the end of
+                # this piece may be the start of one
+                self._buffer = self._buffer[-(len(ENROLLED_MARKER) - 1):]
+                return []
+            self._started = True
+            # drop the page header before the first marker
+            parts = parts[1:]
+        return parts
+
+    def finish(self) -> list[str]:
+        """The last chunk, which runs to the end of the text"""
+        if not self._started:
+            return []
+        chunk, self._buffer = self._buffer, ""
+        return [chunk]
+
+
+def iter_enrolled_chunks(pieces: Iterable[str]) -> Iterator[str]:
+    """The "Enrolled" chunks of text that arrives in pieces"""
+    chunker = EnrolledChunker()
+    for piece in pieces:
+        yield from chunker.feed(piece)
+    yield from chunker.finish()
+
 
-            # Check for instructor names
-            instructor_match = instructor_pattern.match(line)
-            if instructor_match:
-                course.instructor.append(line)
+def parse_class_chunk(chunk: str) -> Course:
+    """Parse the text following one "Enrolled" marker into a Course"""
+    # create the object representing our course
+    course: Course = Course()
+
+    # process each chunk line by line for clarity and simplicity.
+    lines = chunk.strip().split("\n")
+
+    # now, the first line contains our class info, so we'll check that before
+    # iterating
+    _read_class_info(course, lines[0])
+
+    # now iterate through everything to populate schedule, location and
+    # instructors
+    for line in lines:
+        _read_line(course, line)
+
+    return course
+
+
+def _read_class_info(course: Course, line: str) -> None:
+    class_info_match = CLASS_INFO_PATTERN.match(line)
+    if class_info_match:
+        id, subject, number = class_info_match.groups()
+        course.id = id
+        course.number = number.strip()
+        course.name = f"{subject.strip()}"
+
+
+def _read_line(course: Course, line: str) -> None:
+    line = line.strip()
+
+    if "-" not in line:
+        if INSTRUCTOR_PATTERN.fullmatch(line):
+            course.instructor.append(line)
+        return
+
+    meeting_match = MEETING_PATTERN.search(line)
+    if meeting_match is None:
+        return
+
+    days, start_time, end_time, location = meeting_match.groups()
+    course.schedule.days = days
+    course.schedule.start_time = start_time
+    course.schedule.end_time = end_time
+
+    # location, if the line had one
+    if location is not None:
+        course.location = location.strip()
+
+
+def iter_courses(lines: Iterable[str] | Iterable[bytes] | mmap.mmap) -> Iterator[Course]:
+    """
+    Parse a schedule line by line, yielding each Course as soon as the next
+    "Enrolled" marker ends its entry. Takes any iterable of lines: a list, a
+    text or binary file, or a memory-mapped file. Bytes are read as UTF-8.
+    Gives the same courses as parse_class_schedule on the joined text, while
+    holding only the course being parsed.
+    """
+    if isinstance(lines, mmap.mmap):
+        # iterating an mmap gives single bytes, not lines
+        lines = iter(lines.readline, b"")
+
+    course = None
+    needs_class_info = False
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+
+        # a marker can start a new entry partway through a line
+        for i, piece in enumerate(line.split(ENROLLED_MARKER)):
+            if i > 0:
+                if course is not None:
+                    yield course
+                course = Course()
+                needs_class_info = True
+            if course is None:
+                continue
 
-        extracted_classes.append(course)
+            if needs_class_info:
+                # the class info is on the first line with any text on it
+                if piece.isspace() or not piece:
+                    continue
+                _read_class_info(course, piece.lstrip())
+                needs_class_info = False
+            _read_line(course, piece)
 
-    return extracted_classes
+    if course is not None:
+        yield course
 
 
 def deserialize_courses(courses_data: list[dict]) -> list[Course]:
@@ -0,0 +1,273 @@
+"""
+Opt-in request profiling. A request is profiled when it carries an X-Profile
+header (if the server allows it) or is picked by the sample rate, and the
+slowest profiles are kept on disk to be listed and read back later.
+
+Handlers tag the profile with the shape of their input through tag_profile,
+and work the request runs on the worker pool is profiled there and merged in,
+so a slow paste can be tied to the parser or ICS code it spent its time in.
+"""
+
+import asyncio
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import secrets
+import threading
+import time
+from collections.abc import Callable
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any
+
+PROFILE_HEADER = b"x-profile"
+
+# Orderings the report endpoint accepts, see pstats.Stats.sort_stats
+SORT_KEYS = ("cumulative", "tottime", "ncalls", "pcalls", "filename", "name")
+
+
+class _Capture:
+    """What's collected for the profile of the request being handled"""
+
+    def __init__(self):
+        self.tags: dict[str, Any] = {}
+        self.worker_stats: list[dict] = []
+
+
+_capture: ContextVar[_Capture | None] = ContextVar("profile_capture", default=None)
+
+
+def profiling_active() -> bool:
+    """Whether the request being handled is being profiled"""
+    return _capture.get() is not None
+
+
+def tag_profile(**tags: Any) -> None:
+    """Record input sizes on the current request's profile, if it has one"""
+    capture = _capture.get()
+    if capture is not None:
+        capture.tags.update(tags)
+
+
+def add_worker_stats(stats: dict | None) -> None:
+    capture = _capture.get()
+    if capture is not None and stats:
+        capture.worker_stats.append(stats)
+
+
+def profiled_call(fn: Callable[..., Any], *args: Any) -> tuple[Any, dict | None]:
+    """
+    fn(*args) under cProfile, for running on a pool worker. Returns the result
+    and the raw stats, or None for the stats if the call couldn't be profiled
+    here; from Python 3.12 one profiler covers every thread, so a thread
+    worker's work is already in the request's own profile.
+    """
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return fn(*args), None
+    try:
+        result = fn(*args)
+    finally:
+        profiler.disable()
+    profiler.create_stats()
+    return result, profiler.stats
+
+
+class _RawStats:
+    """Stats from a worker, in the shape pstats.Stats loads from a profiler"""
+
+    def __init__(self, stats: dict):
+        self.stats = stats
+
+    def create_stats(self) -> None:
+        pass
+
+
+class ProfileStore:
+    """
+    The `keep` slowest request profiles, each a pstats dump next to a JSON
+    file with its tags. Entries are read from the directory on every call, so
+    several server processes can share one.
+
+    Args:
+        directory: Where profiles are written, created on first use.
+        keep: Profiles kept; a new one replaces the fastest when full.
+    """
+
+    def __init__(self, directory: str, keep: int = 20):
+        self.directory = Path(directory)
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def _entries(self) -> list[dict]:
+        entries = []
+        if not self.directory.is_dir():
+            return entries
+        for path in self.directory.glob("*.json"):
+            try:
+                entries.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                # removed by another process, or half written
+                continue
+        return entries
+
+    def _remove(self, profile_id: str) -> None:
+        for suffix in (".prof", ".json"):
+            try:
+                os.remove(self.directory / f"{profile_id}{suffix}")
+            except FileNotFoundError:
+                pass
+
+    def add(self, stats: pstats.Stats, info: dict) -> dict | None:
+        """
+        Keep a profile if it's among the slowest. info needs a "duration" in
+        seconds. Returns the stored entry, or None if it wasn't kept.
+        """
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry["duration"])
+            if len(entries) >= self.keep and (
+                not entries or info["duration"] <= entries[0]["duration"]
+            ):
+                return None
+
+            self.directory.mkdir(parents=True, exist_ok=True)
+            profile_id = f"{int(time.time() * 1000)}-{secrets.token_hex(4)}"
+            entry = {"id": profile_id, **info}
+            stats.dump_stats(self.directory / f"{profile_id}.prof")
+            # the sidecar goes last, so a listed profile always has its dump
+            (self.directory / f"{profile_id}.json").write_text(json.dumps(entry))
+
+            for evicted in entries[:max(0, len(entries) + 1 - self.keep)]:
+                self._remove(evicted["id"])
+            return entry
+
+    def list(self) -> list[dict]:
+        """Stored profiles, slowest first"""
+        return sorted(self._entries(), key=lambda entry: -entry["duration"])
+
+    def get(self, profile_id: str) -> dict | None:
+        for entry in self._entries():
+            if entry["id"] == profile_id:
+                return entry
+        return None
+
+    def dump_path(self, profile_id: str) -> Path | None:
+        """The pstats dump of a stored profile, for snakeviz and the like"""
+        if self.get(profile_id) is None:
+            return None
+        return self.directory / f"{profile_id}.prof"
+
+    def report(self, profile_id: str, sort: str = "cumulative", limit: int = 40) -> str | None:
+        """
+        A stored profile as pstats' text table
+
+        Raises:
+            ValueError: If sort isn't one of SORT_KEYS
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {sort}")
+        path = self.dump_path(profile_id)
+        if path is None:
+            return None
+
+        out = io.StringIO()
+        stats = pstats.Stats(str(path), stream=out)
+        stats.sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests asked for with an X-Profile header (when allow_header
+    is set) and a sample_rate fraction of the rest, and hands the profiles
+    to a ProfileStore tagged with the route, status, duration and body size.
+
+    One request is profiled at a time per process. Other requests running on
+    the event loop meanwhile show up in its profile, which is part of why
+    profiling is opt-in.
+    """
+
+    def __init__(
+        self,
+        app,
+        store: ProfileStore,
+        sample_rate: float = 0.0,
+        allow_header: bool = False,
+        rng: Callable[[], float] = random.random,
+    ):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.allow_header = allow_header
+        self.rng = rng
+        self._profiling = False
+
+    def _wanted(self, scope) -> bool:
+        if self.allow_header and any(
+            name == PROFILE_HEADER for name, _ in scope["headers"]
+        ):
+            return True
+        return self.sample_rate > 0 and self.rng() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._profiling or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        received = 0
+        status = 500
+
+        async def receive_counted():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def send_and_record(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # something else, like a debugger or coverage, is profiling already
+            await self.app(scope, receive, send)
+            return
+
+        self._profiling = True
+        capture = _Capture()
+        token = _capture.set(capture)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive_counted, send_and_record)
+        finally:
+            profiler.disable()
+            duration = time.perf_counter() - start
+            _capture.reset(token)
+            self._profiling = False
+
+        stats = pstats.Stats(profiler)
+        for worker_stats in capture.worker_stats:
+            stats.add(_RawStats(worker_stats))
+
+        route = scope.get("route")
+        info = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": route.path if route is not None else "unmatched",
+            "status": status,
+            "duration": duration,
+            "request_bytes": received,
+            "created_at": time.time(),
+            **capture.tags,
+        }
+        await asyncio.to_thread(self.store.add, stats, info)
@@ -0,0 +1,86 @@
+"""
+Typed request bodies. msgspec decodes the raw bytes straight into these, and
+into the Course and Schedule dataclasses inside them, checking every field's
+type along the way, so a malformed payload is rejected before any handler
+code runs.
+"""
+
+from typing import TypeVar
+
+import msgspec
+
+from structs import Course
+
+RequestT = TypeVar("RequestT")
+
+
+class SchemaError(ValueError):
+    """A request body that isn't valid JSON or doesn't match its schema"""
+
+
+class ParseRequest(msgspec.Struct):
+    schedule_text: str = ""
+    semester_start: str = ""
+    semester_end: str = ""
+
+
+class GenerateRequest(msgspec.Struct):
+    classes: list[Course] = []
+    semester_start: str = ""
+    semester_end: str = ""
+    recurrence: str = "expanded"
+    exclude_dates: list[str] = []
+
+
+class DeltaRequest(msgspec.Struct):
+    previous_classes: list[Course] = []
+    classes: list[Course] = []
+    semester_start: str = ""
+    semester_end: str = ""
+    recurrence: str = "expanded"
+    exclude_dates: list[str] = []
+    # SEQUENCE for changed events: 1 after the first export, then one more
+    # for every delta after that
+    sequence: int = 1
+
+
+class FreeBusyRequest(msgspec.Struct):
+    # one schedule, or several to find a time that suits everyone
+    classes: list[Course] = []
+    schedules: list[list[Course]] = []
+    day_start: str = "8:00am"
+    day_end: str = "10:00pm"
+    min_minutes: int = 30
+
+
+class TextExportRequest(msgspec.Struct):
+    schedule_text: str = ""
+    semester_start: str = ""
+    semester_end: str = ""
+    recurrence: str = "expanded"
+    exclude_dates: list[str] = []
+    preview: bool = False
+
+
+_DECODERS = {
+    request_type: msgspec.json.Decoder(request_type)
+    for request_type in (
+        ParseRequest, GenerateRequest, DeltaRequest, FreeBusyRequest,
+        TextExportRequest,
+    )
+}
+
+
+def decode_request(body: bytes, request_type: type[RequestT]) -> RequestT:
+    """
+    Decode and validate a JSON request body.
+
+    Raises:
+        SchemaError: If the body isn't JSON or a field has the wrong type.
+            The message names the field, e.g. "Expected `str`, got `int` -
+            at `$.classes[0].schedule.days`"
+    """
+    try:
+        return _DECODERS[request_type].decode(body)
+    except msgspec.DecodeError as e:
+        raise SchemaError(str(e)) from None
@@ -0,0 +1,123 @@
+"""
+Saved calendars for webcal subscriptions. Each one is stored already
+rendered, so serving a feed is a single row lookup.
+"""
+
+import hashlib
+import secrets
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from typing import NamedTuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calendars (
+    token TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    etag TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+class StoredCalendar(NamedTuple):
+    token: str
+    body: bytes
+    etag: str
+    updated_at: float
+
+
+class CalendarStore:
+    """
+    Rendered ICS bodies in SQLite, keyed by an unguessable token. The
+    connection is opened on first use and shared between threads.
+
+    Args:
+        path: SQLite database file, or ":memory:".
+        clock: Wall-clock time source, replaceable in tests.
+    """
+
+    def __init__(self, path: str, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.clock = clock
+        self._connection: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(SCHEMA)
+            self._connection.commit()
+        return self._connection
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def create(self, body: bytes) -> StoredCalendar:
+        """Save a new calendar under a fresh token"""
+        token = secrets.token_urlsafe(16)
+        now = self.clock()
+        etag = _etag(body)
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT INTO calendars VALUES (?, ?, ?, ?, ?)",
+                (token, body, etag, now, now),
+            )
+            connection.commit()
+        return StoredCalendar(token, body, etag, now)
+
+    def update(self, token: str, body: bytes) -> StoredCalendar | None:
+        """
+        Replace a calendar's body, or return None if there's no such token.
+        An unchanged body keeps its ETag and modification time, so
+        subscribers aren't told to download it again.
+        """
+        etag = _etag(body)
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT etag, updated_at FROM calendars WHERE token = ?", (token,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[0] == etag:
+                return StoredCalendar(token, body, etag, row[1])
+
+            now = self.clock()
+            connection.execute(
+                "UPDATE calendars SET body = ?, etag = ?, updated_at = ? WHERE token = ?",
+                (body, etag, now, token),
+            )
+            connection.commit()
+        return StoredCalendar(token, body, etag, now)
+
+    def get(self, token: str) -> StoredCalendar | None:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT token, body, etag, updated_at FROM calendars WHERE token = ?",
+                (token,),
+            ).fetchone()
+        return StoredCalendar(*row) if row is not None else None
+
+    def delete(self, token: str) -> bool:
+        with self._lock:
+            connection = self._connect()
+            deleted = connection.execute(
+                "DELETE FROM calendars WHERE token = ?", (token,)
+            ).rowcount
+            connection.commit()
+        return deleted > 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM calendars").fetchone()[0]
+
+
+def _etag(body: bytes) -> str:
+    return f'"{hashlib.sha256(body).hexdigest()}"'
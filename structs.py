@@ -1,18 +1,106 @@
+import re
 from dataclasses import dataclass, field
+from functools import lru_cache
 
+# Day name to weekday number mapping
+DAY_TO_WEEKDAY = {
+    "Monday": 0,
+    "M": 0,
+    "Tuesday": 1,
+    "T": 1,
+    "Wednesday": 2,
+    "W": 2,
+    "Thursday": 3,
+    "Th": 3,
+    "Friday": 4,
+    "F": 4,
+    "Saturday": 5,
+    "Sa": 5,
+    "Sunday": 6,
+}
 
-@dataclass
+# 11:00am, 11:00 AM or 3pm
+CLOCK_PATTERN = re.compile(r"(\d{1,2})(?::(\d{2}))?\s*([ap])m", re.IGNORECASE)
+
+
+# A schedule only ever has a handful of distinct times and day strings, so
+# both parsers are cached
+@lru_cache(maxsize=4096)
+def parse_clock(time_str: str) -> int | None:
+    """Minutes since midnight for a time like '11:00am', or None if invalid"""
+    match = CLOCK_PATTERN.fullmatch(time_str.strip())
+    if match is None:
+        return None
+
+    hour, minute, meridiem = match.groups()
+    hour, minute = int(hour), int(minute or 0)
+    if not 1 <= hour <= 12 or minute > 59:
+        return None
+
+    return (hour % 12 + (12 if meridiem in "pP" else 0)) * 60 + minute
+
+
+@lru_cache(maxsize=4096)
+def weekday_mask(days_str: str) -> int:
+    """Bitmask of weekdays (bit 0 is Monday) for a day string like 'TTh'"""
+    mask = 0
+    i = 0
+    while i < len(days_str):
+        # Check for two-character codes first
+        two_char = days_str[i:i + 2]
+        if len(two_char) == 2 and two_char in DAY_TO_WEEKDAY:
+            mask |= 1 << DAY_TO_WEEKDAY[two_char]
+            i += 2
+            continue
+
+        if days_str[i] in DAY_TO_WEEKDAY:
+            mask |= 1 << DAY_TO_WEEKDAY[days_str[i]]
+        i += 1
+
+    return mask
+
+
+def mask_weekdays(mask: int) -> list[int]:
+    """Weekday numbers set in a weekday bitmask, Monday first"""
+    return [weekday for weekday in range(7) if mask >> weekday & 1]
+
+
+@dataclass(slots=True)
 class Schedule:
     start_time: str = ""  # 11:00a
     end_time: str = ""  # 12:30p
     days: str = ""  # MTWThF OR MTWRF
 
+    # Parsed forms of the strings above, kept in step whenever they're set:
+    # minutes since midnight (None if the time doesn't parse) and a bitmask
+    # of meeting weekdays with bit 0 for Monday
+    start_minute: int | None = field(default=None, init=False, repr=False, compare=False)
+    end_minute: int | None = field(default=None, init=False, repr=False, compare=False)
+    weekday_mask: int = field(default=0, init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # __init__ assigns the defaults above after the strings, and msgspec
+        # fills in fields without calling __setattr__, so parse once more
+        object.__setattr__(self, "start_minute", parse_clock(self.start_time))
+        object.__setattr__(self, "end_minute", parse_clock(self.end_time))
+        object.__setattr__(self, "weekday_mask", weekday_mask(self.days))
+
+    def __setattr__(self, name: str, value) -> None:
+        object.__setattr__(self, name, value)
+        if name == "start_time":
+            object.__setattr__(self, "start_minute", parse_clock(value))
+        elif name == "end_time":
+            object.__setattr__(self, "end_minute", parse_clock(value))
+        elif name == "days":
+            object.__setattr__(self, "weekday_mask", weekday_mask(value))
+
 
-@dataclass
+@dataclass(slots=True)
 class Course:
-    id: int = 0
+    # the parser fills in strings, e.g. "29901" and "242A"
+    id: int | str = 0
     name: str = field(default_factory=str)
-    number: int = 0
+    number: int | str = 0
     location: str = field(default_factory=str)
     schedule: Schedule = field(default_factory=Schedule)
     instructor: list[str] = field(default_factory=list)
@@ -0,0 +1,14 @@
+import pytest
+
+from structs import Course, Schedule
+
+
+@pytest.fixture
+def course():
+    """Builds a course meeting on days from start to end"""
+
+    def make(id, days, start, end, location=""):
+        return Course(id=id, name="Course", number=id, location=location,
+                      schedule=Schedule(start_time=start, end_time=end, days=days))
+
+    return make
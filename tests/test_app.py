@@ -0,0 +1,349 @@
+import io
+import json
+import zipfile
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from cache import SQLiteCache
+from executor import WorkerPool
+from jobs import parse_schedule_chunks
+
+EXAMPLE = Path(__file__).resolve().parent.parent / "class.example.txt"
+
+COURSE = {
+    "id": "29901",
+    "name": "Industrial Eng & Ops Rsch",
+    "number": "215",
+    "location": "Latimer 120",
+    "schedule": {"start_time": "12:00pm", "end_time": "12:59pm", "days": "MW"},
+    "instructor": ["Phillip Kerger"],
+}
+
+EXPORT = {
+    "classes": [COURSE],
+    "semester_start": "2025-09-01",
+    "semester_end": "2025-09-12",
+}
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """A worker pool of its own for the test, with one thread"""
+    pool = WorkerPool(kind="thread", max_workers=1, max_queue=1)
+    monkeypatch.setattr(main, "worker_pool", pool)
+    yield pool
+    pool.shutdown()
+
+
+def test_streamed_calendar_is_cached_once_sent(client, monkeypatch, tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.db"), "ics")
+    monkeypatch.setattr(main, "ics_cache", cache)
+
+    response = client.post("/generate-ics", json=EXPORT)
+    assert response.status_code == 200
+    assert response.text.count("BEGIN:VEVENT") == 4
+    assert cache.get(response.headers["etag"].strip('W/"')) == response.content
+    cache.close()
+
+
+def test_cache_failures_dont_fail_requests(client, monkeypatch, tmp_path):
+    # a directory can't be opened as a database, so every call fails
+    for name in ("parse_cache", "ics_cache"):
+        monkeypatch.setattr(main, name, SQLiteCache(str(tmp_path), name))
+
+    response = client.post("/generate-ics", json=EXPORT)
+    assert response.status_code == 200
+    assert response.text.endswith("END:VCALENDAR\r\n")
+
+    response = client.post("/parse-text-schedule", json={
+        "schedule_text": "Enrolled\t29901\tIndustrial Eng & Ops Rsch\t215\t001\n",
+    })
+    assert response.json()["success"]
+    assert main.parse_cache.stats()["errors"] == 2
+
+
+def test_parse_image_schedule(client, monkeypatch):
+    cv2 = pytest.importorskip("cv2")
+    np = pytest.importorskip("numpy")
+    pytesseract = pytest.importorskip("pytesseract")
+
+    def image_to_string(image, config="", timeout=0):
+        return (
+            "Enrolled    29901  Industrial Eng & Ops Rsch  215  001  20\n"
+            "Phillip Kerger\n"
+            "MW 12:00pm - 12:59pm - Latimer 120\n"
+        )
+
+    # a thread pool, so the mocked tesseract is the one OCR runs
+    pool = WorkerPool(kind="thread", max_workers=1)
+    monkeypatch.setattr(main, "ocr_pool", pool)
+    monkeypatch.setattr(pytesseract, "image_to_string", image_to_string)
+
+    _, png = cv2.imencode(".png", np.full((40, 40), 255, np.uint8))
+    try:
+        response = client.post(
+            "/parse-image-schedule",
+            files={"image": ("schedule.png", png.tobytes(), "image/png")},
+        )
+    finally:
+        pool.shutdown()
+
+    assert response.status_code == 200
+    [course] = response.json()["classes"]
+    assert course["id"] == "29901"
+    assert course["name"] == "Industrial Eng & Ops Rsch"
+    assert course["number"] == "215"
+
+
+def test_parse_text_plain_body_as_it_streams(client, pool, monkeypatch):
+    # a multi-byte character, split across pieces below
+    text = EXAMPLE.read_text().replace("Latimer", "Latimér")
+    body = text.encode()
+    calls = []
+    run_timed = pool.run_timed
+
+    async def counted(fn, *args):
+        if fn is parse_schedule_chunks:
+            calls.append(len(args[0]))
+        return await run_timed(fn, *args)
+
+    monkeypatch.setattr(pool, "run_timed", counted)
+
+    response = client.post(
+        "/parse-text-schedule?semester_start=2025-08-27&semester_end=2025-12-12",
+        content=(body[i:i + 100] for i in range(0, len(body), 100)),
+        headers={"content-type": "text/plain; charset=utf-8"},
+    )
+    result = response.json()
+    assert result["success"] and result["semester_start"] == "2025-08-27"
+    assert result["classes"] == client.post(
+        "/parse-text-schedule", json={"schedule_text": text}
+    ).json()["classes"]
+    assert any(c["location"].startswith("Latimér") for c in result["classes"])
+    # the classes went to the pool a few at a time as the body arrived
+    assert len(calls) > 1 and sum(calls) == len(result["classes"])
+
+
+def test_text_to_ics_errors(client, pool, monkeypatch, caplog):
+    from metrics import REQUEST_ERRORS
+
+    response = client.post("/text-to-ics", json={
+        "schedule_text": EXAMPLE.read_text(),
+        "semester_start": "not a date",
+        "semester_end": "2025-12-12",
+    })
+    assert response.status_code == 400
+    assert "not a date" in response.json()["error"]
+
+    def broken(*args):
+        raise RuntimeError("parser bug")
+
+    monkeypatch.setattr(main, "prepare_text_export", broken)
+    monkeypatch.setattr(main, "ics_cache", main.LRUCache())
+    errors = REQUEST_ERRORS.values.get(("POST", "/text-to-ics"), 0)
+    response = client.post("/text-to-ics", json={
+        "schedule_text": EXAMPLE.read_text(),
+        "semester_start": "2025-08-27",
+        "semester_end": "2025-12-12",
+    })
+    assert response.status_code == 500
+    assert response.json() == {"error": "parser bug"}
+    assert "Error generating ICS from text" in caplog.text
+    assert REQUEST_ERRORS.values[("POST", "/text-to-ics")] == errors + 1
+
+
+def test_generate_ics_delta(client, pool, monkeypatch, caplog):
+    moved = {**COURSE, "location": "Dwinelle 155"}
+    added = {**COURSE, "id": "29902", "schedule": {**COURSE["schedule"], "days": "F"}}
+
+    response = client.post("/generate-ics-delta", json={
+        **EXPORT, "previous_classes": [COURSE], "classes": [moved, added],
+    })
+    assert response.status_code == 200
+    assert response.headers["x-events-added"] == "2"
+    assert response.headers["x-events-changed"] == "4"
+    assert response.headers["x-events-removed"] == "0"
+    assert response.text.count("LOCATION:Dwinelle 155") == 4
+
+    response = client.post("/generate-ics-delta", json={
+        **EXPORT, "semester_end": "not a date", "previous_classes": [COURSE],
+    })
+    assert response.status_code == 400
+    assert "not a date" in response.json()["error"]
+
+    def broken(*args):
+        raise RuntimeError("diff bug")
+
+    monkeypatch.setattr(main, "render_delta", broken)
+    response = client.post("/generate-ics-delta", json={
+        **EXPORT, "previous_classes": [COURSE],
+    })
+    assert response.status_code == 500
+    assert response.json() == {"error": "diff bug"}
+    assert "Error generating ICS delta" in caplog.text
+
+
+def test_saturated_pool_answers_503(client, pool, monkeypatch):
+    monkeypatch.setattr(main, "parse_cache", main.LRUCache())
+    pool.pending = pool.max_workers + pool.max_queue
+
+    response = client.post("/parse-text-schedule", json={
+        "schedule_text": EXAMPLE.read_text(),
+    })
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == str(main.RETRY_AFTER)
+    assert pool.stats()["rejected"] == 1
+
+    pool.pending = 0
+    response = client.post("/parse-text-schedule", json={
+        "schedule_text": EXAMPLE.read_text(),
+    })
+    assert response.status_code == 200
+
+
+def test_generate_ics_errors(client, pool, monkeypatch, caplog):
+    from metrics import REQUEST_ERRORS
+
+    response = client.post("/generate-ics", json={
+        **EXPORT, "semester_start": "not a date",
+    })
+    assert response.status_code == 400
+    assert "not a date" in response.json()["error"]
+
+    def broken(*args):
+        raise RuntimeError('a "quoted" \\ message')
+
+    monkeypatch.setattr(main, "prepare_export", broken)
+    monkeypatch.setattr(main, "ics_cache", main.LRUCache())
+    errors = REQUEST_ERRORS.values.get(("POST", "/generate-ics"), 0)
+    response = client.post("/generate-ics", json=EXPORT)
+    assert response.status_code == 500
+    assert response.json() == {"error": 'a "quoted" \\ message'}
+    assert "Error generating ICS" in caplog.text
+    assert REQUEST_ERRORS.values[("POST", "/generate-ics")] == errors + 1
+
+
+def test_generate_ics_not_modified(client, pool):
+    response = client.post("/generate-ics", json=EXPORT)
+    etag = response.headers["etag"]
+
+    again = client.post("/generate-ics", json=EXPORT, headers={"if-none-match": etag})
+    assert again.status_code == 304
+    assert again.headers["etag"] == etag and again.content == b""
+
+    # other dates are another calendar
+    other = client.post("/generate-ics", json={**EXPORT, "semester_end": "2025-09-19"},
+                        headers={"if-none-match": etag})
+    assert other.status_code == 200 and other.headers["etag"] != etag
+
+
+def test_batch(client, pool):
+    record = {
+        "schedule_text": EXAMPLE.read_text(),
+        "semester_start": "2025-08-27",
+        "semester_end": "2025-12-12",
+    }
+    body = "\n".join(json.dumps(r) for r in (record, {"schedule_text": ""}))
+
+    response = client.post("/batch", content=body)
+    assert response.headers["content-type"] == "application/x-ndjson"
+    results = sorted(
+        (json.loads(line) for line in response.text.splitlines()),
+        key=lambda result: result["index"],
+    )
+    assert results[0]["success"] and len(results[0]["classes"]) == 11
+    assert results[1]["error"] == "No schedule text provided"
+
+    response = client.post("/batch?format=zip", content=body)
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert sorted(archive.namelist()) == ["errors.json", "schedule_0.ics"]
+
+    assert client.post("/batch", content=b"[1, ").status_code == 400
+    assert client.post("/batch?format=tar", content=body).status_code == 400
+
+
+def test_calendar_feed_conditional_get(client, pool, monkeypatch, tmp_path):
+    from store import CalendarStore
+
+    store = CalendarStore(str(tmp_path / "calendars.db"))
+    monkeypatch.setattr(main, "calendar_store", store)
+    saved = client.post("/calendars", json=EXPORT)
+    assert saved.status_code == 201
+    feed = f"/calendars/{saved.json()['token']}.ics"
+
+    response = client.get(feed)
+    assert response.status_code == 200
+    assert response.text.count("BEGIN:VEVENT") == 4
+    last_modified = response.headers["last-modified"]
+
+    response = client.get(feed, headers={"if-modified-since": last_modified})
+    assert response.status_code == 304
+    assert client.get(feed, headers={
+        "if-modified-since": "Mon, 01 Jan 2024 00:00:00 GMT",
+    }).status_code == 200
+    # If-None-Match wins over If-Modified-Since
+    assert client.get(feed, headers={
+        "if-modified-since": last_modified, "if-none-match": '"other"',
+    }).status_code == 200
+    assert client.get("/calendars/nope.ics").status_code == 404
+
+
+def test_free_busy(client, pool):
+    overlapping = {
+        **COURSE, "id": "29902",
+        "schedule": {"start_time": "12:30pm", "end_time": "1:29pm", "days": "M"},
+    }
+    response = client.post("/free-busy", json={
+        "schedules": [[COURSE, overlapping], [COURSE]],
+        "day_start": "9:00am", "day_end": "5:00pm",
+    })
+    body = response.json()
+    assert body["busy"]["Monday"] == [{"start": "12:00pm", "end": "1:30pm"}]
+    assert body["free"]["Monday"] == [
+        {"start": "9:00am", "end": "12:00pm"}, {"start": "1:30pm", "end": "5:00pm"},
+    ]
+    assert body["free"]["Tuesday"] == [{"start": "9:00am", "end": "5:00pm"}]
+    [conflict] = body["conflicts"]
+    assert (conflict["schedule"], conflict["day"]) == (0, "Monday")
+    assert conflict["second"]["id"] == "29902"
+
+    assert client.post("/free-busy", json={}).status_code == 400
+    response = client.post("/free-busy", json={"classes": [COURSE], "day_start": "noon"})
+    assert response.status_code == 400
+
+
+def test_profiles_need_profiling_and_the_token(client, monkeypatch, tmp_path):
+    from profiling import ProfileStore
+
+    monkeypatch.setattr(main, "profile_store", ProfileStore(str(tmp_path)))
+    monkeypatch.setattr(main, "PROFILE_TOKEN", "secret")
+    # off by default
+    assert client.get("/profiles").status_code == 404
+    assert client.get("/profiles/1", headers={
+        "authorization": "Bearer secret",
+    }).status_code == 404
+
+    monkeypatch.setattr(main, "PROFILE_SAMPLE_RATE", 0.1)
+    assert client.get("/profiles").status_code == 403
+    assert client.get("/profiles", headers={
+        "authorization": "Bearer guess",
+    }).status_code == 403
+    response = client.get("/profiles", headers={"authorization": "Bearer secret"})
+    assert response.json() == {"profiles": []}
+
+
+def test_metrics_exports_totals_as_counters(client):
+    text = client.get("/metrics").text
+
+    for name in ("worker_pool_rejected_total", "cache_hits_total",
+                 "cache_misses_total", "cache_errors_total"):
+        assert f"# TYPE {name} counter" in text
+    assert 'cache_hits_total{cache="parse"}' in text
@@ -0,0 +1,63 @@
+import asyncio
+import io
+import json
+import zipfile
+
+from batch import build_batch_zip, iter_batch_jsonl, process_record, read_records
+
+SCHEDULE_TEXT = """Enrolled\t29900\tIndustrial Eng & Ops Rsch\t241\t002\t31\tIn-Person Instruction\t
+Thibaut Mastrolia
+TTh 11:00am - 12:29pm - Haas Faculty Wing F295
+3
+"""
+
+RECORD = {
+    "schedule_text": SCHEDULE_TEXT,
+    "semester_start": "2025-01-21",
+    "semester_end": "2025-01-23",
+}
+
+
+def test_read_records_json_array_and_jsonl():
+    records = [RECORD, {"schedule_text": ""}]
+
+    assert read_records(json.dumps(records).encode()) == records
+    jsonl = "\n".join(json.dumps(record) for record in records) + "\n\n"
+    assert read_records(jsonl.encode()) == records
+
+
+def test_process_record():
+    result = process_record(RECORD)
+
+    assert result["success"]
+    assert result["classes"][0]["id"] == "29900"
+    assert result["ics"].count("BEGIN:VEVENT") == 2
+
+    assert process_record({"schedule_text": " "}) == {
+        "error": "No schedule text provided"
+    }
+    assert "error" in process_record({**RECORD, "semester_end": "not a date"})
+
+
+def test_iter_batch_jsonl_tags_every_record():
+    records = [RECORD, {"schedule_text": ""}, RECORD]
+
+    async def collect():
+        return [json.loads(line) async for line in iter_batch_jsonl(records, 2)]
+
+    results = sorted(asyncio.run(collect()), key=lambda result: result["index"])
+
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert results[0]["success"] and results[2]["success"]
+    assert results[1]["error"] == "No schedule text provided"
+
+
+def test_build_batch_zip():
+    archive = zipfile.ZipFile(
+        io.BytesIO(asyncio.run(build_batch_zip([RECORD, {"schedule_text": ""}])))
+    )
+
+    assert sorted(archive.namelist()) == ["errors.json", "schedule_0.ics"]
+    assert json.loads(archive.read("errors.json")) == [
+        {"index": 1, "error": "No schedule text provided"}
+    ]
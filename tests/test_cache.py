@@ -0,0 +1,168 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from cache import (
+    LRUCache,
+    RecordedStream,
+    SQLiteCache,
+    canonical_key,
+    content_key,
+    etag_matches,
+    normalize_schedule_text,
+)
+from parser import parse_class_schedule
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_lru_eviction_and_counters():
+    cache = LRUCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats() == {
+        "hits": 2,
+        "misses": 1,
+        "evictions": 1,
+        "size": 2,
+        "max_size": 2,
+        "ttl": 60,
+    }
+
+
+def test_ttl_expiry():
+    clock = FakeClock()
+    cache = LRUCache(max_size=10, ttl=30, clock=clock)
+    cache.set("a", 1)
+
+    clock.now = 29
+    assert cache.get("a") == 1
+    clock.now = 30
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_normalized_text_parses_the_same():
+    text = (
+        "  Schedule Planner\r\n"
+        "\tEnrolled\t29901\tIndustrial Eng & Ops Rsch\t215\t001\t20\tIn-Person Instruction\t\r\n"
+        "    Phillip Kerger  \r\n"
+        "    MW 12:00pm - 12:59pm - Latimer 120\r\n"
+    )
+    normalized = normalize_schedule_text(text)
+
+    assert parse_class_schedule(normalized) == parse_class_schedule(text)
+    assert content_key(normalized) == content_key(
+        normalize_schedule_text(text.replace("\r\n", "\n"))
+    )
+
+
+def test_canonical_key_ignores_key_order():
+    assert canonical_key({"a": 1, "b": [1, 2]}) == canonical_key({"b": [1, 2], "a": 1})
+    assert canonical_key({"a": 1}) != canonical_key({"a": 2})
+
+
+def test_etag_matches():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('"xyz", W/"abc"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"xyz"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+
+def test_recorded_stream():
+    async def chunks(fail=False):
+        yield b"ab"
+        if fail:
+            raise RuntimeError("render failed")
+        yield b"cd"
+
+    async def collect(stream: RecordedStream) -> list[bytes]:
+        return [chunk async for chunk in stream]
+
+    stream = RecordedStream(chunks(), max_bytes=10)
+    assert stream.body is None
+    assert asyncio.run(collect(stream)) == [b"ab", b"cd"]
+    assert stream.body == b"abcd"
+
+    large = RecordedStream(chunks(), max_bytes=3)
+    assert asyncio.run(collect(large)) == [b"ab", b"cd"]
+    assert large.body is None
+
+    broken = RecordedStream(chunks(fail=True), max_bytes=10)
+    with pytest.raises(RuntimeError):
+        asyncio.run(collect(broken))
+    assert broken.body is None
+
+
+def test_sqlite_cache_is_shared(tmp_path):
+    path = str(tmp_path / "cache.db")
+    # two caches on one file stand in for two server processes
+    first = SQLiteCache(path, "parse")
+    second = SQLiteCache(path, "parse")
+    other = SQLiteCache(path, "ics")
+
+    first.set("a", [{"id": "1", "instructor": ["A", "B"]}])
+    other.set("a", b"BEGIN:VCALENDAR")
+    assert second.get("a") == [{"id": "1", "instructor": ["A", "B"]}]
+    assert other.get("a") == b"BEGIN:VCALENDAR"
+    assert second.get("b") is None
+    assert (second.stats()["hits"], second.stats()["misses"]) == (1, 1)
+
+    first.clear()
+    assert first.get("a") is None and other.get("a") is not None
+    for cache in (first, second, other):
+        cache.close()
+
+
+def test_sqlite_cache_evicts_least_recently_used(tmp_path):
+    clock = FakeClock()
+    cache = SQLiteCache(str(tmp_path / "cache.db"), "ics", max_size=10,
+                        max_bytes=10, ttl=30, clock=clock, touch_interval=0)
+    cache.set("a", b"1234")
+    clock.now = 1
+    cache.set("b", b"1234")
+    clock.now = 2
+    assert cache.get("a") == b"1234"  # "b" is now least recently used
+    cache.set("c", b"1234")
+
+    assert cache.get("b") is None
+    assert cache.stats()["bytes"] == 8 and cache.stats()["evictions"] == 1
+
+    cache.set("huge", b"x" * 11)
+    assert cache.get("huge") is None
+
+    clock.now = 31
+    assert cache.get("c") == b"1234"
+    assert cache.get("a") is None  # set at 0, expired at 30
+    cache.close()
+
+
+def test_sqlite_cache_errors_are_skipped(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = SQLiteCache(path, "parse")
+    cache.set("a", [1])
+
+    # another process holding the write lock past the busy timeout
+    writer = sqlite3.connect(path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    cache.set("b", [2])
+    writer.execute("ROLLBACK")
+    writer.close()
+
+    assert cache.get("b") is None
+    assert cache.get("a") == [1]
+    assert cache.stats()["errors"] == 1
+    cache.close()
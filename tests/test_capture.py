@@ -0,0 +1,85 @@
+import asyncio
+import json
+import threading
+
+from capture import CaptureMiddleware, CaptureWriter, record_body
+
+
+async def echo(scope, receive, send):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body", False):
+            break
+    await send({"type": "http.response.start", "status": 201, "headers": []})
+    await send({"type": "http.response.body", "body": body})
+
+
+def call(app, path, pieces, headers=()):
+    scope = {"type": "http", "method": "POST", "path": path, "query_string": b"a=1",
+             "headers": list(headers)}
+    incoming = [
+        {"type": "http.request", "body": piece, "more_body": i < len(pieces) - 1}
+        for i, piece in enumerate(pieces)
+    ]
+
+    async def receive():
+        return incoming.pop(0)
+
+    async def send(message):
+        pass
+
+    asyncio.run(app(scope, receive, send))
+
+
+def test_captures_requests_in_replay_shape(tmp_path):
+    path = tmp_path / "capture.jsonl"
+    writer = CaptureWriter(str(path))
+    app = CaptureMiddleware(echo, writer, exclude=("/metrics",))
+
+    call(app, "/parse-text-schedule", [b'{"schedule_text": ', b'"x"}'], headers=[
+        (b"content-type", b"application/json"), (b"cookie", b"secret"),
+    ])
+    call(app, "/upload", [b"\x89PNG\xff"])
+    call(app, "/metrics", [b""])
+    writer.close()
+
+    first, second = [json.loads(line) for line in path.read_text().splitlines()]
+    assert first == {
+        "method": "POST",
+        "path": "/parse-text-schedule?a=1",
+        "headers": {"content-type": "application/json"},
+        "body": '{"schedule_text": "x"}',
+        "status": 201,
+    }
+    assert "body" not in second and record_body(second) == b"\x89PNG\xff"
+
+
+def test_sample_rate(tmp_path):
+    path = tmp_path / "capture.jsonl"
+    writer = CaptureWriter(str(path))
+    app = CaptureMiddleware(echo, writer, sample_rate=0.5, rng=lambda: 0.7)
+    call(app, "/", [b"x"])
+    writer.close()
+    assert not path.exists()
+
+
+def test_writes_happen_off_the_request(tmp_path, monkeypatch):
+    opened_on = []
+    real_open = open
+
+    def spy_open(*args, **kwargs):
+        opened_on.append(threading.current_thread().name)
+        return real_open(*args, **kwargs)
+
+    monkeypatch.setattr("builtins.open", spy_open)
+    path = tmp_path / "capture.jsonl"
+    writer = CaptureWriter(str(path))
+    app = CaptureMiddleware(echo, writer)
+    for _ in range(3):
+        call(app, "/", [b"x"])
+    writer.close()
+
+    assert opened_on == ["capture-writer"]
+    assert len(path.read_text().splitlines()) == 3
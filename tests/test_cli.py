@@ -0,0 +1,57 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from cli import convert, read_jobs, run
+
+EXAMPLE = Path(__file__).resolve().parent.parent / "class.example.txt"
+
+
+def test_converts_directory_and_jsonl(tmp_path):
+    pastes = tmp_path / "pastes"
+    pastes.mkdir()
+    shutil.copy(EXAMPLE, pastes / "alice.txt")
+    (pastes / "empty.txt").write_text("nothing here\n")
+
+    defaults = {"semester_start": "2025-08-27", "semester_end": "2025-09-10"}
+    results = run(read_jobs(pastes), tmp_path / "out", defaults, workers=1)
+
+    by_name = {result.name: result for result in results}
+    assert by_name["alice"].error is None and by_name["alice"].events > 0
+    assert by_name["empty"].error == "No classes found"
+    ics = (tmp_path / "out" / "alice.ics").read_text()
+    assert ics.count("BEGIN:VEVENT") == by_name["alice"].events
+    assert sorted(p.name for p in (tmp_path / "out").iterdir()) == ["alice.ics"]
+
+    text = EXAMPLE.read_text()
+    records = tmp_path / "records.jsonl"
+    records.write_text(
+        json.dumps({"id": "bob/2025", "schedule_text": text, "recurrence": "rrule"}) + "\n\n"
+        + json.dumps({"schedule_text": text, "semester_start": "bad"}) + "\n"
+    )
+    jobs = read_jobs(records)
+    assert [job.name for job in jobs] == ["bob_2025", "schedule_1"]
+
+    bob = convert(jobs[0], str(tmp_path), defaults)
+    assert bob.error is None and "RRULE" in (tmp_path / "bob_2025.ics").read_text()
+    assert convert(jobs[1], str(tmp_path), defaults).error
+    assert not (tmp_path / "schedule_1.ics.partial").exists()
+
+
+def test_output_names_never_collide(tmp_path):
+    for folder in ("a", "b"):
+        (tmp_path / "pastes" / folder).mkdir(parents=True)
+        shutil.copy(EXAMPLE, tmp_path / "pastes" / folder / "x.txt")
+
+    defaults = {"semester_start": "2025-08-27", "semester_end": "2025-09-10"}
+    results = run(read_jobs(tmp_path / "pastes"), tmp_path / "out", defaults, workers=1)
+    assert sorted(result.name for result in results) == ["a/x", "b/x"]
+    assert (tmp_path / "out" / "a" / "x.ics").exists()
+    assert (tmp_path / "out" / "b" / "x.ics").exists()
+
+    records = tmp_path / "records.jsonl"
+    records.write_text(json.dumps({"id": "a b"}) + "\n" + json.dumps({"id": "a_b"}))
+    with pytest.raises(ValueError, match="overwrite a_b.ics"):
+        read_jobs(records)
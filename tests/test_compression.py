@@ -0,0 +1,105 @@
+import asyncio
+import gzip
+import zlib
+
+from compression import (
+    SUPPORTED_ENCODINGS,
+    CompressionMiddleware,
+    PrecompressedBody,
+    choose_encoding,
+)
+
+
+def test_choose_encoding():
+    assert choose_encoding(None) is None
+    assert choose_encoding("identity") is None
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0") is None
+    assert choose_encoding("*") == SUPPORTED_ENCODINGS[0]
+    assert choose_encoding("gzip;q=1.0, br;q=0") == "gzip"
+
+
+def test_precompressed_body_variants():
+    page = PrecompressedBody(b"<html>" + b"hello " * 500 + b"</html>")
+
+    body, etag, encoding = page.select("gzip")
+    assert encoding == "gzip"
+    assert gzip.decompress(body) == page.select(None)[0]
+    assert etag.endswith('-gzip"')
+    assert etag != page.select(None)[1]
+
+
+async def call(app, request_headers):
+    scope = {"type": "http", "headers": request_headers}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    headers = dict(messages[0]["headers"])
+    body = b"".join(m.get("body", b"") for m in messages[1:])
+    return headers, body
+
+
+def make_app(chunks, headers):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        for i, chunk in enumerate(chunks):
+            await send({
+                "type": "http.response.body",
+                "body": chunk,
+                "more_body": i < len(chunks) - 1,
+            })
+
+    return CompressionMiddleware(app, minimum_size=100)
+
+
+def test_middleware_compresses_streamed_text():
+    chunks = [b"BEGIN:VEVENT\r\nSUMMARY:Math\r\nEND:VEVENT\r\n"] * 50
+    app = make_app(chunks, [
+        (b"content-type", b"text/calendar"),
+        (b"etag", b'"abc"'),
+    ])
+
+    headers, body = asyncio.run(call(app, [(b"accept-encoding", b"gzip")]))
+    assert headers[b"content-encoding"] == b"gzip"
+    assert headers[b"vary"] == b"Accept-Encoding"
+    assert headers[b"etag"] == b'W/"abc"'
+    assert gzip.decompress(body) == b"".join(chunks)
+    assert len(body) < len(b"".join(chunks))
+
+
+def test_middleware_flushes_each_streamed_chunk():
+    chunks = [b"BEGIN:VEVENT\r\nSUMMARY:Math\r\nEND:VEVENT\r\n"] * 3
+    app = make_app(chunks, [(b"content-type", b"text/calendar")])
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(app(scope, receive, send))
+
+    # the client can decode every event as soon as its chunk arrives
+    decoder = zlib.decompressobj(31)
+    for chunk, message in zip(chunks, sent[1:]):
+        assert decoder.decompress(message["body"]) == chunk
+
+
+def test_middleware_skips_small_and_binary_bodies():
+    small = make_app([b"{}"], [(b"content-type", b"application/json")])
+    headers, body = asyncio.run(call(small, [(b"accept-encoding", b"gzip")]))
+    assert b"content-encoding" not in headers
+    assert body == b"{}"
+
+    archive = make_app([b"PK" * 500], [(b"content-type", b"application/zip")])
+    headers, body = asyncio.run(call(archive, [(b"accept-encoding", b"gzip")]))
+    assert b"content-encoding" not in headers
+    assert body == b"PK" * 500
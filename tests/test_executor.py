@@ -0,0 +1,51 @@
+import asyncio
+import threading
+
+import pytest
+
+from executor import PoolSaturated, WorkerPool
+from jobs import parse_schedule_text
+
+
+def test_run_returns_result():
+    pool = WorkerPool(max_workers=1)
+
+    async def run():
+        return await pool.run(parse_schedule_text, "Enrolled\t1\tMath\t1A\nM 9:00am - 9:59am")
+
+    try:
+        assert asyncio.run(run())[0]["schedule"]["days"] == "M"
+    finally:
+        pool.shutdown()
+
+
+def test_saturated_pool_refuses_new_work():
+    pool = WorkerPool(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def run():
+        running = [asyncio.create_task(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert pool.saturated
+
+        with pytest.raises(PoolSaturated):
+            await pool.run(release.wait)
+        # already admitted work still goes through
+        extra = asyncio.create_task(pool.run(release.wait, admit=False))
+        await asyncio.sleep(0)
+
+        release.set()
+        await asyncio.gather(*running, extra)
+
+    try:
+        asyncio.run(run())
+    finally:
+        pool.shutdown()
+
+    assert pool.stats()["rejected"] == 1
+    assert pool.pending == 0
+
+
+def test_unknown_kind():
+    with pytest.raises(ValueError):
+        WorkerPool(kind="fiber")
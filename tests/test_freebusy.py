@@ -0,0 +1,55 @@
+from freebusy import (
+    bit_runs,
+    busy_week,
+    combined_busy_week,
+    find_conflicts,
+    format_clock,
+    free_week,
+    slot_bits,
+)
+
+
+def test_slot_bits_and_runs():
+    # 12:00pm - 12:59pm covers slots 144 to 155
+    bits = slot_bits(12 * 60, 12 * 60 + 59)
+    assert bit_runs(bits) == [(144, 156)]
+    assert bit_runs(bits | slot_bits(0, 10)) == [(0, 2), (144, 156)]
+    assert bit_runs(0) == []
+
+
+def test_format_clock():
+    assert format_clock(0) == "12:00am"
+    assert format_clock(12 * 60 + 30) == "12:30pm"
+    assert format_clock(17 * 60 + 5) == "5:05pm"
+
+
+def test_free_week_skips_short_blocks(course):
+    week = busy_week([
+        course(1, "MW", "9:00am", "10:00am"),
+        course(2, "M", "10:15am", "11:00am"),
+    ])
+    free = free_week(week, day_start=8 * 60, day_end=12 * 60, min_minutes=30)
+    assert free[0] == [(480, 540), (660, 720)]
+    assert free[2] == [(480, 540), (600, 720)]
+    assert free[1] == [(480, 720)]
+
+
+def test_group_free_time(course):
+    alice = [course(1, "M", "9:00am", "10:00am")]
+    bob = [course(2, "M", "10:00am", "11:00am")]
+    week = combined_busy_week([alice, bob])
+    assert free_week(week, 8 * 60, 12 * 60)[0] == [(480, 540), (660, 720)]
+
+
+def test_find_conflicts(course):
+    discussion = course(1, "F", "12:00pm", "12:59pm")
+    lecture = course(2, "MF", "12:30pm", "1:30pm")
+    after = course(3, "F", "1:30pm", "2:00pm")
+    # shares the 12:55 slot with the discussion, but doesn't overlap it
+    back_to_back = course(4, "F", "12:59pm", "1:00pm")
+
+    conflicts = find_conflicts([discussion, lecture, after, back_to_back])
+    assert [(c.first.id, c.second.id, c.weekday) for c in conflicts] == [
+        (1, 2, 4), (2, 4, 4),
+    ]
+    assert (conflicts[0].start_minute, conflicts[0].end_minute) == (750, 779)
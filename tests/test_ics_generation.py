@@ -1,7 +1,19 @@
-from ics import generate_ics_file
-from structs import Course, Schedule
+import pytest
 
-# TODO: multiple instructors test case
+from ics import (
+    count_events,
+    diff_events,
+    escape_text,
+    fold_line,
+    generate_delta_ics_file,
+    generate_ics_bytes,
+    generate_ics_file,
+    iter_ics_file,
+    iter_ics_stream,
+    parse_export_options,
+    prepare_meetings,
+)
+from structs import Course, Schedule
 
 
 def test_generate_ics_tuesday_thursday():
@@ -71,3 +83,284 @@ def test_generate_ics():
     # Optionally, check number of lines (should be > minimal ICS header/footer)
     lines = ics_content.splitlines()
     assert len(lines) > 10
+
+
+def test_generate_ics_rrule():
+    """RRULE mode writes one series per course instead of one event per week"""
+    course = Course(
+        id=1,
+        name="Test Course",
+        number=240,
+        location="Lewis 100",
+        schedule=Schedule(start_time="2:00pm", end_time="2:59pm", days="MWF"),
+        instructor=["Phillip Kerger"],
+    )
+
+    semester_start = "2025-08-27"  # A Wednesday
+    semester_end = "2025-12-12"
+
+    ics_content = generate_ics_file(
+        [course],
+        semester_start,
+        semester_end,
+        recurrence="rrule",
+        exclude_dates=["2025-09-01", "2025-09-02", "2025-11-28"],
+    )
+
+    assert ics_content.count("BEGIN:VEVENT") == 1
+    assert "DTSTART:20250827T140000" in ics_content
+    assert "DTEND:20250827T145900" in ics_content
+    assert "RRULE:FREQ=WEEKLY;BYDAY=MO,WE,FR;UNTIL=20251212T235959" in ics_content
+    # Tuesday 2025-09-02 isn't a meeting day, so it isn't excluded
+    assert "EXDATE:20250901T140000,20251128T140000" in ics_content
+
+
+def test_generate_ics_exclude_dates_expanded():
+    course = Course(
+        id=1,
+        name="Test Course",
+        number=101,
+        location="Test Room",
+        schedule=Schedule(start_time="10:00am", end_time="11:00am", days="M"),
+        instructor=["Jane Doe"],
+    )
+
+    ics_content = generate_ics_file(
+        [course], "2025-09-01", "2025-09-15", exclude_dates=["2025-09-08"]
+    )
+
+    assert ics_content.count("BEGIN:VEVENT") == 2
+    assert "20250901T100000" in ics_content
+    assert "20250908T100000" not in ics_content
+    assert "20250915T100000" in ics_content
+
+
+def test_iter_ics_file_chunks():
+    """Streaming output yields one chunk per event and matches the full file"""
+    course = Course(
+        id=1,
+        name="Test Course",
+        number=241,
+        location="Test Room",
+        schedule=Schedule(start_time="11:00am", end_time="12:29pm", days="TTh"),
+        instructor=["Test Instructor"],
+    )
+
+    chunks = list(iter_ics_file([course], "2025-01-21", "2025-01-23"))
+
+    # header, two events, footer
+    assert len(chunks) == 4
+    assert chunks[1].startswith("BEGIN:VEVENT")
+    assert all(chunk.endswith("\r\n") for chunk in chunks)
+    assert "".join(chunks).count("BEGIN:VEVENT") == 2
+
+
+def test_iter_ics_file_validates_before_streaming():
+    course = Course(
+        id=1,
+        schedule=Schedule(start_time="noon", end_time="1:00pm", days="M"),
+    )
+
+    # Raised by the call itself, not on the first next()
+    with pytest.raises(ValueError):
+        iter_ics_file([course], "2025-09-01", "2025-09-08")
+
+
+def test_generate_ics_is_deterministic():
+    course = Course(
+        id="29900",
+        name="Industrial Eng & Ops Rsch",
+        number="241",
+        location="Haas Faculty Wing F295",
+        schedule=Schedule(start_time="11:00am", end_time="12:29pm", days="TTh"),
+        instructor=["Thibaut Mastrolia"],
+    )
+
+    first = generate_ics_file([course], "2025-01-21", "2025-02-04")
+    assert first == generate_ics_file([course], "2025-01-21", "2025-02-04")
+
+    uids = [line for line in first.splitlines() if line.startswith("UID:")]
+    assert len(uids) == len(set(uids)) == 5
+    assert "UID:29900-1100TUTH-20250121@calcentral-ics" in uids
+
+    rrule = generate_ics_file([course], "2025-01-21", "2025-02-04", "rrule")
+    assert "UID:29900-1100TUTH@calcentral-ics" in rrule
+
+
+@pytest.mark.parametrize("recurrence", ["expanded", "rrule"])
+def test_uids_are_unique_without_class_numbers(recurrence):
+    def course(id, name="", days="MW", start="10:00am"):
+        schedule = Schedule(start_time=start, end_time="11:00am", days=days)
+        return Course(id=id, name=name, schedule=schedule)
+
+    courses = [
+        # id-less, as every course read from a screenshot is
+        course(0), course(0), course(0, days="TTh"),
+        # one class number with a lecture and a section
+        course(7), course(7, start="9:00am"),
+        # listed twice
+        course(8), course(8),
+    ]
+    expected = generate_ics_file(courses, "2025-09-01", "2025-09-05", recurrence)
+    streamed = "".join(iter_ics_stream(iter(courses), "2025-09-01", "2025-09-05", recurrence))
+
+    for content in (expected, streamed):
+        uids = [line for line in content.splitlines() if line.startswith("UID:")]
+        assert len(uids) == len(set(uids)) == content.count("BEGIN:VEVENT")
+        assert any(uid.startswith("UID:course-1000MOWE-2") for uid in uids)
+    assert streamed == expected
+
+
+def test_count_events_matches_output():
+    courses = [
+        Course(id=1, schedule=Schedule("10:00am", "10:59am", "MWF")),
+        Course(id=2, schedule=Schedule("11:00am", "12:29pm", "TTh")),
+        Course(id=3, schedule=Schedule("", "", "")),
+    ]
+    exclude_dates = ["2025-09-01", "2025-11-27", "2025-11-28"]
+
+    for recurrence in ("expanded", "rrule"):
+        options = parse_export_options(
+            "2025-08-27", "2025-12-12", recurrence, exclude_dates
+        )
+        ics_content = generate_ics_file(
+            courses, "2025-08-27", "2025-12-12", recurrence, exclude_dates
+        )
+        assert count_events(
+            prepare_meetings(courses), options
+        ) == ics_content.count("BEGIN:VEVENT")
+
+
+def test_generate_delta_only_has_changes():
+    def course(id, location="Room", days="MW"):
+        schedule = Schedule(start_time="10:00am", end_time="11:00am", days=days)
+        return Course(id=id, name="Course", number=id, location=location,
+                      schedule=schedule)
+
+    previous = [course(1), course(2), course(3)]
+    current = [course(1), course(2, location="New Room"), course(4, days="F")]
+
+    # Monday to Friday: each MW course meets twice, the F course once
+    delta = generate_delta_ics_file(previous, current, "2025-09-01", "2025-09-05")
+    published, cancelled = delta.split("END:VCALENDAR\r\n")[:2]
+
+    assert "UID:1-" not in delta
+    assert published.count("BEGIN:VEVENT") == 3
+    assert "UID:4-1000FR-20250905@calcentral-ics\r\nDTSTART" in published
+    assert "UID:2-1000MOWE-20250901@calcentral-ics\r\nSEQUENCE:1\r\n" in published
+    assert "LOCATION:New Room" in published
+
+    assert "METHOD:CANCEL" in cancelled
+    assert cancelled.count("STATUS:CANCELLED") == 2
+    assert "UID:3-1000MOWE-20250903@calcentral-ics" in cancelled
+
+    unchanged = generate_delta_ics_file(previous, previous, "2025-09-01", "2025-09-05")
+    assert "BEGIN:VEVENT" not in unchanged
+    assert "METHOD:CANCEL" not in unchanged
+
+
+def test_diff_events_with_colliding_uids():
+    schedule = Schedule(start_time="10:00am", end_time="11:00am", days="MW")
+    courses = [Course(schedule=schedule), Course(schedule=schedule, location="Other")]
+    options = parse_export_options("2025-09-01", "2025-09-05")
+
+    # id-less courses are told apart by position, not dropped
+    delta = diff_events(prepare_meetings(courses[:1]), prepare_meetings(courses), options)
+    assert len(delta.added) == 2
+    assert not delta.changed and not delta.removed
+
+    # meetings numbered separately can collide, which isn't papered over
+    separately = prepare_meetings(courses[:1]) + prepare_meetings(courses[1:])
+    with pytest.raises(ValueError, match="Duplicate event UID"):
+        diff_events([], separately, options)
+
+
+def test_iter_ics_stream_matches_generate_ics_file():
+    courses = [
+        Course(id=1, name="A", number=1,
+               schedule=Schedule(start_time="10:00am", end_time="11:00am", days="MW")),
+        Course(id=2, name="B", number=2,
+               schedule=Schedule(start_time="1:00pm", end_time="2:00pm", days="F")),
+    ]
+    streamed = "".join(iter_ics_stream(iter(courses), "2025-09-01", "2025-09-30"))
+    assert streamed == generate_ics_file(courses, "2025-09-01", "2025-09-30")
+
+    with pytest.raises(ValueError):
+        iter_ics_stream(iter(courses), "not a date", "2025-09-30")
+
+
+def test_multiple_instructors_and_special_characters_are_escaped():
+    course = Course(
+        id="29901",
+        name="Industrial Eng & Ops Rsch",
+        number="215",
+        location="Room 1, Building; B",
+        schedule=Schedule(start_time="10:00am", end_time="11:00am", days="M"),
+        instructor=["Jane Doe", "Smith, John"],
+    )
+    ics_content = generate_ics_file([course], "2025-09-01", "2025-09-08", "rrule")
+
+    assert "LOCATION:Room 1\\, Building\\; B\r\n" in ics_content
+    assert (
+        "DESCRIPTION:Instructor: Jane Doe\\nSmith\\, John\\nCourse: 215\r\n"
+        in ics_content
+    )
+    # every line break is a CRLF, none are left raw inside a value
+    assert "\n" not in ics_content.replace("\r\n", "")
+    assert generate_ics_bytes(
+        [course], "2025-09-01", "2025-09-08", "rrule"
+    ) == ics_content.encode("utf-8")
+
+
+def test_long_lines_are_folded_at_75_octets():
+    assert escape_text("a\\b;c,d\r\ne") == "a\\\\b\\;c\\,d\\ne"
+    assert fold_line("SUMMARY:short") == b"SUMMARY:short\r\n"
+
+    # 2-octet characters straddle the fold points, and must not be split
+    line = "LOCATION:" + "é" * 100
+    folded = fold_line(line)
+    physical = folded.split(b"\r\n")[:-1]
+    assert all(len(part) <= 75 for part in physical)
+    assert all(part.startswith(b" ") for part in physical[1:])
+    assert b"".join(part.removeprefix(b" ") for part in physical).decode() == line
+
+    course = Course(
+        id=1, name="Course", number=1, location="Lecture Hall " * 10,
+        schedule=Schedule(start_time="10:00am", end_time="11:00am", days="MW"),
+        instructor=["Instructor"],
+    )
+    ics_bytes = generate_ics_bytes([course], "2025-09-01", "2025-12-12")
+    assert max(len(line) for line in ics_bytes.split(b"\r\n")) <= 75
+
+
+
+@pytest.mark.parametrize("recurrence", ["expanded", "rrule"])
+def test_uid_lines_are_ascii_and_fit_one_line(recurrence):
+    # id-less, so the non-ASCII name is the key, and meeting every day of
+    # the week for the longest day codes; listed twice for a position
+    course = Course(
+        name="Études Été " * 5, number="C215",
+        schedule=Schedule(start_time="10:00am", end_time="11:00am", days="MTuWThFSaSu"),
+    )
+    ics_bytes = generate_ics_bytes([course] * 2, "2025-09-01", "2025-09-07", recurrence)
+
+    uids = [line for line in ics_bytes.split(b"\r\n") if line.startswith(b"UID:")]
+    assert len(set(uids)) == len(uids) == ics_bytes.count(b"BEGIN:VEVENT") >= 2
+    assert all(line.isascii() and len(line) <= 75 for line in uids)
+
+
+def test_uids_of_non_ascii_names():
+    def uids(name, number="215"):
+        schedule = Schedule(start_time="12:00pm", end_time="1:00pm", days="MW")
+        course = Course(name=name, number=number, schedule=schedule)
+        content = generate_ics_file([course], "2025-09-01", "2025-09-03", "rrule")
+        return [line for line in content.splitlines() if line.startswith("UID:")]
+
+    [uid] = uids("线性代数")
+    key = uid.removeprefix("UID:").split("-")[0]
+    assert len(key) == 8 and key.isalnum()
+    assert uid.startswith(f"UID:{key}-215-1200MOWE")
+    # the same name keeps its key, another gets its own
+    assert uids("线性代数") == [uid]
+    assert uids("微积分") != [uid]
+    assert uids("线性代数", number="")[0].startswith(f"UID:{key}-1200MOWE")
@@ -0,0 +1,58 @@
+import asyncio
+
+from limits import BodySizeLimitMiddleware
+
+
+async def echo_length(scope, receive, send):
+    """Reads the whole body, then answers with its length"""
+    length = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ConnectionError("client went away")
+        length += len(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": str(length).encode()})
+
+
+def call(app, pieces, headers=()):
+    scope = {"type": "http", "path": "/", "headers": list(headers)}
+    incoming = [
+        {"type": "http.request", "body": piece, "more_body": i < len(pieces) - 1}
+        for i, piece in enumerate(pieces)
+    ]
+    sent = []
+
+    async def receive():
+        return incoming.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return sent[0]["status"], b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def test_small_bodies_pass():
+    app = BodySizeLimitMiddleware(echo_length, max_bytes=10)
+    assert call(app, [b"12345", b"67890"]) == (200, b"10")
+
+
+def test_content_length_over_limit_is_refused_up_front():
+    app = BodySizeLimitMiddleware(echo_length, max_bytes=10)
+    status, _ = call(app, [b"x" * 11], headers=[(b"content-length", b"11")])
+    assert status == 413
+
+
+def test_streamed_body_over_limit_is_cut_off():
+    app = BodySizeLimitMiddleware(echo_length, max_bytes=10)
+    status, body = call(app, [b"12345", b"67890", b"1"])
+    assert status == 413
+    assert b"larger than 10 bytes" in body
+
+
+def test_overrides_by_path():
+    app = BodySizeLimitMiddleware(echo_length, max_bytes=5, overrides={"/": 20})
+    assert call(app, [b"x" * 15]) == (200, b"15")
@@ -0,0 +1,32 @@
+from metrics import Counter, Gauge, Histogram
+
+
+def test_counter_and_gauge_render():
+    counter = Counter("requests_total", "Requests", ("route",))
+    counter.inc(route="/a")
+    counter.inc(2, route='/"b"')
+
+    assert counter.render().splitlines() == [
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        'requests_total{route="/\\"b\\""} 2',
+        'requests_total{route="/a"} 1',
+    ]
+
+    gauge = Gauge("queue_depth", "Queue depth")
+    gauge.set(3)
+    assert gauge.render().splitlines()[-1] == "queue_depth 3"
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency", ("stage",), (0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, stage="parse")
+
+    assert histogram.render().splitlines()[2:] == [
+        'latency_seconds_bucket{stage="parse",le="0.1"} 2',
+        'latency_seconds_bucket{stage="parse",le="1.0"} 3',
+        'latency_seconds_bucket{stage="parse",le="+Inf"} 4',
+        'latency_seconds_sum{stage="parse"} 2.65',
+        'latency_seconds_count{stage="parse"} 4',
+    ]
@@ -0,0 +1,64 @@
+import asyncio
+from pathlib import Path
+
+from batch import iter_batch, parse_record
+from occupancy import OccupancyIndex, Peak, building_of
+from parser import parse_class_schedule
+
+EXAMPLE = Path(__file__).resolve().parent.parent / "class.example.txt"
+
+
+def test_building_of():
+    assert building_of("Latimer 120") == "Latimer"
+    assert building_of("Haas Faculty Wing F295") == "Haas Faculty Wing"
+    assert building_of("Lewis") == "Lewis"
+
+
+def test_occupants_at_location_and_time(course):
+    index = OccupancyIndex()
+    index.add("alice", [course(1, "MW", "12:00pm", "12:59pm", location="Latimer 120")])
+    index.add("bob", [
+        course(1, "MW", "12:00pm", "12:59pm", location="Latimer 120"),
+        course(2, "M", "1:00pm", "1:59pm", location="Latimer 120"),
+    ])
+
+    at_1230 = index.occupants_at("latimer 120", "Monday", "12:30pm")
+    assert sorted(o.student for o in at_1230) == ["alice", "bob"]
+
+    # intervals are half-open, so 1pm is only the second class
+    at_1pm = index.occupants_at("Latimer 120", 0, 13 * 60)
+    assert [(o.student, o.course.id) for o in at_1pm] == [("bob", 2)]
+
+    assert index.occupants_at("Latimer 120", "T", "12:30pm") == []
+    assert index.occupants_at("Nowhere", "M", "12:30pm") == []
+
+    during = index.occupants_during("W", "12:45pm", "2:00pm")
+    assert len(during) == 2
+
+
+def test_peak_by_building(course):
+    index = OccupancyIndex()
+    index.add("a", [course(1, "M", "10:00am", "11:00am", location="Latimer 120")])
+    index.add("b", [course(2, "M", "10:30am", "11:30am", location="Latimer 105")])
+    index.add("c", [course(3, "M", "11:00am", "12:00pm", location="Latimer 120")])
+    index.add("d", [course(4, "F", "9:00am", "10:00am", location="Lewis 100")])
+
+    assert index.peak_by_building() == {
+        "Latimer": Peak(2, 0, 630),
+        "Lewis": Peak(1, 4, 540),
+    }
+    assert index.peak_by_location()["Latimer 120"].count == 1
+
+
+def test_add_batch_results():
+    text = EXAMPLE.read_text()
+    records = [{"schedule_text": text}, {"schedule_text": ""}]
+
+    index = OccupancyIndex()
+    results = iter_batch(records, process=parse_record)
+    assert asyncio.run(index.add_batch_results(results)) == 1
+    assert len(index.locations()) == 9
+    assert index.occupants_at("Latimer 120", "M", "12:30pm")[0].course.id == "29901"
+    assert len(index.occupants) == len(
+        [c for c in parse_class_schedule(text) if c.schedule.weekday_mask]
+    )
@@ -0,0 +1,35 @@
+import pytest
+
+from ocr import preprocess_image
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+
+
+def png(image) -> bytes:
+    ok, encoded = cv2.imencode(".png", image)
+    assert ok
+    return encoded.tobytes()
+
+
+def test_preprocess_downscales_and_thresholds():
+    image = np.full((400, 3000, 3), 240, np.uint8)
+    cv2.putText(image, "MW 12:00pm", (50, 200), cv2.FONT_HERSHEY_SIMPLEX, 4, (20, 20, 20), 8)
+
+    processed = preprocess_image(png(image), max_width=1500)
+    assert processed.shape == (200, 1500)
+    assert set(np.unique(processed)) <= {0, 255}
+    # mostly white, with dark text
+    assert processed.mean() > 128
+
+
+def test_preprocess_inverts_dark_mode():
+    image = np.full((100, 400, 3), 20, np.uint8)
+    cv2.putText(image, "Enrolled", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 1, (230, 230, 230), 2)
+
+    assert preprocess_image(png(image)).mean() > 128
+
+
+def test_preprocess_rejects_non_images():
+    with pytest.raises(ValueError):
+        preprocess_image(b"not an image")
@@ -1,4 +1,17 @@
-from parser import Course, Schedule, parse_class_schedule
+import io
+import mmap
+from pathlib import Path
+
+from ocr import columns_to_tabs
+from parser import (
+    Course,
+    Schedule,
+    iter_courses,
+    iter_enrolled_chunks,
+    parse_class_schedule,
+)
+
+EXAMPLE = Path(__file__).resolve().parent.parent / "class.example.txt"
 
 
 def test_parse_class_schedule():
@@ -64,3 +77,77 @@ def test_parse_class_schedule_tuesday_thursday():
         ),
     ]
     assert result == expected
+
+
+def test_parse_class_schedule_example_file():
+    result = parse_class_schedule(EXAMPLE.read_text())
+
+    assert len(result) == 11
+    assert [course.id for course in result][:3] == ["29901", "33001", "29441"]
+
+    # a meeting line without a location
+    no_location = next(course for course in result if course.id == "34223")
+    assert no_location.location == ""
+    assert no_location.schedule == Schedule(
+        start_time="4:00pm", end_time="4:59pm", days="F"
+    )
+
+    # several instructors on one class (being the last class, it also picks
+    # up names from the calendar display at the bottom of the page)
+    seminar = next(course for course in result if course.id == "16623")
+    assert seminar.number == "298"
+    assert seminar.instructor[:2] == ["Diana Chavez", "Alper Atamturk"]
+
+
+def test_iter_enrolled_chunks_matches_split():
+    text = EXAMPLE.read_text()
+    expected = text.split("Enrolled")[1:]
+
+    # markers cut in half at piece boundaries are still found
+    for size in (1, 3, 7, 100, len(text)):
+        pieces = [text[i:i + size] for i in range(0, len(text), size)]
+        assert list(iter_enrolled_chunks(pieces)) == expected
+
+    assert list(iter_enrolled_chunks(["no classes ", "here"])) == []
+
+
+def test_iter_courses_matches_parse_class_schedule():
+    text = EXAMPLE.read_text()
+    expected = parse_class_schedule(text)
+
+    assert list(iter_courses(text.splitlines(keepends=True))) == expected
+    assert list(iter_courses(io.StringIO(text))) == expected
+    with EXAMPLE.open("rb") as f:
+        assert list(iter_courses(f)) == expected
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            assert list(iter_courses(mapped)) == expected
+
+
+def test_iter_courses_is_lazy():
+    def lines():
+        yield "Enrolled\t1\tMath\t101\t001\n"
+        yield "MW 9:00am - 9:59am - Evans 10\n"
+        yield "Enrolled\t2\tPhysics\t7A\t001\n"
+        raise AssertionError("read past the second entry")
+
+    courses = iter_courses(lines())
+    first = next(courses)
+    assert (first.id, first.number, first.location) == ("1", "101", "Evans 10")
+
+
+def test_parse_ocr_text():
+    # tesseract output has no tabs, just the column gaps as runs of spaces
+    text = (
+        "Status   Class #   Subject   Course   Section\n"
+        "Enrolled   29901   Industrial Eng & Ops Rsch   215   001   20   In-Person Instruction\n"
+        "Phillip Kerger\n"
+        "MW 12:00pm - 12:59pm - Latimer 120\n"
+        "3\n"
+    )
+
+    [course] = parse_class_schedule(columns_to_tabs(text))
+    assert course.id == "29901"
+    assert course.name == "Industrial Eng & Ops Rsch"
+    assert course.number == "215"
+    assert course.instructor == ["Phillip Kerger"]
+    assert course.location == "Latimer 120"
@@ -0,0 +1,74 @@
+import asyncio
+from pathlib import Path
+
+from executor import WorkerPool
+from parser import parse_class_schedule
+from profiling import ProfileStore, ProfilingMiddleware, tag_profile
+
+EXAMPLE = Path(__file__).resolve().parent.parent / "class.example.txt"
+
+
+def make_app(pool):
+    async def app(scope, receive, send):
+        message = await receive()
+        text = message["body"].decode()
+        classes = await pool.run(parse_class_schedule, text)
+        tag_profile(text_length=len(text), courses=len(classes))
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": str(len(classes)).encode()})
+    return app
+
+
+def call(app, body, headers=()):
+    scope = {"type": "http", "method": "POST", "path": "/parse", "headers": list(headers)}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return sent[0]["status"]
+
+
+def test_store_keeps_the_slowest(tmp_path):
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.runcall(sum, range(10))
+    stats = pstats.Stats(profiler)
+
+    store = ProfileStore(str(tmp_path), keep=2)
+    assert store.add(stats, {"duration": 0.2})["duration"] == 0.2
+    assert store.add(stats, {"duration": 0.1}) is not None
+    assert store.add(stats, {"duration": 0.05}) is None
+    assert store.add(stats, {"duration": 0.3}) is not None
+
+    assert [entry["duration"] for entry in store.list()] == [0.3, 0.2]
+    assert len(list(tmp_path.glob("*.prof"))) == 2
+    assert store.get("../nothing") is None and store.report("nope") is None
+
+
+def test_header_and_sampling(tmp_path):
+    text = EXAMPLE.read_text()
+    pool = WorkerPool(kind="thread", max_workers=1)
+    store = ProfileStore(str(tmp_path))
+
+    app = ProfilingMiddleware(make_app(pool), store, allow_header=True)
+    assert call(app, text.encode()) == 200
+    assert store.list() == []
+
+    assert call(app, text.encode(), headers=[(b"x-profile", b"1")]) == 200
+    [entry] = store.list()
+    assert entry["status"] == 200 and entry["path"] == "/parse"
+    assert entry["courses"] == 11 and entry["text_length"] == len(text)
+    assert entry["request_bytes"] == len(text.encode())
+    assert "parse_class_chunk" in store.report(entry["id"], sort="tottime")
+
+    sampled = ProfilingMiddleware(make_app(pool), store, sample_rate=0.5, rng=lambda: 0.4)
+    assert call(sampled, text.encode()) == 200
+    assert len(store.list()) == 2
+    pool.shutdown()
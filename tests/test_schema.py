@@ -0,0 +1,50 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from parser import parse_class_schedule
+from schema import GenerateRequest, ParseRequest, SchemaError, decode_request
+from structs import Course
+
+EXAMPLE = Path(__file__).resolve().parent.parent / "class.example.txt"
+
+
+def test_decode_generate_request_builds_courses():
+    courses = parse_class_schedule(EXAMPLE.read_text())
+    body = json.dumps({
+        "classes": [course.serialize() for course in courses],
+        "semester_start": "2025-08-27",
+        "semester_end": "2025-12-12",
+    }).encode()
+
+    request = decode_request(body, GenerateRequest)
+    assert request.classes == courses
+    assert request.recurrence == "expanded"
+    assert request.exclude_dates == []
+
+    # the parsed meeting times are filled in too
+    schedule = request.classes[0].schedule
+    assert isinstance(request.classes[0], Course)
+    assert (schedule.start_minute, schedule.end_minute) == (720, 779)
+    assert schedule.weekday_mask == 0b101
+
+
+def test_decode_defaults_missing_fields():
+    request = decode_request(b'{"classes": [{"name": "Math"}]}', GenerateRequest)
+    course = request.classes[0]
+    assert course.instructor == []
+    assert course.schedule.weekday_mask == 0
+    assert course.schedule.start_minute is None
+
+
+def test_decode_errors_name_the_field():
+    body = b'{"classes": [{"schedule": {"days": 5}}]}'
+    with pytest.raises(SchemaError, match=r"\$\.classes\[0\]\.schedule\.days"):
+        decode_request(body, GenerateRequest)
+
+    with pytest.raises(SchemaError, match="schedule_text"):
+        decode_request(b'{"schedule_text": null}', ParseRequest)
+
+    with pytest.raises(SchemaError, match="malformed"):
+        decode_request(b"{nope", ParseRequest)
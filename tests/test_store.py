@@ -0,0 +1,44 @@
+from store import CalendarStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_create_and_get():
+    store = CalendarStore(":memory:")
+    saved = store.create(b"BEGIN:VCALENDAR\r\nEND:VCALENDAR\r\n")
+
+    assert store.get(saved.token) == saved
+    assert store.get("missing") is None
+    assert len(store) == 1
+    assert store.create(b"other").token != saved.token
+
+
+def test_update_keeps_etag_for_same_body():
+    clock = FakeClock()
+    store = CalendarStore(":memory:", clock=clock)
+    saved = store.create(b"v1")
+
+    clock.now += 60
+    assert store.update(saved.token, b"v1") == saved
+
+    updated = store.update(saved.token, b"v2")
+    assert updated.etag != saved.etag
+    assert updated.updated_at == clock.now
+    assert store.get(saved.token).body == b"v2"
+
+    assert store.update("missing", b"v2") is None
+
+
+def test_delete():
+    store = CalendarStore(":memory:")
+    saved = store.create(b"v1")
+
+    assert store.delete(saved.token)
+    assert not store.delete(saved.token)
+    assert store.get(saved.token) is None
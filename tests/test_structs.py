@@ -0,0 +1,35 @@
+from structs import Course, Schedule, mask_weekdays, parse_clock, weekday_mask
+
+
+def test_parse_clock():
+    assert parse_clock("11:00am") == 11 * 60
+    assert parse_clock("12:29pm") == 12 * 60 + 29
+    assert parse_clock("12:00am") == 0
+    assert parse_clock("3pm") == 15 * 60
+    assert parse_clock("5:00 PM") == 17 * 60
+    assert parse_clock("") is None
+    assert parse_clock("13:00pm") is None
+
+
+def test_weekday_mask():
+    assert mask_weekdays(weekday_mask("MWF")) == [0, 2, 4]
+    assert mask_weekdays(weekday_mask("TTh")) == [1, 3]
+    assert weekday_mask("") == 0
+
+
+def test_schedule_keeps_parsed_fields_in_step():
+    schedule = Schedule(start_time="11:00am", end_time="12:29pm", days="TTh")
+    assert (schedule.start_minute, schedule.end_minute) == (660, 749)
+
+    schedule.days = "F"
+    schedule.start_time = "4:00pm"
+    assert schedule.weekday_mask == 1 << 4
+    assert schedule.start_minute == 16 * 60
+
+    # the parsed fields don't change equality or the serialized form
+    assert schedule == Schedule(start_time="4:00pm", end_time="12:29pm", days="F")
+    assert Course(schedule=schedule).serialize()["schedule"] == {
+        "start_time": "4:00pm",
+        "end_time": "12:29pm",
+        "days": "F",
+    }